@@ -0,0 +1,225 @@
+import argparse
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple, Union
+
+from kaggle_environments.utils import structify
+
+from geometry import get_distance_matrix, get_neighbour_table
+from halite_sim import agent_classes, create_agent
+from profiling import act_timeout
+
+# Agent Server #########################################################################################################
+
+# A long-lived process serving our bots over HTTP, in the protocol of the URL agents of kaggle_environments. Games that
+# are played by file path load the agent source and numpy again in every game, with the server the bots are imported
+# and their shared tables (geometry, spiral tables, FFT kernels, ...) built once and kept warm for all games.
+#
+# Every URL path is one seat of one game and gets its own bot instance, e.g. seat 2 of game 17:
+#     http://127.0.0.1:8765/basic_bot/17-2
+# The instance is created on the first turn (and created again if a game starts over on the same path) and dropped
+# after the last turn, instances of games that ended early are dropped when they have been idle for a while.
+#
+# The server keeps connections alive (HTTP/1.1), ServerAgent plays a seat through a pooled session of the requests
+# package. The plain URL works as agent of kaggle_environments too, but it opens a connection for every turn.
+#
+#     python agent_server.py --port 8765 --sizes 21
+#     python tournament.py --games 100 --server http://127.0.0.1:8765
+#
+# The bots of all games share the one server process (and its GIL), for tournaments with several processes start a
+# server per process on its own port.
+#
+# The random module is seeded with the randomSeed of the configuration on the first turn of every seat, as the games
+# played in-process seed it per game, so bot_swarm's draws follow the seed of the game.
+#
+# WARNING: Turns of concurrent games interleave, bot_swarm's draws from the global random module are therefore only
+#          reproducible if one game is played at a time.
+
+default_port = 8765
+# Seconds after which an instance without turns is dropped
+instance_idle_timeout = 600
+max_instances = 1024
+
+
+# Instances ############################################################################################################
+
+class AgentPool:
+    def __init__(self, bots: List[str], idle_timeout: float = instance_idle_timeout,
+                 max_instances: int = max_instances):
+        self.bots = list(bots)
+        self.idle_timeout = idle_timeout
+        self.max_instances = max_instances
+        # path -> [agent, lock, last use], least recently used first
+        self.instances: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.games = 0
+
+    def instance(self, path: str, bot: str, step: int) -> Tuple[Any, threading.Lock]:
+        # The bot instance of the path, a new one on the first turn of a game
+        with self.lock:
+            entry = self.instances.get(path)
+            if entry is None or step == 0:
+                entry = [create_agent(bot), threading.Lock(), 0.0]
+                self.instances[path] = entry
+                self.games += 1
+            entry[2] = time.monotonic()
+            self.instances.move_to_end(path)
+            self.turns += 1
+            self._evict()
+        return entry[0], entry[1]
+
+    def release(self, path: str) -> None:
+        with self.lock:
+            self.instances.pop(path, None)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self.instances:
+            path, (_, _, last_use) = next(iter(self.instances.items()))
+            if len(self.instances) <= self.max_instances and now - last_use < self.idle_timeout:
+                break
+            del self.instances[path]
+
+    def act(self, path: str, observation: Dict[str, Any], configuration: Dict[str, Any]) -> Any:
+        bot = path.strip('/').split('/')[0]
+        if bot not in self.bots:
+            raise KeyError(f'Unknown bot {bot!r}, the server plays {self.bots}.')
+        observation = structify(observation)
+        configuration = structify(configuration)
+        agent, agent_lock = self.instance(path, bot, observation.step)
+        # Turns of the same seat are played one after the other
+        with agent_lock:
+            if observation.step == 0 and configuration.get('randomSeed') is not None:
+                random.seed(configuration.randomSeed)
+            actions = agent(observation, configuration)
+        # The last turn of a game, the environment does not call the agents with the final observation
+        if observation.step >= configuration.episodeSteps - 2:
+            self.release(path)
+        return actions
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'bots': self.bots, 'instances': len(self.instances), 'games': self.games, 'turns': self.turns}
+
+
+# Server ###############################################################################################################
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    # Keeps the connection open between turns
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, with Nagle's algorithm the body waits for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        pool: AgentPool = self.server.pool
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if request.get('action', 'act') != 'act':
+                raise ValueError(f"Unsupported action {request.get('action')!r}.")
+            action = pool.act(self.path, request['state']['observation'], request['configuration'])
+        except Exception as exception:
+            # kaggle_environments turns this into an exception of the agent, as for an agent running locally
+            action = f'BaseException::{type(exception).__name__}: {exception}'
+        self.send_json({'action': action})
+
+    def do_GET(self) -> None:
+        self.send_json(self.server.pool.status())
+
+    def send_json(self, content: Dict[str, Any]) -> None:
+        body = json.dumps(content).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # A line for every turn would drown the output
+        pass
+
+
+class AgentServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], pool: AgentPool):
+        super().__init__(address, AgentRequestHandler)
+        self.pool = pool
+
+
+def warm_up(bots: List[str], sizes: List[int]) -> None:
+    # Imports the bots and builds the shared tables, so the first game does not pay for them
+    for bot in bots:
+        create_agent(bot)
+    for size in sizes:
+        get_distance_matrix(size)
+        get_neighbour_table(size)
+
+
+# Client ###############################################################################################################
+
+_session = None
+
+
+def get_session() -> Any:
+    # One session per process, its connection pool keeps the connections to the server open between turns and games
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+        _session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return _session
+
+
+def agent_url(server: str, bot: str, game: Union[int, str], seat: int) -> str:
+    return f"{server.rstrip('/')}/{bot}/{game}-{seat}"
+
+
+def turn_timeout(observation: Dict[str, Any], configuration: Dict[str, Any]) -> float:
+    # Seconds a turn may take, as the URL agents of kaggle_environments: the turn's time, the remaining overage time
+    # and a second for the request
+    return act_timeout(configuration) + observation.get('remainingOverageTime', 0) + 1
+
+
+class ServerAgent:
+    # Agent for kaggle_environments (or halite_sim) playing one seat through the server
+    def __init__(self, url: str):
+        self.url = url
+
+    def __call__(self, observation: Dict[str, Any], configuration: Dict[str, Any]) -> Any:
+        request = {'action': 'act', 'configuration': configuration, 'environment': 'halite',
+                   'state': {'observation': observation}}
+        response = get_session().post(self.url, data=json.dumps(request),
+                                      timeout=turn_timeout(observation, configuration))
+        response.raise_for_status()
+        action = response.json()['action']
+        if isinstance(action, str) and action.startswith('BaseException::'):
+            raise RuntimeError(action.split('::', 1)[1])
+        return action
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve the bots as URL agents of kaggle_environments.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=default_port)
+    parser.add_argument('--bots', nargs='+', default=sorted(agent_classes), choices=sorted(agent_classes))
+    parser.add_argument('--sizes', nargs='*', type=int, default=[21], help='board sizes to build the tables for')
+    args = parser.parse_args()
+
+    warm_up(args.bots, args.sizes)
+    server = AgentServer((args.host, args.port), AgentPool(args.bots))
+    print(f'serving {args.bots} on http://{args.host}:{args.port}/<bot>/<game>-<seat>')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+from typing import Union
+
+import numpy as np
+
+# Assignment ###########################################################################################################
+
+# Conflict-free assignment of ships to target squares. Every ship only bids on its top_k best squares (plus enough of
+# the overall best squares to give every ship one), which keeps the auction small even for large fleets. The auction
+# maximizes the summed score over all ships among these candidate squares.
+
+# Ships with (nearly) equal scores, e.g. stacked on one square, outbid each other by epsilon at a time. The auction is
+# therefore stopped after max_auction_rounds and the ships left without a square get the free squares greedily.
+max_auction_rounds = 300
+# Relative to the score range, the summed score is optimal up to auction_epsilon * score range
+auction_epsilon = 1e-2
+
+
+def candidate_positions(score_matrix: np.ndarray, top_k: int) -> np.ndarray:
+    # Union of the top_k squares of every ship, filled up with the best remaining squares if the ships overlap too much
+    n_ships, n_positions = score_matrix.shape
+    top_k = min(top_k, n_positions)
+    top_positions = np.argpartition(-score_matrix, top_k - 1, axis=1)[:, :top_k]
+    candidates = np.unique(top_positions)
+
+    if candidates.size < n_ships:
+        best_scores = score_matrix.max(axis=0)
+        best_scores[candidates] = -np.inf
+        missing = n_ships - candidates.size
+        candidates = np.union1d(candidates, np.argpartition(-best_scores, missing - 1)[:missing])
+
+    return candidates
+
+
+def auction(benefit: np.ndarray, epsilon: np.ndarray, prices: np.ndarray, assigned: np.ndarray,
+            max_rounds: int) -> int:
+    # Jacobi auction of independent games at once: all unassigned ships bid at the same time and every object goes to
+    # the highest bid. benefit has the shape (n_games, n_ships, n_objects), objects with a benefit of -inf do not exist.
+    # assigned holds the object of every ship, -1 for ships that bid and -2 for ships that do not take part. Every game
+    # needs at least as many objects as bidding ships. Updates prices and assigned in place and returns the rounds used,
+    # ships are left unassigned if the auction does not finish within max_rounds.
+    n_games, n_ships, n_objects = benefit.shape
+    owner = np.full((n_games, n_objects), -1)
+    owner_games, owners = np.nonzero(assigned >= 0)
+    owner[owner_games, assigned[owner_games, owners]] = owners
+
+    for rounds in range(max_rounds):
+        bidder_games, bidders = np.nonzero(assigned == -1)
+        if bidders.size == 0:
+            return rounds
+
+        # Best and second best object, ties go to the object with the lower index. The only object of a game is taken
+        # for epsilon.
+        values = benefit[bidder_games, bidders] - prices[bidder_games]
+        bids = np.arange(bidders.size)
+        best_objects = np.argmax(values, axis=1)
+        best_values = values[bids, best_objects]
+        values[bids, best_objects] = -np.inf
+        second_values = values.max(axis=1)
+        increments = np.where(np.isfinite(second_values), best_values - second_values, 0) + epsilon[bidder_games]
+
+        # Highest bid per object wins, ties go to the ship with the lower index
+        object_keys = bidder_games * n_objects + best_objects
+        bid_order = np.lexsort((bidders, -increments, object_keys))
+        first_bids = np.ones(bid_order.size, dtype=bool)
+        first_bids[1:] = object_keys[bid_order[1:]] != object_keys[bid_order[:-1]]
+        winning_bids = bid_order[first_bids]
+
+        won_games = bidder_games[winning_bids]
+        won_objects = best_objects[winning_bids]
+        winners = bidders[winning_bids]
+        previous_owners = owner[won_games, won_objects]
+        outbid = previous_owners >= 0
+        assigned[won_games[outbid], previous_owners[outbid]] = -1
+
+        prices[won_games, won_objects] += increments[winning_bids]
+        owner[won_games, won_objects] = winners
+        assigned[won_games, winners] = won_objects
+
+    return max_rounds
+
+
+def assign_free_objects(benefit: np.ndarray, assigned: np.ndarray) -> None:
+    # Gives the ships left without an object by the auction the free objects greedily, the best pair of a ship and an
+    # object of a game first
+    n_games, n_ships, n_objects = benefit.shape
+    owned = np.zeros((n_games, n_objects), dtype=bool)
+    games, ships = np.nonzero(assigned >= 0)
+    owned[games, assigned[games, ships]] = True
+    for game in np.unique(np.nonzero(assigned == -1)[0]).tolist():
+        ships = np.flatnonzero(assigned[game] == -1)
+        free_benefit = np.where(owned[game], -np.inf, benefit[game, ships])
+        for _ in range(ships.size):
+            ship, best_object = np.unravel_index(np.argmax(free_benefit), free_benefit.shape)
+            assigned[game, ships[ship]] = best_object
+            free_benefit[ship] = -np.inf
+            free_benefit[:, best_object] = -np.inf
+
+
+def assign_targets(score_matrix: np.ndarray, top_k: int = 8,
+                   shared_positions: Union[np.ndarray, None] = None) -> np.ndarray:
+    # score_matrix has the shape (n_ships, n_positions). Returns the target position of every ship, no two ships get
+    # the same target except for shared_positions (e.g. own shipyards), which any number of ships may target.
+    n_ships, n_positions = score_matrix.shape
+    shared_squares = np.zeros((1, n_positions), dtype=bool)
+    if shared_positions is not None:
+        shared_squares[0, shared_positions] = True
+    return assign_targets_games(score_matrix, np.zeros(n_ships, dtype=int), shared_squares, top_k)
+
+
+def assign_targets_games(score_matrix: np.ndarray, ship_games: np.ndarray, shared_squares: np.ndarray,
+                         top_k: int = 8) -> np.ndarray:
+    # assign_targets for ships playing in several independent games, the auctions of all games run at once. ship_games
+    # has to be sorted and shared_squares of the shape (n_games, n_positions) marks the shared positions of every game.
+    # Every game gets the same targets as from assign_targets for the game alone.
+    n_ships, n_positions = score_matrix.shape
+    targets = np.argmax(score_matrix, axis=1)
+    ships_count = np.bincount(ship_games, minlength=shared_squares.shape[0])
+
+    score_matrix = np.asarray(score_matrix, dtype=float)
+    bidding = (ships_count[ship_games] > 1) & ~shared_squares[ship_games, targets]
+    bidders = np.flatnonzero(bidding)
+    if bidders.size == 0:
+        return targets
+    score_matrix = np.where(shared_squares[ship_games], -np.inf, score_matrix)
+
+    # Candidate squares of every game, sorted by position
+    bidder_games = ship_games[bidders]
+    top_k = min(top_k, n_positions)
+    top_positions = np.argpartition(-score_matrix[bidders], top_k - 1, axis=1)[:, :top_k]
+    candidate_keys = np.unique(bidder_games[:, np.newaxis] * n_positions + top_positions)
+    games, bidders_count = np.unique(bidder_games, return_counts=True)
+    candidates_count = np.bincount(candidate_keys // n_positions, minlength=shared_squares.shape[0])[games]
+    for game in games[candidates_count < bidders_count]:
+        # Too much overlap, the candidates of the game are filled up with the best remaining squares
+        game_keys = game * n_positions + candidate_positions(score_matrix[bidders[bidder_games == game]], top_k)
+        candidate_keys = np.union1d(candidate_keys[candidate_keys // n_positions != game], game_keys)
+
+    # Auction tables padded to the largest game, padded objects have a benefit of -inf
+    game_index = np.searchsorted(games, candidate_keys // n_positions)
+    candidates = np.full((games.size, np.bincount(game_index).max()), -1)
+    # Rank of the candidate and of the bidder within its game
+    candidates[game_index, np.arange(game_index.size) - np.searchsorted(game_index, game_index)] = \
+        candidate_keys % n_positions
+    bidder_index = np.searchsorted(games, bidder_games)
+    bidder_slots = np.arange(bidder_index.size) - np.searchsorted(bidder_index, bidder_index)
+    ship_candidates = candidates[bidder_index]
+    benefit = np.full((games.size, bidders_count.max(), candidates.shape[1]), np.nan)
+    benefit[bidder_index, bidder_slots] = np.where(ship_candidates >= 0,
+                                                   score_matrix[bidders[:, np.newaxis], ship_candidates], np.nan)
+
+    benefit = np.where(np.isfinite(benefit), benefit, np.nan)
+    score_range = np.maximum(np.nanmax(benefit, axis=(1, 2)) - np.nanmin(benefit, axis=(1, 2)), 1e-9)
+    missing_benefit = np.nanmin(benefit, axis=(1, 2)) - score_range
+    benefit = np.where(np.isnan(benefit), missing_benefit[:, np.newaxis, np.newaxis], benefit)
+    benefit[np.broadcast_to(candidates[:, np.newaxis, :] < 0, benefit.shape)] = -np.inf
+    bidding_slots = np.zeros(benefit.shape[:2], dtype=bool)
+    bidding_slots[bidder_index, bidder_slots] = True
+
+    # No epsilon scaling, as prices carried over from a coarser auction would stay on unassigned squares and break
+    # optimality when there are more squares than ships
+    prices = np.zeros(candidates.shape)
+    assigned = np.where(bidding_slots, -1, -2)
+    auction(benefit, auction_epsilon * score_range / bidders_count, prices, assigned, max_auction_rounds)
+    assign_free_objects(benefit, assigned)
+
+    objects = assigned[bidder_index, bidder_slots]
+    targets[bidders] = candidates[bidder_index, objects]
+    return targets
+
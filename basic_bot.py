@@ -1,125 +1,107 @@
+import math
+import time
+
 from kaggle_environments.envs.halite.helpers import *
 import numpy as np
 
+from assignment import assign_targets, assign_targets_games
+from board_state import get_board_state
+from forecast import HaliteForecast, get_halite_forecast
+from geometry import directions, get_distance_matrix, get_neighbour_table
+from halite_batch import BatchObservation
+from halite_sim import convert_code
+from influence import InfluenceFields, influence_fields, observation_influence
+from lookahead import Lookahead, lookahead_budget
+from profiling import profiled_agent, profiler
+
 # Model parameters #############################################################################################
 
+# Defaults of the BasicBot instances
 max_shipyards = 3
 max_ships = 35
-drop_off_speed = 1/2  # in score()
-
-
-# Boards #######################################################################################################
-
-# WARNING: The numpy boards use by default the x-axis going down and the y-axis going right, which is unexpected
-#          for a game board. Accessing a single element therefore needs to be done by, e.g. board_halite[1, 2],
-#          which means the y=1 and x=2 square.
-
-def board_halite_(obs: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
-    board_halite = np.array(obs['halite']).reshape(config['size'], -1)
-    return board_halite
-
-
-def board_ships_(obs: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
-    board_ships = np.empty((config['size'], config['size']))
-    board_ships[:] = np.nan
-
-    for player in range(len(obs['players'])):
-        ships_dict = obs['players'][player][2]
-        for ship in ships_dict:
-            x_pos = ships_dict[ship][0] % config['size']
-            y_pos = ships_dict[ship][0] // config['size']
-            board_ships[y_pos, x_pos] = player
-
-    return board_ships
-
-
-def board_shipyards_(obs: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
-    board_shipyards = np.empty((config['size'], config['size']))
-    board_shipyards[:] = np.nan
-
-    for player in range(len(obs['players'])):
-        shipyards_dict = obs['players'][player][1]
-        for shipyard in shipyards_dict:
-            x_pos = shipyards_dict[shipyard] % config['size']
-            y_pos = shipyards_dict[shipyard] // config['size']
-            board_shipyards[y_pos, x_pos] = player
-
-    return board_shipyards
+drop_off_speed = 2  # in score(), weighs the cargo against the forecast halite per turn of the squares
+assignment_top_k = 8  # candidate squares per ship in the target assignment
+danger_aversion = 1.0  # in score(), divides the halite per turn by 1 + danger_aversion * danger of the square
 
 
 # Distance #####################################################################################################
 
-def get_coordinates(pos: int, size: int) -> np.ndarray:
-    # Coordinates are given by [y, x]
-    return np.array([pos // size, pos % size])
-
-
-def get_position(coordinates: np.ndarray, size: int) -> int:
-    # Coordinates are given by [y, x]
-    return coordinates[0] * size + coordinates[1]
-
-
-def distance_1d(val_1: Union[int, np.ndarray], val_2: Union[int, np.ndarray], size: int) -> Union[int, np.ndarray]:
-    min_val = np.fmin(val_1, val_2)
-    max_val = np.fmax(val_1, val_2)
-    return np.fmin(max_val - min_val, min_val + size - max_val)
-
-
-def manhatten_distance(pos_1: int, pos_2: int, size: int) -> int:
-    coordinates_1 = get_coordinates(pos_1, size)
-    coordinates_2 = get_coordinates(pos_2, size)
-
-    dy = distance_1d(coordinates_1[0], coordinates_2[0], size)
-    dx = distance_1d(coordinates_1[1], coordinates_2[1], size)
-
-    return dx + dy
-
-
-# This function only has to be used once to create the look-up table in the beginning
+# The look-up table is built once per board size and shared via the geometry cache
 def create_distance_matrix(size: int) -> np.ndarray:
-    # Maximal position is size**2 - 1
-    position_range = np.arange(size ** 2)
-    positions_1 = np.repeat(position_range, size ** 2)
-    positions_2 = np.tile(position_range, size ** 2)
-
-    # positions_1 and positions_2 combined contain all possible combinations of positions
-    x_distances = distance_1d(positions_1 % size, positions_2 % size, size)
-    y_distances = distance_1d(positions_1 // size, positions_2 // size, size)
-
-    distance_matrix = (x_distances + y_distances).reshape(size ** 2, -1)
-
-    return distance_matrix
+    return get_distance_matrix(size)
 
 
 # Score ########################################################################################################
 
 def score(board_halite: np.ndarray, board_shipyards: np.ndarray, ship: list,
-          player_id: int, size: int, distance_matrix: np.ndarray) -> np.ndarray:
-    halite_per_turn = np.zeros((size, size))
-
-    ship_position = ship[0]
-    ship_halite = ship[1]
-
-    shipyard_counts = np.column_stack(np.unique(board_shipyards[~np.isnan(board_shipyards)], return_counts=True))
-    shipyard_coordinates_array = np.column_stack(np.where(board_shipyards == player_id))
+          player_id: int, size: int, distance_matrix: np.ndarray, drop_off_speed: float = drop_off_speed,
+          halite_forecast: Union[HaliteForecast, None] = None, influence: Union[InfluenceFields, None] = None,
+          danger_aversion: float = danger_aversion) -> np.ndarray:
+    ship_score = score_fleet(board_halite, board_shipyards, np.array([ship[0]]), np.array([ship[1]]),
+                             player_id, size, distance_matrix, drop_off_speed, halite_forecast, influence,
+                             danger_aversion)
+    return ship_score[0]
+
+
+def score_fleet(board_halite: np.ndarray, board_shipyards: np.ndarray, ship_positions: np.ndarray,
+                ship_halite: np.ndarray, player_id: int, size: int, distance_matrix: np.ndarray,
+                drop_off_speed: float = drop_off_speed, halite_forecast: Union[HaliteForecast, None] = None,
+                influence: Union[InfluenceFields, None] = None, danger_aversion: float = danger_aversion) -> np.ndarray:
+    # Scores all ships at once, the result has the shape (n_ships, size, size) and score_fleet(...)[i] equals the
+    # score of the i-th ship. The per player work (own shipyards and distance to the closest one) is done only once.
+    shipyard_positions = np.flatnonzero(board_shipyards == player_id)
+    halite_per_turn = score_games(board_halite.reshape(1, -1), np.zeros(ship_positions.size, dtype=int),
+                                  ship_positions, ship_halite, np.zeros(shipyard_positions.size, dtype=int),
+                                  shipyard_positions, distance_matrix, drop_off_speed, halite_forecast, influence,
+                                  danger_aversion)
+    return halite_per_turn.reshape(ship_positions.size, size, size)
+
+
+def score_games(board_halite: np.ndarray, ship_games: np.ndarray, ship_positions: np.ndarray, ship_halite: np.ndarray,
+                shipyard_games: np.ndarray, shipyard_positions: np.ndarray, distance_matrix: np.ndarray,
+                drop_off_speed: float = drop_off_speed, halite_forecast: Union[HaliteForecast, None] = None,
+                influence: Union[InfluenceFields, None] = None, danger_aversion: float = danger_aversion) -> np.ndarray:
+    # Score of ships playing in several games, board_halite has the shape (n_games, size**2) and the shipyards are the
+    # own shipyards of the ships in their game. Returns the shape (n_ships, size**2).
+    # A square is worth the halite a ship can mine there per turn, with the halite regenerating until the ship arrives
+    # (forecast.py). Without a halite_forecast of the games it is forecast from board_halite with the default rules.
+    # With the influence fields of the games (influence.py), squares near enemy ships that would win a collision with
+    # the ship are worth less, the enemies are ignored otherwise.
+    n_games, squares = board_halite.shape
+    ship_distances = distance_matrix[ship_positions].astype(int)
+    if halite_forecast is None:
+        halite_forecast = HaliteForecast(math.isqrt(squares), n_games)
+        halite_forecast.update(board_halite)
+
+    # Distance to the closest shipyard per game, reduced over the shipyards sorted by game
+    shipyard_order = np.argsort(shipyard_games, kind='stable')
+    has_shipyard = np.zeros(n_games, dtype=bool)
+    has_shipyard[shipyard_games] = True
+    distance_to_closest_shipyard = np.full((n_games, distance_matrix.shape[0]), np.inf)
+    if shipyard_games.size > 0:
+        first_shipyards = np.searchsorted(shipyard_games[shipyard_order], np.flatnonzero(has_shipyard))
+        distance_to_closest_shipyard[has_shipyard] = np.minimum.reduceat(
+            distance_matrix[shipyard_positions[shipyard_order]], first_shipyards, axis=0)
+
+    # Without a shipyard the way back is as long as the way to the square
+    travel = np.where(has_shipyard[ship_games, np.newaxis],
+                      ship_distances + distance_to_closest_shipyard[ship_games], 2 * ship_distances).astype(int)
+    halite_per_turn = halite_forecast.halite_per_turn(ship_distances, travel,
+                                                      ship_games[:, np.newaxis] * squares + np.arange(squares))
+    if influence is not None and danger_aversion > 0:
+        halite_per_turn /= 1 + danger_aversion * influence.danger(ship_games, ship_halite)
+
+    # Every ship gets the drop off score on all shipyards of its game
+    first_shipyard = np.searchsorted(shipyard_games[shipyard_order], ship_games, side='left')
+    shipyards_count = np.searchsorted(shipyard_games[shipyard_order], ship_games, side='right') - first_shipyard
+    pair_ships = np.repeat(np.arange(ship_games.size), shipyards_count)
+    pair_shipyards = shipyard_order[np.arange(pair_ships.size) - np.repeat(np.cumsum(shipyards_count) - shipyards_count,
+                                                                           shipyards_count)
+                                    + np.repeat(first_shipyard, shipyards_count)]
+    pair_positions = shipyard_positions[pair_shipyards]
+    halite_per_turn[pair_ships, pair_positions] += \
+        drop_off_speed * ship_halite[pair_ships] / (ship_distances[pair_ships, pair_positions] + 1)
 
-    if shipyard_counts[shipyard_counts[:, 0] == player_id].size == 0:  # Player has no shipyard
-        halite_per_turn += 0.25 * board_halite / (1 + 2 * distance_matrix[ship_position].reshape(size, -1))
-
-    else:  # Player has at least one shipyard
-        distance_matrix_to_closest_shipyard = np.empty((size, size))
-        distance_matrix_to_closest_shipyard[:] = np.nan
-
-        for shipyard_coordinates in shipyard_coordinates_array:
-            shipyard_position = get_position(shipyard_coordinates, size)
-            distance_matrix_to_closest_shipyard = np.fmin(distance_matrix_to_closest_shipyard,
-                                                          distance_matrix[shipyard_position].reshape(size, -1))
-
-            halite_per_turn[shipyard_coordinates[0], shipyard_coordinates[1]] = \
-                drop_off_speed * ship_halite / (distance_matrix[ship_position, shipyard_position] + 1)
-
-        halite_per_turn += 0.25 * board_halite / (1 + distance_matrix[ship_position].reshape(size, -1)
-                                                  + distance_matrix_to_closest_shipyard)
     return halite_per_turn
 
 
@@ -145,91 +127,251 @@ def scheduler():
 
 def pathfinder(current_position: int, target_position: int, blocked_squares: np.ndarray,
                distance_matrix: np.ndarray, size: int) -> Union[str, None]:
-    current_coordinates = get_coordinates(current_position, size)
+    move = select_moves(np.array([current_position]), np.array([target_position]), blocked_squares.copy(),
+                        distance_matrix, size)[0]
+    return directions[move]
+
+
+def select_moves(ship_positions: np.ndarray, target_positions: np.ndarray, blocked_squares: np.ndarray,
+                 distance_matrix: np.ndarray, size: int, ship_games: Union[np.ndarray, None] = None) -> np.ndarray:
+    # Moves all ships one step towards their targets, ships earlier in the arrays have priority. Returns the index
+    # into geometry.directions for every ship and marks the squares the ships move to in blocked_squares (in place).
+    # The result equals calling pathfinder for one ship after the other and blocking each chosen square.
+    # With ship_games the ships play in several games at once and blocked_squares has the shape (n_games, size, size).
+    n_ships = ship_positions.size
+    blocked = blocked_squares.reshape(-1)
+    ship_range = np.arange(n_ships)
+
+    # Squares reachable in one move, ordered from closest to farthest from the target (ties: order of directions).
+    # Squares of game g are numbered from g * size**2 on.
+    neighbours = get_neighbour_table(size)[ship_positions].astype(int)
+    preferences = np.argsort(distance_matrix[target_positions[:, np.newaxis], neighbours], axis=1, kind='stable')
+    game_offsets = 0 if ship_games is None else ship_games * size ** 2
+    preferred_squares = np.take_along_axis(neighbours, preferences, axis=1) + np.reshape(game_offsets, (-1, 1))
+    ship_positions = ship_positions + game_offsets
+
+    moves = np.full(n_ships, directions.index('None'))
+    unresolved = np.ones(n_ships, dtype=bool)
+    while unresolved.any():
+        ships = ship_range[unresolved]
+        free = ~blocked[preferred_squares[ships]]
+        has_free = free.any(axis=1)
+        first_free = np.argmax(free, axis=1)
+        # Stay put if all squares are blocked
+        squares = np.where(has_free, preferred_squares[ships, first_free], ship_positions[ships])
+
+        # A ship's choice is final if no ship with higher priority can still end up on the same square, i.e. as one
+        # of its free squares from its current choice onwards or by staying put
+        reachable = free & (np.arange(free.shape[1]) >= first_free[:, np.newaxis])
+        first_claim = np.full(blocked.size, n_ships)
+        np.minimum.at(first_claim, preferred_squares[ships][reachable], np.repeat(ships, reachable.sum(axis=1)))
+        np.minimum.at(first_claim, ship_positions[ships], ships)
+        final = first_claim[squares] == ships
+
+        final_ships = ships[final]
+        moves[final_ships] = np.where(has_free[final], preferences[final_ships, first_free[final]], moves[final_ships])
+        blocked[squares[final]] = True
+        unresolved[final_ships] = False
+
+    return moves
 
-    directions_dict = {'NORTH': [-1, 0], 'EAST': [0, 1], 'SOUTH': [1, 0], 'WEST': [0, -1], 'None': [0, 0]}
 
-    directions_values = {}
-    for direction in directions_dict:
-        directions_values[direction] = (distance_matrix[target_position].reshape(size, -1)
-                                        .item(tuple((current_coordinates + directions_dict[direction]) % size))
-                                        - distance_matrix[target_position].reshape(size, -1)
-                                        .item(tuple(current_coordinates)))
+# Agent ########################################################################################################
 
-    for direction in directions_dict:
-        if blocked_squares.item(tuple((current_coordinates + directions_dict[direction]) % size)):
-            directions_values.pop(direction, None)
+class BasicBot:
+    # Every instance keeps its own boards, so several bots can play in the same process
+    def __init__(self, max_shipyards: int = max_shipyards, max_ships: int = max_ships,
+                 drop_off_speed: float = drop_off_speed, assignment_top_k: int = assignment_top_k,
+                 danger_aversion: float = danger_aversion, lookahead: bool = False,
+                 lookahead_budget: float = lookahead_budget):
+        self.max_shipyards = max_shipyards
+        self.max_ships = max_ships
+        self.drop_off_speed = drop_off_speed
+        self.assignment_top_k = assignment_top_k
+        self.danger_aversion = danger_aversion
+        # Boards of the previous turn, only the changes are applied each turn
+        self.board_state = None
+        # Halite forecast of the previous turn, only squares that differ from it are forecast again
+        self.halite_forecast = None
+        # Optional Monte Carlo search over the moves of the heuristic, with the batch agent as rollout policy
+        self.lookahead = Lookahead(self.batch_agent, lookahead_budget) if lookahead else None
+
+    def batch_agent(self, obs: BatchObservation, player: int, config: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        # The agent for all games of a halite_batch.BatchSimulator at once, in every game it takes the same actions as
+        # the bot would (up to the tolerance of the bot's incremental halite forecast). Keeps no state between turns,
+        # so one bot can play any number of batches.
+        size = config['size']
+        n_games = obs.halite.shape[0]
+        distance_matrix = get_distance_matrix(size)
+        ship_actions = np.full(obs.ship_games.size, directions.index('None'))
+        shipyard_spawns = np.zeros(obs.shipyard_games.size, dtype=bool)
+
+        # Ships ordered by game and by halite content in every game, like ordered_ships_dict
+        ships = np.flatnonzero((obs.ship_players == player) & obs.active[obs.ship_games, player])
+        ships = ships[np.lexsort((ships, -obs.ship_halite[ships], obs.ship_games[ships]))]
+        shipyards = np.flatnonzero((obs.shipyard_players == player) & obs.active[obs.shipyard_games, player])
+        ship_games = obs.ship_games[ships]
+        ship_positions = obs.ship_positions[ships]
+        shipyard_games = obs.shipyard_games[shipyards]
+        shipyard_positions = obs.shipyard_positions[shipyards]
+
+        player_halite = obs.player_halite[:, player]
+        ships_count = np.bincount(ship_games, minlength=n_games)
+        shipyards_count = np.bincount(shipyard_games, minlength=n_games)
+        need_shipyard = (shipyards_count == 0) | (ships_count > 10 * shipyards_count)
+
+        halite_forecast = get_halite_forecast(None, size, config, n_games)
+        halite_forecast.update(obs.halite)
+        influence = None
+        if self.danger_aversion > 0:
+            influence = influence_fields(n_games, player, obs.ship_games, obs.ship_players, obs.ship_positions,
+                                         obs.ship_halite.astype(int), size)
+        fleet_score = score_games(obs.halite.reshape(n_games, -1), ship_games, ship_positions,
+                                  obs.ship_halite[ships].astype(int), shipyard_games, shipyard_positions,
+                                  distance_matrix, self.drop_off_speed, halite_forecast, influence,
+                                  self.danger_aversion)
+
+        # Every ship gets its own target in its game, only own shipyards can be the target of several ships
+        target_positions = assign_targets_games(fleet_score, ship_games, obs.shipyards.reshape(n_games, -1) == player,
+                                                self.assignment_top_k)
+
+        # The ship with most halite converts, if a shipyard is needed
+        converting = (need_shipyard & (shipyards_count < self.max_shipyards) & (player_halite > 500)
+                      & (ships_count > 0))
+        moving_ships = np.ones(ships.size, dtype=bool)
+        moving_ships[np.searchsorted(ship_games, np.flatnonzero(converting))] = False
+        need_shipyard &= ~converting
+
+        blocked_squares = np.zeros((n_games, size, size), dtype=bool)
+        ship_actions[ships[moving_ships]] = select_moves(ship_positions[moving_ships],
+                                                         target_positions[moving_ships], blocked_squares,
+                                                         distance_matrix, size, ship_games[moving_ships])
+        ship_actions[ships[~moving_ships]] = convert_code
+
+        spawning = (~blocked_squares.reshape(n_games, -1)[shipyard_games, shipyard_positions]
+                    & (obs.step < 150)
+                    & (player_halite[shipyard_games] > 500)
+                    & (ships_count[shipyard_games] < self.max_ships)
+                    & ~need_shipyard[shipyard_games])
+        shipyard_spawns[shipyards[spawning]] = True
+
+        return ship_actions, shipyard_spawns
+
+    def __call__(self, obs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, str]:
+        # print('-----------------------------------------------------------------------')
+        # print(obs['step'])
+        turn_start = time.perf_counter()
+        player_id = obs['player']
+        actions = {}
+        blocked_squares = np.zeros((config['size'], config['size']), dtype=bool)
+
+        with profiler.phase('distance'):
+            distance_matrix = get_distance_matrix(config['size'])
+
+        with profiler.phase('boards'):
+            if obs['step'] == 0:
+                # A new game, nothing of the previous game is carried over
+                self.board_state = None
+                self.halite_forecast = None
+                if self.lookahead is not None:
+                    self.lookahead.tree = None
+            self.board_state = get_board_state(self.board_state, config['size'])
+            self.board_state.update(obs)
+            self.halite_forecast = get_halite_forecast(self.halite_forecast, config['size'], config)
+            self.halite_forecast.update(self.board_state.board_halite)
+        board_halite = self.board_state.board_halite
+        # board_ships = self.board_state.board_ships
+        board_shipyards = self.board_state.board_shipyards
+
+        observation = self.board_state.observation
+        player_halite = observation.player_halite[player_id]
+        shipyards = observation.shipyards[observation.player_shipyards(player_id)]
+        shipyard_ids = observation.shipyard_ids[observation.player_shipyards(player_id)]
+        shipyards_count = shipyards.size
+        ships = observation.ships[observation.player_ships(player_id)]
+        ship_ids = observation.ship_ids[observation.player_ships(player_id)]
+        ships_count = ships.size
+        # Sort ships by halite content to give ship with most halite highest priority for its action
+        ship_order = np.argsort(-ships['cargo'], kind='stable')
+        ordered_ships = ships[ship_order]
+        ordered_ship_ids = [ship_ids[index] for index in ship_order.tolist()]
+
+        need_shipyard = need_shipyard_(shipyards_count, ships_count)
+
+        with profiler.phase('influence'):
+            influence = None
+            if self.danger_aversion > 0:
+                influence = observation_influence(observation.ships, player_id, config['size'])
+
+        with profiler.phase('score'):
+            fleet_score = score_fleet(board_halite, board_shipyards, ordered_ships['position'], ordered_ships['cargo'],
+                                      player_id, config['size'], distance_matrix, self.drop_off_speed,
+                                      self.halite_forecast, influence, self.danger_aversion)
+        with profiler.phase('assignment'):
+            # Every ship gets its own target, only own shipyards can be the target of several ships
+            target_positions = assign_targets(fleet_score.reshape(ships_count, config['size'] ** 2),
+                                              self.assignment_top_k, shipyards['position'])
+
+        # The ship with most halite converts, if a shipyard is needed
+        moving_ships = np.ones(ships_count, dtype=bool)
+        if need_shipyard & (shipyards_count < self.max_shipyards) & (player_halite > 500) & (ships_count > 0):
+            moving_ships[0] = False
+            need_shipyard = False
 
-    directions_values_sorted = {key: value for key, value in
-                                sorted(directions_values.items(), key=lambda item: item[1])}
+        with profiler.phase('pathfinder'):
+            ship_moves = np.full(ships_count, directions.index('None'))
+            ship_moves[moving_ships] = select_moves(ordered_ships['position'][moving_ships],
+                                                    target_positions[moving_ships], blocked_squares, distance_matrix,
+                                                    config['size'])
 
-    # For the rare occasion that all field are blocked use try and stay put if nothing is possible
-    try:
-        return list(directions_values_sorted)[0]
-    except IndexError:
-        return 'None'
+        if self.lookahead is not None:
+            with profiler.phase('lookahead'):
+                ship_codes = self.lookahead.search(observation, ordered_ship_ids,
+                                                   np.where(moving_ships, ship_moves, convert_code), config,
+                                                   self.lookahead.deadline(turn_start, config))
+                moving_ships = ship_codes != convert_code
+                ship_moves = np.where(moving_ships, ship_codes, directions.index('None'))
+                need_shipyard = need_shipyard_(shipyards_count, ships_count) and moving_ships.all()
+                # The squares the ships end up on, for the spawns
+                blocked_squares[:] = False
+                blocked_squares.reshape(-1)[get_neighbour_table(config['size'])[
+                    ordered_ships['position'][moving_ships], ship_moves[moving_ships]]] = True
 
+        for ship_index, ship in enumerate(ordered_ship_ids):
+            if not moving_ships[ship_index]:
+                ship_action = 'CONVERT'
+            else:
+                ship_action = directions[ship_moves[ship_index]]
 
-# Agent ########################################################################################################
+            if ship_action == 'None':
+                ship_action = None
+
+            if ship_action is not None:
+                actions[ship] = ship_action
+
+        with profiler.phase('shipyards'):
+            for shipyard, y, x in zip(shipyard_ids, shipyards['y'].tolist(), shipyards['x'].tolist()):
+                if ((not blocked_squares[y, x])
+                        & (obs['step'] < 150)
+                        & (player_halite > 500)
+                        & (ships_count < self.max_ships)
+                        & (not need_shipyard)):
+                    actions[shipyard] = 'SPAWN'
+                    blocked_squares[y, x] = True
+
+        return actions
+
+
+# Kaggle Agent #################################################################################################
 
+# The bot of the agent file, kaggle_environments runs the last callable of the file
+bot = BasicBot()
+
+
+def batch_agent(obs: BatchObservation, player: int, config: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    return bot.batch_agent(obs, player, config)
+
+
+@profiled_agent('basic_bot')
 def agent(obs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, str]:
-    # print('-----------------------------------------------------------------------')
-    # print(obs['step'])
-    player_id = obs['player']
-    actions = {}
-    blocked_squares = np.zeros((config['size'], config['size']), dtype=bool)
-    directions_dict = {'NORTH': [-1, 0], 'EAST': [0, 1], 'SOUTH': [1, 0], 'WEST': [0, -1], 'None': [0, 0]}
-
-    distance_matrix = create_distance_matrix(config['size'])
-
-    board_halite = board_halite_(obs, config)
-    # board_ships = board_ships_(obs, config)
-    board_shipyards = board_shipyards_(obs, config)
-
-    player_halite = obs['players'][player_id][0]
-    shipyards_dict = obs['players'][player_id][1]
-    shipyards_count = len(obs['players'][player_id][1])
-    ships_dict = obs['players'][player_id][2]
-    ships_count = len(obs['players'][player_id][2])
-    # Sort ships by halite content to give ship with most halite highest priority for its action
-    ordered_ships_dict = {key: value for key, value in sorted(ships_dict.items(), key=lambda item: item[1][1],
-                                                              reverse=True)}
-
-    need_shipyard = need_shipyard_(shipyards_count, ships_count)
-
-    for ship in ordered_ships_dict:
-        ship_position = ordered_ships_dict[ship][0]
-        ship_score = score(board_halite, board_shipyards, ordered_ships_dict[ship], obs['player'],
-                           config['size'], distance_matrix)
-        target_coordinates = np.array(np.unravel_index(np.argmax(ship_score), ship_score.shape))
-        target_position = get_position(target_coordinates, config['size'])
-
-        if need_shipyard & (shipyards_count < max_shipyards) & (player_halite > 500):
-            ship_action = 'CONVERT'
-            need_shipyard = False
-        else:
-            ship_action = pathfinder(ship_position, target_position, blocked_squares, distance_matrix,
-                                     config['size'])
-
-            ship_coordinates = get_coordinates(ship_position, config['size'])
-            action_target_coordinates = (ship_coordinates + directions_dict[ship_action]) % config['size']
-            blocked_squares[action_target_coordinates[0], action_target_coordinates[1]] = True
-
-        if ship_action == 'None':
-            ship_action = None
-
-        if ship_action is not None:
-            actions[ship] = ship_action
-
-    for shipyard in shipyards_dict:
-        shipyard_position = shipyards_dict[shipyard]
-        shipyard_coordinates = get_coordinates(shipyard_position, config['size'])
-        if ((not blocked_squares.item(tuple(shipyard_coordinates)))
-                & (obs['step'] < 150)
-                & (player_halite > 500)
-                & (ships_count < max_ships)
-                & (not need_shipyard)):
-            actions[shipyard] = 'SPAWN'
-            blocked_squares[shipyard_coordinates[0], shipyard_coordinates[1]] = True
-
-    return actions
+    return bot(obs, config)
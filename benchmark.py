@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import platform
+import random
+import time
+from typing import Any, Callable, Dict, List, Union
+
+import numpy as np
+from kaggle_environments import make
+from kaggle_environments.utils import structify
+
+import basic_bot
+import bot_swarm
+import task_force_bot
+from forecast import HaliteForecast
+from geometry import clear_geometry_cache, get_distance_matrix
+from influence import observation_influence
+from observation import decode_observation
+
+# Benchmark ############################################################################################################
+
+# Microbenchmarks of the hot paths and full-turn latency of every agent. Observation sequences are recorded once per
+# board size (this needs the halite environment) and replayed into the agents afterwards, so the benchmark runs offline
+# and every run sees the same boards. Results are written as JSON and can be compared against a saved baseline:
+#
+#     python benchmark.py --output baseline.json
+#     python benchmark.py --output optimized.json --compare baseline.json
+
+benchmark_sizes = [13, 21, 41]
+recorded_steps = 200
+benchmark_seed = 42
+# Seat of every bot in the recorded games, each agent is replayed from its own seat
+agent_seats = {'task_force_bot': 0, 'basic_bot': 1, 'bot_swarm': 2}
+
+
+# Observations #########################################################################################################
+
+def record_observations(size: int, steps: int, seed: int) -> Dict[str, Any]:
+    # Plays one game of our bots and keeps the observation of every step (the player is set when replaying)
+    bots = fresh_bots(seed)
+    environment = make('halite', configuration={'size': size, 'randomSeed': seed, 'episodeSteps': steps})
+    environment.run([bots['task_force_bot'], bots['basic_bot'], bots['bot_swarm'], basic_bot.BasicBot()])
+
+    observations = [step[0]['observation'] for step in environment.steps]
+    return {'configuration': dict(environment.configuration), 'observations': observations}
+
+
+def load_observations(directory: str, size: int, steps: int, seed: int) -> Dict[str, Any]:
+    path = os.path.join(directory, f'observations_{size}_{steps}_{seed}.json')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as observations_file:
+            json.dump(record_observations(size, steps, seed), observations_file)
+    with open(path) as observations_file:
+        return json.load(observations_file)
+
+
+# Timing ###############################################################################################################
+
+def measure(function: Callable, setup: Union[Callable, None] = None, repeat: int = 50) -> Dict[str, float]:
+    # Timing of function(*setup()) in milliseconds, the setup is not part of the measured time and returns the
+    # arguments of the function (or None if there are none)
+    times = []
+    for _ in range(repeat):
+        arguments = (setup() if setup is not None else None) or ()
+        start = time.perf_counter()
+        function(*arguments)
+        times.append(time.perf_counter() - start)
+    times = 1000 * np.array(times)
+    return {'median_ms': float(np.median(times)), 'min_ms': float(np.min(times)), 'mean_ms': float(np.mean(times)),
+            'p95_ms': float(np.percentile(times, 95)), 'max_ms': float(np.max(times)), 'runs': repeat}
+
+
+def fresh_bots(seed: int = benchmark_seed) -> Dict[str, Callable]:
+    # New instances of the bots for every replay, as the bots keep state between turns
+    random.seed(seed)
+    return {'basic_bot': basic_bot.BasicBot(), 'bot_swarm': bot_swarm.SwarmBot(),
+            'task_force_bot': task_force_bot.TaskForceBot()}
+
+
+# Microbenchmarks ######################################################################################################
+
+def microbenchmarks(recording: Dict[str, Any], repeat: int) -> List[Dict[str, Any]]:
+    config = structify(recording['configuration'])
+    size = config['size']
+    # A board from the middle of the game has a realistic amount of ships and shipyards
+    middle = len(recording['observations']) // 2
+    obs = recording['observations'][middle]
+    previous_halite = np.array(recording['observations'][max(middle - 1, 0)]['halite'], dtype=float)
+    basic_obs = structify(dict(obs, player=agent_seats['basic_bot']))
+    swarm_obs = structify(dict(obs, player=agent_seats['bot_swarm']))
+    bots = fresh_bots()
+
+    distance_matrix = get_distance_matrix(size)
+    player_id = agent_seats['basic_bot']
+    observation = decode_observation(basic_obs, size)
+    board_halite = observation.board_halite
+    board_shipyards = observation.board_shipyards
+    board_forecast = HaliteForecast(size)
+    board_forecast.update(board_halite)
+    board_influence = observation_influence(observation.ships, player_id, size)
+    ships = np.array(list(basic_obs['players'][player_id][2].values()), dtype=int).reshape(-1, 2)
+    targets = np.argmax(basic_bot.score_fleet(board_halite, board_shipyards, ships[:, 0], ships[:, 1], player_id,
+                                              size, distance_matrix, halite_forecast=board_forecast,
+                                              influence=board_influence)
+                        .reshape(ships.shape[0], size ** 2), axis=1)
+    ship = ships[0].tolist() if ships.size > 0 else [0, 0]
+    target = int(targets[0]) if targets.size > 0 else 0
+
+    task_force = bots['task_force_bot']
+    task_force.distance_matrix = distance_matrix
+    task_force.starting_position = ship[0]
+    swarm = bots['bot_swarm']
+    swarm.define_some_globals(config)
+
+    def previous_forecast() -> tuple:
+        halite_forecast = HaliteForecast(size)
+        halite_forecast.update(previous_halite)
+        return halite_forecast,
+
+    benchmarks = {
+        'create_distance_matrix': measure(lambda: basic_bot.create_distance_matrix(size), clear_geometry_cache,
+                                          repeat=max(repeat // 10, 3)),
+        'decode_observation': measure(lambda: decode_observation(basic_obs, size), repeat=repeat),
+        'score': measure(lambda: basic_bot.score(board_halite, board_shipyards, ship, player_id, size,
+                                                 distance_matrix, halite_forecast=board_forecast,
+                                                 influence=board_influence), repeat=repeat),
+        'score_fleet': measure(lambda: basic_bot.score_fleet(board_halite, board_shipyards, ships[:, 0], ships[:, 1],
+                                                             player_id, size, distance_matrix,
+                                                             halite_forecast=board_forecast,
+                                                             influence=board_influence), repeat=repeat),
+        'pathfinder': measure(lambda: basic_bot.pathfinder(ship[0], target, np.zeros((size, size), dtype=bool),
+                                                           distance_matrix, size), repeat=repeat),
+        'halite_forecast': measure(lambda halite_forecast: halite_forecast.update(board_halite), previous_forecast,
+                                   repeat=repeat),
+        'influence_fields': measure(lambda: observation_influence(observation.ships, player_id, size), repeat=repeat),
+        'danger': measure(lambda: board_influence.danger(np.zeros(ships.shape[0], dtype=int), ships[:, 1]),
+                          repeat=repeat),
+        'select_moves': measure(lambda: basic_bot.select_moves(ships[:, 0], targets, np.zeros((size, size), dtype=bool),
+                                                               distance_matrix, size), repeat=repeat),
+        'determine_shipyard_positions': measure(lambda: task_force.determine_shipyard_positions(board_halite, size),
+                                                repeat=repeat),
+        'get_map': measure(lambda: swarm.get_map(swarm_obs), repeat=repeat),
+        'actions_of_ships': measure(swarm.actions_of_ships, lambda: (swarm.adapt_environment(swarm_obs, config),),
+                                    repeat=repeat),
+    }
+    return [dict(name=name, size=size, ships=int(ships.shape[0]), **timing) for name, timing in benchmarks.items()]
+
+
+# Full Turns ###########################################################################################################
+
+def turn_latency(recording: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Replays the recorded observations into every agent from its own seat and times each turn
+    config = structify(recording['configuration'])
+
+    results = []
+    for agent_name, seat in agent_seats.items():
+        agent = fresh_bots()[agent_name]
+        observations = [structify(dict(obs, player=seat)) for obs in recording['observations']]
+
+        times = []
+        for obs in observations:
+            start = time.perf_counter()
+            agent(obs, config)
+            times.append(time.perf_counter() - start)
+        times = 1000 * np.array(times)
+        results.append({'name': f'turn_{agent_name}', 'size': config['size'], 'median_ms': float(np.median(times)),
+                        'min_ms': float(np.min(times)), 'mean_ms': float(np.mean(times)),
+                        'p95_ms': float(np.percentile(times, 95)), 'max_ms': float(np.max(times)),
+                        'runs': len(times)})
+    return results
+
+
+# Comparison ###########################################################################################################
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Speedup of the median time against the baseline for every benchmark present in both runs
+    baseline_times = {(result['name'], result['size']): result['median_ms'] for result in baseline['results']}
+    comparison = []
+    for result in results['results']:
+        key = (result['name'], result['size'])
+        if key in baseline_times:
+            comparison.append({'name': result['name'], 'size': result['size'], 'baseline_ms': baseline_times[key],
+                               'median_ms': result['median_ms'],
+                               'speedup': baseline_times[key] / max(result['median_ms'], 1e-9)})
+    return comparison
+
+
+def run_benchmarks(sizes: List[int], steps: int, repeat: int, observations_directory: str) -> Dict[str, Any]:
+    results = []
+    for size in sizes:
+        recording = load_observations(observations_directory, size, steps, benchmark_seed)
+        results += microbenchmarks(recording, repeat)
+        results += turn_latency(recording)
+
+    meta = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'steps': steps, 'repeat': repeat, 'seed': benchmark_seed,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'meta': meta, 'results': results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths and full turns of the bots.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=benchmark_sizes)
+    parser.add_argument('--steps', type=int, default=recorded_steps, help='recorded steps per board size')
+    parser.add_argument('--repeat', type=int, default=50, help='repetitions of every microbenchmark')
+    parser.add_argument('--observations', default='benchmark_observations', help='directory of the recordings')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help='results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.steps, args.repeat, args.observations)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            results['comparison'] = compare(results, json.load(baseline_file))
+
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+
+    rows = results.get('comparison', results['results'])
+    for row in rows:
+        speedup = f"{row['speedup']:8.2f}x" if 'speedup' in row else ''
+        print(f"{row['name']:30} {row['size']:4d} {row['median_ms']:10.3f} ms {speedup}")
+
+
+if __name__ == '__main__':
+    main()
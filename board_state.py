@@ -0,0 +1,122 @@
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from observation import DecodedObservation, decode_players, empty
+
+# Board State ##########################################################################################################
+
+# Keeps the boards of the previous turn and only applies the differences to the new observation, instead of rebuilding
+# every board from scratch. The unit tables come from the shared decoder (observation.py) and the boards follow its
+# conventions: [y, x] indexing and the owner of the unit on every square, `empty` (-1) on squares without one. The
+# differences are reported as well, so the bots can react to events (spawns, moves, lost units, changed halite) instead
+# of scanning every unit each turn.
+#
+# WARNING: The boards are updated in place and shared by everyone holding the BoardState (including its observation).
+#          Copy them before modifying.
+
+
+class BoardChanges(NamedTuple):
+    # Ship changes are given by (ship_id, owner, old_position, new_position), positions are None if not on the board
+    ships_spawned: List[Tuple[str, int, None, int]]
+    ships_moved: List[Tuple[str, int, int, int]]
+    ships_destroyed: List[Tuple[str, int, int, None]]
+    # Shipyard changes are given by (shipyard_id, owner, position)
+    shipyards_created: List[Tuple[str, int, int]]
+    shipyards_lost: List[Tuple[str, int, int]]
+    # Positions of all squares with changed halite
+    halite_changed: np.ndarray
+
+
+class BoardState:
+    def __init__(self, size: int):
+        self.size = size
+        self.step = -1
+        self.observation: DecodedObservation = None
+
+        self.board_halite = np.zeros((size, size))
+        self.board_ships = np.full((size, size), empty, dtype=np.int8)
+        self.board_ships_cargo = np.zeros((size, size))
+        self.board_shipyards = np.full((size, size), empty, dtype=np.int8)
+
+        # Unit tables of the previous turn: ship_id -> (owner, position, cargo) and shipyard_id -> (owner, position)
+        self.ships = {}
+        self.shipyards = {}
+        # Step in which a unit has been seen for the first time
+        self.first_seen = {}
+
+    def update(self, obs: Dict[str, Any]) -> BoardChanges:
+        # Flat views share the memory of the boards, a position can therefore be used as index directly
+        board_ships = self.board_ships.reshape(-1)
+        board_ships_cargo = self.board_ships_cargo.reshape(-1)
+        board_shipyards = self.board_shipyards.reshape(-1)
+        board_halite = self.board_halite.reshape(-1)
+
+        halite = np.asarray(obs['halite'], dtype=float)
+        halite_changed = np.flatnonzero(halite != board_halite)
+        board_halite[halite_changed] = halite[halite_changed]
+
+        player_halite, ship_table, ship_ids, shipyard_table, shipyard_ids = decode_players(obs, self.size)
+        ships = dict(zip(ship_ids, zip(ship_table['owner'].tolist(), ship_table['position'].tolist(),
+                                       ship_table['cargo'].tolist())))
+        shipyards = dict(zip(shipyard_ids, zip(shipyard_table['owner'].tolist(), shipyard_table['position'].tolist())))
+
+        ships_spawned = []
+        ships_moved = []
+        ships_destroyed = []
+        shipyards_created = []
+        shipyards_lost = []
+
+        # Clear all squares that have been left before placing units, as a ship can move onto a square that has just
+        # been left by another one
+        for ship_id, (owner, position, cargo) in self.ships.items():
+            new_ship = ships.get(ship_id)
+            if new_ship is None:
+                ships_destroyed.append((ship_id, owner, position, None))
+                self.first_seen.pop(ship_id, None)
+            elif new_ship[1] != position:
+                ships_moved.append((ship_id, owner, position, new_ship[1]))
+            elif new_ship[2] != cargo:
+                board_ships_cargo[position] = new_ship[2]
+                continue
+            else:
+                continue
+            board_ships[position] = empty
+            board_ships_cargo[position] = 0
+
+        for ship_id, (owner, position, _) in ships.items():
+            if ship_id not in self.ships:
+                ships_spawned.append((ship_id, owner, None, position))
+                self.first_seen[ship_id] = obs['step']
+        for ship_id, owner, _, position in ships_spawned + ships_moved:
+            board_ships[position] = owner
+            board_ships_cargo[position] = ships[ship_id][2]
+
+        for shipyard_id, (owner, position) in self.shipyards.items():
+            if shipyard_id not in shipyards:
+                shipyards_lost.append((shipyard_id, owner, position))
+                board_shipyards[position] = empty
+                self.first_seen.pop(shipyard_id, None)
+        for shipyard_id, (owner, position) in shipyards.items():
+            if shipyard_id not in self.shipyards:
+                shipyards_created.append((shipyard_id, owner, position))
+                board_shipyards[position] = owner
+                self.first_seen[shipyard_id] = obs['step']
+
+        # The observation shares the boards of the state
+        self.observation = DecodedObservation(obs['step'], obs['player'], self.size, player_halite, ship_table,
+                                              ship_ids, shipyard_table, shipyard_ids, self.board_halite,
+                                              self.board_ships, self.board_ships_cargo, self.board_shipyards)
+        self.ships = ships
+        self.shipyards = shipyards
+        self.step = obs['step']
+
+        return BoardChanges(ships_spawned, ships_moved, ships_destroyed, shipyards_created, shipyards_lost,
+                            halite_changed)
+
+
+def get_board_state(board_state: BoardState, size: int) -> BoardState:
+    # Reuses the given board state if it matches the board size, otherwise starts from an empty board
+    if board_state is None or board_state.size != size:
+        board_state = BoardState(size)
+    return board_state
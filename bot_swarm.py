@@ -1,335 +1,436 @@
 import random
+from functools import lru_cache
 
+import numpy as np
 
-# FUNCTIONS###################################################
-def get_map(obs):
-    """ get map as two dimensional array of objects and set amounts of halite in each cell """
-    game_map = []
-    for x in range(conf.size):
-        game_map.append([])
-        for y in range(conf.size):
-            game_map[x].append({
-                # value will be ID of owner
-                "shipyard": None,
-                # value will be ID of owner
-                "ship": None,
-                # value will be amount of halite
-                "ship_cargo": None,
-                # amount of halite
-                "halite": obs.halite[conf.size * y + x]
-            })
-    return game_map
-
-
-def get_my_units_coords_and_update_map(s_env):
-    """ get lists of coords of my units and update locations of ships and shipyards on the map """
-    # arrays of (x, y) coords
-    my_shipyards_coords = []
-    my_ships_coords = []
-
-    for player in range(len(s_env["obs"].players)):
-        shipyards = list(s_env["obs"].players[player][1].values())
-        for shipyard in shipyards:
-            x = shipyard % conf.size
-            y = shipyard // conf.size
-            # place shipyard on the map
-            s_env["map"][x][y]["shipyard"] = player
-            if player == s_env["obs"].player:
-                my_shipyards_coords.append((x, y))
-
-        ships = list(s_env["obs"].players[player][2].values())
-        for ship in ships:
-            x = ship[0] % conf.size
-            y = ship[0] // conf.size
-            # place ship on the map
-            s_env["map"][x][y]["ship"] = player
-            s_env["map"][x][y]["ship_cargo"] = ship[1]
-            if player == s_env["obs"].player:
-                my_ships_coords.append((x, y))
-    return my_shipyards_coords, my_ships_coords
-
-
-def get_c(c):
-    """ get coordinate, considering donut type of the map """
-    return c % conf.size
+from influence import observation_influence
+from observation import decode_observation
+from profiling import profiled_agent, profiler
 
 
+# FUNCTIONS###################################################
 def clear(x, y, player, game_map):
     """ check if cell is safe to move in """
     # if there is no shipyard, or there is player's shipyard
     # and there is no ship
-    if ((game_map[x][y]["shipyard"] == player or game_map[x][y]["shipyard"] == None) and
-            game_map[x][y]["ship"] == None):
+    if ((game_map["shipyard"][y, x] == player or game_map["shipyard"][y, x] == -1) and
+            game_map["ship"][y, x] == -1):
         return True
     return False
 
 
-def move_ship(x_initial, y_initial, actions, s_env, ship_index):
-    """ move the ship according to first acceptable tactic """
-    ok, actions = boarding(x_initial, y_initial, s_env["ships_keys"][ship_index], actions, s_env, ship_index)
-    if ok:
-        return actions
-    ok, actions = go_for_halite(x_initial, y_initial, s_env["ships_keys"][ship_index], actions, s_env)
-    if ok:
-        return actions
-    ok, actions = unload_halite(x_initial, y_initial, s_env["ships_keys"][ship_index], actions, s_env, ship_index)
-    if ok:
-        return actions
-    return standard_patrol(x_initial, y_initial, s_env["ships_keys"][ship_index], actions, s_env, ship_index)
-
-
-def boarding(x_initial, y_initial, ship_id, actions, s_env, ship_index):
-    """ Yo Ho Ho and a Bottle of Rum!!! """
-    # direction of ship with biggest prize
-    biggest_prize = None
-    for d in range(len(directions_list)):
-        x = directions_list[d]["x"](x_initial)
-        y = directions_list[d]["y"](y_initial)
-        # if ship is there, has enough halite and safe for boarding
-        if (s_env["map"][x][y]["ship"] != s_env["obs"].player and
-                s_env["map"][x][y]["ship"] != None and
-                s_env["map"][x][y]["ship_cargo"] > s_env["ships_values"][ship_index][1] and
-                not enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
-            # if current ship has more than biggest prize
-            if biggest_prize == None or s_env["map"][x][y]["ship_cargo"] > biggest_prize:
-                biggest_prize = s_env["map"][x][y]["ship_cargo"]
-                direction = directions_list[d]["direction"]
-                direction_x = x
-                direction_y = y
-    # if ship is there, has enough halite and safe for boarding
-    if biggest_prize != None:
-        actions[ship_id] = direction
-        s_env["map"][x_initial][y_initial]["ship"] = None
-        s_env["map"][direction_x][direction_y]["ship"] = s_env["obs"].player
-        return True, actions
-    return False, actions
-
-
-def go_for_halite(x_initial, y_initial, ship_id, actions, s_env):
-    """ ship will go to safe cell with enough halite, if it is found """
-    # biggest amount of halite among scanned cells
-    most_halite = low_amount_of_halite
-    for d in range(len(directions_list)):
-        x = directions_list[d]["x"](x_initial)
-        y = directions_list[d]["y"](y_initial)
-        # if cell is safe to move in
-        if (clear(x, y, s_env["obs"].player, s_env["map"]) and
-                not enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
-            # if current cell has more than biggest amount of halite
-            if s_env["map"][x][y]["halite"] > most_halite:
-                most_halite = s_env["map"][x][y]["halite"]
-                direction = directions_list[d]["direction"]
-                direction_x = x
-                direction_y = y
-    # if cell is safe to move in and has substantial amount of halite
-    if most_halite > low_amount_of_halite:
-        actions[ship_id] = direction
-        s_env["map"][x_initial][y_initial]["ship"] = None
-        s_env["map"][direction_x][direction_y]["ship"] = s_env["obs"].player
-        return True, actions
-    return False, actions
-
-
-def unload_halite(x_initial, y_initial, ship_id, actions, s_env, ship_index):
-    """ unload ship's halite if there is any and Swarm's shipyard is near """
-    if s_env["ships_values"][ship_index][1] > 0:
-        for d in range(len(directions_list)):
-            x = directions_list[d]["x"](x_initial)
-            y = directions_list[d]["y"](y_initial)
-            # if shipyard is there and unoccupied
-            if (clear(x, y, s_env["obs"].player, s_env["map"]) and
-                    s_env["map"][x][y]["shipyard"] == s_env["obs"].player):
-                actions[ship_id] = directions_list[d]["direction"]
-                s_env["map"][x_initial][y_initial]["ship"] = None
-                s_env["map"][x][y]["ship"] = s_env["obs"].player
-                return True, actions
-    return False, actions
+def get_directions(i0, i1, i2, i3):
+    """ get list of directions in a certain sequence """
+    return [directions_list[i0], directions_list[i1], directions_list[i2], directions_list[i3]]
 
 
-def standard_patrol(x_initial, y_initial, ship_id, actions, s_env, ship_index):
+def enemy_ship_near(x, y, player, game_map, cargo=None):
     """
-        ship will move in expanding circles clockwise or counterclockwise
-        until reaching maximum radius, then radius will be minimal again
+        check if enemy ship is in one move away from game_map[y, x],
+        if cargo is given only enemy ships that would win a collision with a ship carrying that cargo count
     """
-    directions = ships_data[ship_id]["directions"]
-    # set index of direction
-    i = ships_data[ship_id]["directions_index"]
-    direction_found = False
-    for j in range(len(directions)):
-        x = directions[i]["x"](x_initial)
-        y = directions[i]["y"](y_initial)
-        # if cell is ok to move in
-        if (clear(x, y, s_env["obs"].player, s_env["map"]) and
-                not enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
-            ships_data[ship_id]["moves_done"] += 1
-            # apply changes to game_map, to avoid collisions of player's ships next turn
-            s_env["map"][x_initial][y_initial]["ship"] = None
-            s_env["map"][x][y]["ship"] = s_env["obs"].player
-            # if it was last move in this direction
-            if ships_data[ship_id]["moves_done"] >= ships_data[ship_id]["ship_max_moves"]:
-                ships_data[ship_id]["moves_done"] = 0
-                ships_data[ship_id]["directions_index"] += 1
-                # if it is last direction in a list
-                if ships_data[ship_id]["directions_index"] >= len(directions):
-                    ships_data[ship_id]["directions_index"] = 0
-                    ships_data[ship_id]["ship_max_moves"] += 1
-                    # if ship_max_moves reached maximum radius expansion
-                    if ships_data[ship_id]["ship_max_moves"] > max_moves_amount:
-                        ships_data[ship_id]["ship_max_moves"] = 1
-            actions[ship_id] = directions[i]["direction"]
-            direction_found = True
-            break
-        else:
-            # loop through directions
-            i += 1
-            if i >= len(directions):
-                i = 0
-    # if ship is not on shipyard and surrounded by opponent's units
-    # and there is enough halite to convert
-    if (not direction_found and s_env["map"][x_initial][y_initial]["shipyard"] == None and
-            (s_env["my_halite"] + s_env["ships_values"][ship_index][1]) >= conf.convertCost):
-        actions[ship_id] = "CONVERT"
-        s_env["map"][x_initial][y_initial]["ship"] = None
-    return actions
+    if cargo is None:
+        return bool(game_map["threat"][y, x])
+    # a collision of ships with equal cargo destroys both of them
+    return bool(game_map["threat_cargo"][y, x] <= cargo)
 
 
-def get_directions(i0, i1, i2, i3):
-    """ get list of directions in a certain sequence """
-    return [directions_list[i0], directions_list[i1], directions_list[i2], directions_list[i3]]
+def set_threat_layers(game_map, player):
+    """ mark all cells in one move away from an enemy ship and the smallest cargo of those enemy ships """
+    ships = game_map["ship"]
+    enemy_ships = (ships != player) & (ships != -1)
+    enemy_cargo = np.where(enemy_ships, game_map["ship_cargo"], np.inf)
+    game_map["threat"] = (np.roll(enemy_ships, 1, axis=0) | np.roll(enemy_ships, -1, axis=0) |
+                          np.roll(enemy_ships, 1, axis=1) | np.roll(enemy_ships, -1, axis=1))
+    game_map["threat_cargo"] = np.minimum(np.minimum(np.roll(enemy_cargo, 1, axis=0), np.roll(enemy_cargo, -1, axis=0)),
+                                          np.minimum(np.roll(enemy_cargo, 1, axis=1), np.roll(enemy_cargo, -1, axis=1)))
 
 
-def enemy_ship_near(x, y, player, game_map):
-    """ check if enemy ship is in one move away from game_map[x][y] """
-    if (
-            (game_map[x][get_c(y - 1)]["ship"] != player and game_map[x][get_c(y - 1)]["ship"] != None) or
-            (game_map[x][get_c(y + 1)]["ship"] != player and game_map[x][get_c(y + 1)]["ship"] != None) or
-            (game_map[get_c(x + 1)][y]["ship"] != player and game_map[get_c(x + 1)][y]["ship"] != None) or
-            (game_map[get_c(x - 1)][y]["ship"] != player and game_map[get_c(x - 1)][y]["ship"] != None)
-    ): return True
-    return False
+@lru_cache(maxsize=4)
+def get_spiral_table(max_moves_amount):
+    """
+        precompute the patrol of every movement tactic: a ship moves radius times in each of the 4 directions of its
+        tactic, for radius from its starting radius up to max_moves_amount and then from 1 again, so its patrol state
+        is just its phase in this cycle,
+        returns directions to probe (indexes of directions_list) for every tactic and phase,
+        and the first phase of every radius (index radius - 1)
+    """
+    radii = np.arange(1, max_moves_amount + 1)
+    radius_start = 2 * radii * (radii - 1)
+    phase_radius = np.repeat(radii, 4 * radii)
+    # index of the direction of the tactic in every phase
+    phase_directions_index = (np.arange(phase_radius.size) - radius_start[phase_radius - 1]) // phase_radius
+    # if the cell in the direction is not ok, the next directions of the tactic are probed
+    probes = (phase_directions_index[:, np.newaxis] + np.arange(4)) % 4
+    tactics = np.array([[directions_list.index(direction) for direction in tactic["directions"]]
+                        for tactic in movement_tactics])
+    spiral_table = tactics[:, probes]
+    spiral_table.setflags(write=False)
+    radius_start.setflags(write=False)
+    return spiral_table, radius_start
 
 
-def define_some_globals(configuration):
-    """ define some of the global variables """
-    global conf
-    global convert_threshold
-    global max_moves_amount
-    global globals_not_defined
-    conf = configuration
-    convert_threshold = conf.convertCost + conf.spawnCost * 2
-    max_moves_amount = conf.size
-    globals_not_defined = False
-
-
-def adapt_environment(observation, configuration):
-    """ adapt environment for the Swarm """
-    s_env = {}
-    s_env["obs"] = observation
-    if globals_not_defined:
-        define_some_globals(configuration)
-    s_env["map"] = get_map(s_env["obs"])
-    s_env["my_halite"] = s_env["obs"].players[s_env["obs"].player][0]
-    s_env["my_shipyards_coords"], s_env["my_ships_coords"] = get_my_units_coords_and_update_map(s_env)
-    s_env["ships_keys"] = list(s_env["obs"].players[s_env["obs"].player][2].keys())
-    s_env["ships_values"] = list(s_env["obs"].players[s_env["obs"].player][2].values())
-    s_env["shipyards_keys"] = list(s_env["obs"].players[s_env["obs"].player][1].keys())
-    return s_env
-
-
-def actions_of_ships(s_env):
-    """ actions of every ship of the Swarm """
-    global movement_tactics_index
-    actions = {}
-    for i in range(len(s_env["my_ships_coords"])):
-        x = s_env["my_ships_coords"][i][0]
-        y = s_env["my_ships_coords"][i][1]
-        # if this is a new ship
-        if s_env["ships_keys"][i] not in ships_data:
-            ships_data[s_env["ships_keys"][i]] = {
-                "moves_done": 0,
-                "ship_max_moves": random.randint(1, max_moves_amount),
-                "directions": movement_tactics[movement_tactics_index]["directions"],
-                "directions_index": 0
-            }
-            movement_tactics_index += 1
-            if movement_tactics_index >= movement_tactics_amount:
-                movement_tactics_index = 0
-        # if ship has enough halite to convert to shipyard and not at halite source ot it's last step
-        elif ((s_env["ships_values"][i][1] >= convert_threshold and s_env["map"][x][y]["halite"] == 0) or
-              (s_env["obs"].step == (conf.episodeSteps - 2) and s_env["ships_values"][i][1] >= conf.convertCost)):
-            actions[s_env["ships_keys"][i]] = "CONVERT"
-            s_env["map"][x][y]["ship"] = None
-        # if there is no shipyards and enough halite to spawn few ships
-        elif len(s_env["shipyards_keys"]) == 0 and s_env["my_halite"] >= convert_threshold:
-            s_env["my_halite"] -= conf.convertCost
-            actions[s_env["ships_keys"][i]] = "CONVERT"
-            s_env["map"][x][y]["ship"] = None
-        else:
-            # if this cell has low amount of halite or enemy ship is near
-            if (s_env["map"][x][y]["halite"] < low_amount_of_halite or
-                    enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
-                actions = move_ship(x, y, actions, s_env, i)
-    return actions
-
-
-def actions_of_shipyards(actions, s_env):
-    """ actions of every shipyard of the Swarm """
-    ships_amount = len(s_env["ships_keys"])
-    # spawn ships from every shipyard, if possible
-    # iterate through shipyards starting from last created
-    for i in range(len(s_env["my_shipyards_coords"]))[::-1]:
-        if s_env["my_halite"] >= conf.spawnCost and ships_amount <= spawn_limit:
-            x = s_env["my_shipyards_coords"][i][0]
-            y = s_env["my_shipyards_coords"][i][1]
-            # if there is currently no ship on shipyard
-            if clear(x, y, s_env["obs"].player, s_env["map"]):
-                s_env["my_halite"] -= conf.spawnCost
-                actions[s_env["shipyards_keys"][i]] = "SPAWN"
-                s_env["map"][x][y]["ship"] = s_env["obs"].player
-                ships_amount += 1
+# THE_SWARM####################################################
+class SwarmBot:
+    """ the Swarm, every instance keeps its own ships data and map, so several Swarms can play in the same process """
+
+    def __init__(self, low_amount_of_halite=10, spawn_limit=50, convert_threshold=None, danger_aversion=0):
+        self.conf = None
+        # max amount of moves in one direction before turning
+        self.max_moves_amount = None
+        # threshold of harvested by a ship halite to convert, convertCost + 2 * spawnCost if None
+        self.convert_threshold_setting = convert_threshold
+        self.convert_threshold = convert_threshold
+        self.spiral_table = None
+        self.radius_start = None
+        self.reset_ships()
+        # amount of halite, that is considered to be low
+        self.low_amount_of_halite = low_amount_of_halite
+        # limit of ships to spawn
+        self.spawn_limit = spawn_limit
+        # halite and prizes of cells are divided by 1 + danger_aversion * danger of the cell, 0 to ignore the danger
+        self.danger_aversion = danger_aversion
+        # not all variables are defined
+        self.globals_not_defined = True
+
+    def reset_ships(self):
+        """ forget the ships of the previous game """
+        # dense slots of the ships in the patrol arrays, slots of ships that are gone are reused
+        self.ship_slots = {}
+        self.free_slots = []
+        # movement tactic and phase of the patrol (see get_spiral_table) of the ship in every slot
+        self.patrol_tactic = np.zeros(0, dtype=int)
+        self.patrol_phase = np.zeros(0, dtype=int)
+        # initial movement_tactics index
+        self.movement_tactics_index = 0
+
+    def get_map(self, obs):
+        """
+            get map as dictionary of [y, x] arrays from the decoded observation, owners are -1 where there is none,
+            and the influence fields of the Swarm (None if the danger is ignored, they are only used for it)
+        """
+        observation = decode_observation(obs, self.conf.size)
+        influence = None
+        if self.danger_aversion != 0:
+            influence = observation_influence(observation.ships, obs.player, self.conf.size)
+        return {
+            # value will be ID of owner, -1 if there is none
+            "shipyard": observation.board_shipyards,
+            # value will be ID of owner, -1 if there is none
+            "ship": observation.board_ships,
+            # value will be amount of halite
+            "ship_cargo": observation.board_ships_cargo,
+            # amount of halite
+            "halite": observation.board_halite,
+            # distance-weighted amount of enemy ships, their cargo and Swarm's ships around the cell
+            "enemy_pressure": self.influence_layer(influence, "enemy_pressure"),
+            "enemy_cargo": self.influence_layer(influence, "enemy_cargo"),
+            "friendly_control": self.influence_layer(influence, "friendly_control"),
+            "influence": influence,
+            "observation": observation
+        }
+
+    def influence_layer(self, influence, field):
+        """ get [y, x] array of the influence field, None without influence fields """
+        if influence is None:
+            return None
+        return getattr(influence, field).reshape(self.conf.size, self.conf.size)
+
+    def get_my_units_coords(self, s_env):
+        """ get lists of (x, y) coords of my units """
+        observation = s_env["map"]["observation"]
+        shipyards = observation.shipyards[observation.player_shipyards(s_env["obs"].player)]
+        ships = observation.ships[observation.player_ships(s_env["obs"].player)]
+        return (list(zip(shipyards["x"].tolist(), shipyards["y"].tolist())),
+                list(zip(ships["x"].tolist(), ships["y"].tolist())))
+
+    def get_ships_danger(self, s_env):
+        """ get danger of every cell for every ship of the Swarm, None if the danger is ignored """
+        if self.danger_aversion == 0:
+            return None
+        observation = s_env["map"]["observation"]
+        ships = observation.ships[observation.player_ships(s_env["obs"].player)]
+        danger = s_env["map"]["influence"].danger(np.zeros(ships.size, dtype=int), ships["cargo"])
+        return danger.reshape(ships.size, self.conf.size, self.conf.size)
+
+    def danger_factor(self, x, y, s_env, ship_index):
+        """ get divisor of the value of game_map[y, x] for the ship, considering enemy ships that can board it """
+        if s_env["ships_danger"] is None:
+            return 1
+        return 1 + self.danger_aversion * s_env["ships_danger"][ship_index, y, x]
+
+    def get_c(self, c):
+        """ get coordinate, considering donut type of the map """
+        return c % self.conf.size
+
+    def move_ship(self, x_initial, y_initial, actions, s_env, ship_index):
+        """ move the ship according to first acceptable tactic """
+        ship_id = s_env["ships_keys"][ship_index]
+        ok, actions = self.boarding(x_initial, y_initial, ship_id, actions, s_env, ship_index)
+        if ok:
+            return actions
+        ok, actions = self.go_for_halite(x_initial, y_initial, ship_id, actions, s_env, ship_index)
+        if ok:
+            return actions
+        ok, actions = self.unload_halite(x_initial, y_initial, ship_id, actions, s_env, ship_index)
+        if ok:
+            return actions
+        return self.standard_patrol(x_initial, y_initial, ship_id, actions, s_env, ship_index)
+
+    def boarding(self, x_initial, y_initial, ship_id, actions, s_env, ship_index):
+        """ Yo Ho Ho and a Bottle of Rum!!! """
+        # direction of ship with biggest prize
+        biggest_prize = None
+        for d in range(len(directions_list)):
+            x = self.get_c(x_initial + directions_list[d]["dx"])
+            y = self.get_c(y_initial + directions_list[d]["dy"])
+            # if ship is there, has enough halite and safe for boarding
+            if (s_env["map"]["ship"][y, x] != s_env["obs"].player and
+                    s_env["map"]["ship"][y, x] != -1 and
+                    s_env["map"]["ship_cargo"][y, x] > s_env["ships_values"][ship_index][1] and
+                    not enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
+                prize = s_env["map"]["ship_cargo"][y, x] / self.danger_factor(x, y, s_env, ship_index)
+                # if current ship has more than biggest prize
+                if biggest_prize == None or prize > biggest_prize:
+                    biggest_prize = prize
+                    direction = directions_list[d]["direction"]
+                    direction_x = x
+                    direction_y = y
+        # if ship is there, has enough halite and safe for boarding
+        if biggest_prize != None:
+            actions[ship_id] = direction
+            s_env["map"]["ship"][y_initial, x_initial] = -1
+            self.claim_cell(direction_x, direction_y, s_env)
+            return True, actions
+        return False, actions
+
+    def go_for_halite(self, x_initial, y_initial, ship_id, actions, s_env, ship_index):
+        """ ship will go to safe cell with enough halite, if it is found """
+        # biggest amount of halite among scanned cells
+        most_halite = self.low_amount_of_halite
+        for d in range(len(directions_list)):
+            x = self.get_c(x_initial + directions_list[d]["dx"])
+            y = self.get_c(y_initial + directions_list[d]["dy"])
+            # if cell is safe to move in
+            if (clear(x, y, s_env["obs"].player, s_env["map"]) and
+                    not enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
+                halite = s_env["map"]["halite"][y, x] / self.danger_factor(x, y, s_env, ship_index)
+                # if current cell has more than biggest amount of halite
+                if halite > most_halite:
+                    most_halite = halite
+                    direction = directions_list[d]["direction"]
+                    direction_x = x
+                    direction_y = y
+        # if cell is safe to move in and has substantial amount of halite
+        if most_halite > self.low_amount_of_halite:
+            actions[ship_id] = direction
+            s_env["map"]["ship"][y_initial, x_initial] = -1
+            self.claim_cell(direction_x, direction_y, s_env)
+            return True, actions
+        return False, actions
+
+    def unload_halite(self, x_initial, y_initial, ship_id, actions, s_env, ship_index):
+        """ unload ship's halite if there is any and Swarm's shipyard is near """
+        if s_env["ships_values"][ship_index][1] > 0:
+            for d in range(len(directions_list)):
+                x = self.get_c(x_initial + directions_list[d]["dx"])
+                y = self.get_c(y_initial + directions_list[d]["dy"])
+                # if shipyard is there and unoccupied
+                if (clear(x, y, s_env["obs"].player, s_env["map"]) and
+                        s_env["map"]["shipyard"][y, x] == s_env["obs"].player):
+                    actions[ship_id] = directions_list[d]["direction"]
+                    s_env["map"]["ship"][y_initial, x_initial] = -1
+                    self.claim_cell(x, y, s_env)
+                    return True, actions
+        return False, actions
+
+    def standard_patrol(self, x_initial, y_initial, ship_id, actions, s_env, ship_index):
+        """
+            ship will move in expanding circles clockwise or counterclockwise
+            until reaching maximum radius, then radius will be minimal again
+        """
+        slot = self.ship_slots[ship_id]
+        direction_found = False
+        # directions in the order they are probed
+        for d in self.spiral_table[self.patrol_tactic[slot], self.patrol_phase[slot]].tolist():
+            x = self.get_c(x_initial + directions_list[d]["dx"])
+            y = self.get_c(y_initial + directions_list[d]["dy"])
+            # if cell is ok to move in
+            if (clear(x, y, s_env["obs"].player, s_env["map"]) and
+                    not enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
+                # next phase of the patrol, after the last phase of maximum radius radius will be minimal again
+                self.patrol_phase[slot] = (self.patrol_phase[slot] + 1) % self.spiral_table.shape[1]
+                # apply changes to game_map, to avoid collisions of player's ships next turn
+                s_env["map"]["ship"][y_initial, x_initial] = -1
+                self.claim_cell(x, y, s_env)
+                actions[ship_id] = directions_list[d]["direction"]
+                direction_found = True
+                break
+        # if ship is not on shipyard and surrounded by opponent's units
+        # and there is enough halite to convert
+        if (not direction_found and s_env["map"]["shipyard"][y_initial, x_initial] == -1 and
+                (s_env["my_halite"] + s_env["ships_values"][ship_index][1]) >= self.conf.convertCost):
+            actions[ship_id] = "CONVERT"
+            s_env["map"]["ship"][y_initial, x_initial] = -1
+        return actions
+
+    def add_ship(self, ship_id, tactic, max_moves):
+        """ start the patrol of a new ship in a free slot, with the radius max_moves """
+        if self.free_slots:
+            slot = self.free_slots.pop()
         else:
-            break
-    return actions
+            slot = len(self.ship_slots)
+            if slot >= self.patrol_phase.size:
+                self.patrol_tactic = np.resize(self.patrol_tactic, max(2 * slot, 16))
+                self.patrol_phase = np.resize(self.patrol_phase, max(2 * slot, 16))
+        self.ship_slots[ship_id] = slot
+        self.patrol_tactic[slot] = tactic
+        self.patrol_phase[slot] = self.radius_start[max_moves - 1]
+
+    def remove_lost_ships(self, ships_keys):
+        """ free the slots of ships, that are not in the observation anymore """
+        current = set(ships_keys)
+        for ship_id in [ship_id for ship_id in self.ship_slots if ship_id not in current]:
+            self.free_slots.append(self.ship_slots.pop(ship_id))
+
+    def update_threat(self, x, y, player, game_map):
+        """ recalculate the threat layers of game_map[y, x] from the ships next to it """
+        game_map["threat"][y, x] = False
+        game_map["threat_cargo"][y, x] = np.inf
+        for y_near, x_near in ((self.get_c(y - 1), x), (self.get_c(y + 1), x), (y, self.get_c(x + 1)),
+                               (y, self.get_c(x - 1))):
+            if game_map["ship"][y_near, x_near] != player and game_map["ship"][y_near, x_near] != -1:
+                game_map["threat"][y, x] = True
+                game_map["threat_cargo"][y, x] = min(game_map["threat_cargo"][y, x],
+                                                     game_map["ship_cargo"][y_near, x_near])
+
+    def claim_cell(self, x, y, s_env):
+        """
+            place Swarm's ship at game_map[y, x] and update the threat layers,
+            if an enemy ship has been boarded there
+        """
+        game_map = s_env["map"]
+        player = s_env["obs"].player
+        boarded = game_map["ship"][y, x] != player and game_map["ship"][y, x] != -1
+        game_map["ship"][y, x] = player
+        if boarded:
+            for y_near, x_near in ((self.get_c(y - 1), x), (self.get_c(y + 1), x), (y, self.get_c(x + 1)),
+                                   (y, self.get_c(x - 1))):
+                self.update_threat(x_near, y_near, player, game_map)
+
+    def define_some_globals(self, configuration):
+        """ define some of the variables, that depend on the configuration """
+        self.conf = configuration
+        self.convert_threshold = self.convert_threshold_setting
+        if self.convert_threshold is None:
+            self.convert_threshold = self.conf.convertCost + self.conf.spawnCost * 2
+        self.max_moves_amount = self.conf.size
+        self.spiral_table, self.radius_start = get_spiral_table(self.max_moves_amount)
+        self.globals_not_defined = False
+
+    def adapt_environment(self, observation, configuration):
+        """ adapt environment for the Swarm """
+        s_env = {}
+        s_env["obs"] = observation
+        # a new game starts over, and the variables follow the configuration (e.g. another board size)
+        if observation.step == 0:
+            self.reset_ships()
+        if self.globals_not_defined or observation.step == 0 or configuration != self.conf:
+            self.define_some_globals(configuration)
+        s_env["map"] = self.get_map(s_env["obs"])
+        s_env["my_halite"] = s_env["obs"].players[s_env["obs"].player][0]
+        s_env["my_shipyards_coords"], s_env["my_ships_coords"] = self.get_my_units_coords(s_env)
+        set_threat_layers(s_env["map"], s_env["obs"].player)
+        s_env["ships_danger"] = self.get_ships_danger(s_env)
+        s_env["ships_keys"] = list(s_env["obs"].players[s_env["obs"].player][2].keys())
+        s_env["ships_values"] = list(s_env["obs"].players[s_env["obs"].player][2].values())
+        s_env["shipyards_keys"] = list(s_env["obs"].players[s_env["obs"].player][1].keys())
+        return s_env
+
+    def actions_of_ships(self, s_env):
+        """ actions of every ship of the Swarm """
+        conf = self.conf
+        actions = {}
+        self.remove_lost_ships(s_env["ships_keys"])
+        for i in range(len(s_env["my_ships_coords"])):
+            x = s_env["my_ships_coords"][i][0]
+            y = s_env["my_ships_coords"][i][1]
+            # if this is a new ship
+            if s_env["ships_keys"][i] not in self.ship_slots:
+                self.add_ship(s_env["ships_keys"][i], self.movement_tactics_index,
+                              random.randint(1, self.max_moves_amount))
+                self.movement_tactics_index += 1
+                if self.movement_tactics_index >= movement_tactics_amount:
+                    self.movement_tactics_index = 0
+            # if ship has enough halite to convert to shipyard and not at halite source ot it's last step
+            elif ((s_env["ships_values"][i][1] >= self.convert_threshold and s_env["map"]["halite"][y, x] == 0) or
+                  (s_env["obs"].step == (conf.episodeSteps - 2) and s_env["ships_values"][i][1] >= conf.convertCost)):
+                actions[s_env["ships_keys"][i]] = "CONVERT"
+                s_env["map"]["ship"][y, x] = -1
+            # if there is no shipyards and enough halite to spawn few ships
+            elif len(s_env["shipyards_keys"]) == 0 and s_env["my_halite"] >= self.convert_threshold:
+                s_env["my_halite"] -= conf.convertCost
+                actions[s_env["ships_keys"][i]] = "CONVERT"
+                s_env["map"]["ship"][y, x] = -1
+            else:
+                # if this cell has low amount of halite or enemy ship is near
+                if (s_env["map"]["halite"][y, x] < self.low_amount_of_halite or
+                        enemy_ship_near(x, y, s_env["obs"].player, s_env["map"])):
+                    actions = self.move_ship(x, y, actions, s_env, i)
+        return actions
+
+    def actions_of_shipyards(self, actions, s_env):
+        """ actions of every shipyard of the Swarm """
+        ships_amount = len(s_env["ships_keys"])
+        # spawn ships from every shipyard, if possible
+        # iterate through shipyards starting from last created
+        for i in range(len(s_env["my_shipyards_coords"]))[::-1]:
+            if s_env["my_halite"] >= self.conf.spawnCost and ships_amount <= self.spawn_limit:
+                x = s_env["my_shipyards_coords"][i][0]
+                y = s_env["my_shipyards_coords"][i][1]
+                # if there is currently no ship on shipyard
+                if clear(x, y, s_env["obs"].player, s_env["map"]):
+                    s_env["my_halite"] -= self.conf.spawnCost
+                    actions[s_env["shipyards_keys"][i]] = "SPAWN"
+                    self.claim_cell(x, y, s_env)
+                    ships_amount += 1
+            else:
+                break
+        return actions
+
+    def __call__(self, observation, configuration):
+        """ RELEASE THE SWARM!!! """
+        with profiler.phase("boards"):
+            s_env = self.adapt_environment(observation, configuration)
+        with profiler.phase("tactics"):
+            actions = self.actions_of_ships(s_env)
+        with profiler.phase("shipyards"):
+            actions = self.actions_of_shipyards(actions, s_env)
+        return actions
 
 
 # GLOBAL_VARIABLES#############################################
-conf = None
-# max amount of moves in one direction before turning
-max_moves_amount = None
-# threshold of harvested by a ship halite to convert
-convert_threshold = None
-# object with ship ids and their data
-ships_data = {}
-# initial movement_tactics index
-movement_tactics_index = 0
-# amount of halite, that is considered to be low
-low_amount_of_halite = 10
-# limit of ships to spawn
-spawn_limit = 50
-# not all global variables are defined
-globals_not_defined = True
-
-# list of directions
+# list of directions, offsets of the coordinates are given by [y, x] = [dy, dx]
 directions_list = [
     {
         "direction": "NORTH",
-        "x": lambda z: z,
-        "y": lambda z: get_c(z - 1)
+        "dx": 0,
+        "dy": -1
     },
     {
         "direction": "EAST",
-        "x": lambda z: get_c(z + 1),
-        "y": lambda z: z
+        "dx": 1,
+        "dy": 0
     },
     {
         "direction": "SOUTH",
-        "x": lambda z: z,
-        "y": lambda z: get_c(z + 1)
+        "dx": 0,
+        "dy": 1
     },
     {
         "direction": "WEST",
-        "x": lambda z: get_c(z - 1),
-        "y": lambda z: z
+        "dx": -1,
+        "dy": 0
     }
 ]
 
@@ -354,11 +455,11 @@ movement_tactics = [
 ]
 movement_tactics_amount = len(movement_tactics)
 
+# the Swarm of the agent file, kaggle_environments runs the last callable of the file
+swarm = SwarmBot()
 
-# THE_SWARM####################################################
+
+@profiled_agent("bot_swarm")
 def swarm_agent(observation, configuration):
     """ RELEASE THE SWARM!!! """
-    s_env = adapt_environment(observation, configuration)
-    actions = actions_of_ships(s_env)
-    actions = actions_of_shipyards(actions, s_env)
-    return actions
+    return swarm(observation, configuration)
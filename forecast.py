@@ -0,0 +1,111 @@
+from functools import lru_cache
+from typing import Any, Dict, Union
+
+import numpy as np
+
+from halite_sim import default_configuration
+
+# Halite Forecast ######################################################################################################
+
+# Expected halite of every square d turns from now if no ship stays on it, in closed form:
+#     forecast[d] = min(halite * (1 + regenRate)**d, maxCellHalite)
+# A ship arriving after d turns and mining for t turns collects forecast[d] * (1 - (1 - collectRate)**t). The best
+# halite per turn of a square with d turns to get there and L turns of travel in total (there and back) is therefore
+#     forecast[d] * dwell_factors[L],    dwell_factors[L] = max_t (1 - (1 - collectRate)**t) / (L + t)
+# and scoring all squares for a ship is a gather with its distance row.
+#
+# HaliteForecast keeps the forecast between turns. The halite of a square nobody has touched is the forecast of the
+# previous turn one turn later, so the rows are a ring buffer that advances by one row per turn, and only the squares
+# whose halite differs from that prediction (mined, ships on them, rounding drift) are forecast again.
+
+# Halite by which a square may differ from its forecast before it is forecast again
+forecast_tolerance = 1e-2
+# Longest stay on a square considered by the dwell factors
+max_dwell = 32
+
+
+def forecast_horizon(size: int) -> int:
+    # The largest torus Manhattan distance, every square can be reached within the horizon
+    return 2 * (size // 2)
+
+
+@lru_cache(maxsize=8)
+def get_growth(horizon: int, regen_rate: float) -> np.ndarray:
+    # (1 + regen_rate)**d for d = 0..horizon
+    growth = (1 + regen_rate) ** np.arange(horizon + 1)
+    growth.setflags(write=False)
+    return growth
+
+
+@lru_cache(maxsize=8)
+def get_dwell_factors(travel: int, collect_rate: float) -> np.ndarray:
+    # Best fraction of the halite of a square collected per turn, for 0..travel turns of travel in total
+    dwell = np.arange(1, max_dwell + 1)
+    mined = 1 - (1 - collect_rate) ** dwell
+    dwell_factors = (mined[np.newaxis, :] / (np.arange(travel + 1)[:, np.newaxis] + dwell[np.newaxis, :])).max(axis=1)
+    dwell_factors.setflags(write=False)
+    return dwell_factors
+
+
+class HaliteForecast:
+    # Forecast of the squares of one or several games (games * size**2 squares, numbered like the flat boards)
+    def __init__(self, size: int, games: int = 1, regen_rate: float = default_configuration['regenRate'],
+                 collect_rate: float = default_configuration['collectRate'],
+                 max_cell_halite: float = default_configuration['maxCellHalite']):
+        self.size = size
+        self.games = games
+        self.regen_rate = regen_rate
+        self.collect_rate = collect_rate
+        self.max_cell_halite = max_cell_halite
+        self.horizon = forecast_horizon(size)
+        self.growth = get_growth(self.horizon, regen_rate)
+        self.dwell_factors = get_dwell_factors(2 * self.horizon, collect_rate)
+        self.table = np.zeros((self.horizon + 1, games * size ** 2))
+        # Row of the current turn in the ring buffer
+        self.start = 0
+        self.initialized = False
+
+    def _rows(self, delays: Union[int, np.ndarray]) -> Union[int, np.ndarray]:
+        return (self.start + delays) % (self.horizon + 1)
+
+    def update(self, board_halite: np.ndarray) -> int:
+        # Moves the forecast to the next turn and forecasts the squares that differ from it again, returns how many
+        halite = np.asarray(board_halite, dtype=float).reshape(-1)
+        if self.initialized:
+            # The row of the current turn becomes the row of the horizon
+            self.table[self.start] = np.minimum(self.table[self._rows(self.horizon)] * self.growth[1],
+                                                self.max_cell_halite)
+            self.start = self._rows(1)
+            changed = np.flatnonzero(np.abs(halite - self.table[self.start]) > forecast_tolerance)
+        else:
+            changed = np.arange(halite.size)
+            self.initialized = True
+        if changed.size > 0:
+            self.table[self._rows(np.arange(self.horizon + 1))[:, np.newaxis], changed] = np.minimum(
+                self.growth[:, np.newaxis] * halite[changed], self.max_cell_halite)
+        return changed.size
+
+    def expected(self, delays: np.ndarray, squares: Union[np.ndarray, None] = None) -> np.ndarray:
+        # Forecast of the squares (all squares if None) after the delays, delays and squares are broadcast together
+        cells = self.table.shape[1]
+        if squares is None:
+            squares = np.arange(cells)
+        # A flat take is much faster than indexing rows and columns, the rows wrap around at most once
+        rows = np.asarray(delays) + self.start
+        rows = rows - (self.horizon + 1) * (rows > self.horizon)
+        return np.take(self.table.reshape(-1), rows * cells + squares)
+
+    def halite_per_turn(self, delays: np.ndarray, travel: np.ndarray,
+                        squares: Union[np.ndarray, None] = None) -> np.ndarray:
+        # Best halite per turn of the squares reached after the delays, with travel turns there and back in total
+        return self.expected(delays, squares) * self.dwell_factors[travel]
+
+
+def get_halite_forecast(halite_forecast: Union[HaliteForecast, None], size: int, config: Dict[str, Any],
+                        games: int = 1) -> HaliteForecast:
+    # Reuses the given forecast if it matches the board and the rules, otherwise starts a new one
+    rules = (config['regenRate'], config['collectRate'], config['maxCellHalite'])
+    if (halite_forecast is None or halite_forecast.size != size or halite_forecast.games != games
+            or (halite_forecast.regen_rate, halite_forecast.collect_rate, halite_forecast.max_cell_halite) != rules):
+        halite_forecast = HaliteForecast(size, games, *rules)
+    return halite_forecast
@@ -0,0 +1,86 @@
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+# Geometry #############################################################################################################
+
+# Board geometry tables shared by all bots. Every table only depends on the board size, so they are built lazily on
+# first use and kept in a small cache keyed by the size. The tables are returned read-only, because they are shared
+# between all callers (and all agents running in the same process).
+#
+# WARNING: The tables use unsigned dtypes to stay compact. Subtracting two entries directly wraps around, so cast to a
+#          signed dtype (or use Python ints via .item()) before computing differences.
+
+geometry_cache_size = 4
+
+
+def distance_1d(val_1: np.ndarray, val_2: np.ndarray, size: int) -> np.ndarray:
+    min_val = np.fmin(val_1, val_2)
+    max_val = np.fmax(val_1, val_2)
+    return np.fmin(max_val - min_val, min_val + size - max_val)
+
+
+def distance_dtype(size: int) -> type:
+    # The largest torus Manhattan distance is 2 * (size // 2)
+    return np.uint8 if 2 * (size // 2) <= np.iinfo(np.uint8).max else np.uint16
+
+
+@lru_cache(maxsize=geometry_cache_size)
+def get_distance_1d(size: int) -> np.ndarray:
+    # (size, size) table of wrapped distances along a single axis
+    coordinate_range = np.arange(size)
+    distance_table = distance_1d(coordinate_range[:, np.newaxis], coordinate_range[np.newaxis, :], size)
+    distance_table = distance_table.astype(distance_dtype(size))
+    distance_table.setflags(write=False)
+    return distance_table
+
+
+@lru_cache(maxsize=geometry_cache_size)
+def get_distance_matrix(size: int) -> np.ndarray:
+    # (size**2, size**2) look-up table with distance_matrix[pos_1, pos_2] being the torus Manhattan distance.
+    # The torus distance is separable, so the table is assembled by broadcasting the 1-D distances along y and x
+    # instead of materializing all position pairs.
+    distance_table = get_distance_1d(size)
+    distance_matrix = (distance_table[:, np.newaxis, :, np.newaxis]
+                       + distance_table[np.newaxis, :, np.newaxis, :]).reshape(size ** 2, size ** 2)
+    distance_matrix.setflags(write=False)
+    return distance_matrix
+
+
+# Directions in the order used by the neighbour table, offsets are given by [y, x]
+directions = ['NORTH', 'EAST', 'SOUTH', 'WEST', 'None']
+direction_offsets = np.array([[-1, 0], [0, 1], [1, 0], [0, -1], [0, 0]])
+
+
+@lru_cache(maxsize=geometry_cache_size)
+def get_neighbour_table(size: int) -> np.ndarray:
+    # (size**2, 5) look-up table with neighbour_table[pos, d] being the position reached from pos by directions[d]
+    position_range = np.arange(size ** 2)
+    neighbour_y = (position_range[:, np.newaxis] // size + direction_offsets[:, 0]) % size
+    neighbour_x = (position_range[:, np.newaxis] % size + direction_offsets[:, 1]) % size
+    neighbour_table = (neighbour_y * size + neighbour_x).astype(np.uint16 if size ** 2 <= 2 ** 16 else np.uint32)
+    neighbour_table.setflags(write=False)
+    return neighbour_table
+
+
+@lru_cache(maxsize=geometry_cache_size)
+def get_kernel_spectrum(size: int, weights: Tuple[float, ...]) -> np.ndarray:
+    # Real FFT of the wrapped (size, size) kernel with weight weights[d] on every square at torus distance d from
+    # [0, 0], squares further away than the weights have weight 0. Multiplying by the FFT of a board convolves the
+    # board with the kernel, which sums the weighted surroundings of every square at once.
+    weight_table = np.zeros(2 * (size // 2) + 1)
+    weights = weights[:weight_table.size]
+    weight_table[:len(weights)] = weights
+    distance_from_origin = get_distance_1d(size)[0].astype(int)
+    kernel = weight_table[distance_from_origin[:, np.newaxis] + distance_from_origin[np.newaxis, :]]
+    kernel_spectrum = np.fft.rfft2(kernel)
+    kernel_spectrum.setflags(write=False)
+    return kernel_spectrum
+
+
+def clear_geometry_cache() -> None:
+    get_distance_1d.cache_clear()
+    get_distance_matrix.cache_clear()
+    get_neighbour_table.cache_clear()
+    get_kernel_spectrum.cache_clear()
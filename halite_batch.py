@@ -0,0 +1,434 @@
+import argparse
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple, Union
+
+import numpy as np
+from kaggle_environments.utils import structify
+
+from geometry import get_neighbour_table
+from halite_sim import (agent_classes, collect_halite, compare_game, convert_code, convert_ships, create_agent,
+                        default_configuration, load_agent, move_ships, new_uid_counters, parse_uid, pay_spawns,
+                        populate_halite, regenerate_halite, remaining_overage_time, repository_directory,
+                        resolve_collisions, resolve_shipyards, ship_action_codes, starting_player_halite,
+                        starting_positions, stay_code, uid_base, uid_string)
+from observation import DecodedObservation
+
+# Batch Simulator ######################################################################################################
+
+# Many games of the local Halite simulator advancing in lockstep. All units of all games are kept in one table and the
+# squares of game g are numbered g * size**2 + position, so the rules of halite_sim (its Rules section) are applied to
+# the whole batch with the same array operations as to a single game. The games play by exactly the same rules as in
+# halite_sim and kaggle_environments.
+#
+# Agents of a batch are called once per step and seat for all games at once with a BatchObservation:
+#     agent(obs, player, config) -> (ship_actions, shipyard_spawns)
+# ship_actions holds an index into geometry.directions (4 is no move) or convert_code for every ship of the batch and
+# shipyard_spawns a bool for every shipyard, only the entries of the player's units are used. Agents taking a single
+# kaggle observation are run through game_agents.
+#
+#     python halite_batch.py --games 200
+#     python halite_batch.py --games 8 --check        # replays kaggle_environments games in a batch and compares them
+
+batched_bots = {'basic_bot': 'batch_agent'}
+
+
+class BatchObservation(NamedTuple):
+    step: int
+    # Boards of all games, ships and shipyards are given by their owner (-1 for empty squares)
+    halite: np.ndarray  # (games, size, size)
+    ships: np.ndarray  # (games, size, size)
+    ship_cargo: np.ndarray  # (games, size, size), 0 for empty squares
+    shipyards: np.ndarray  # (games, size, size)
+    player_halite: np.ndarray  # (games, players)
+    # Whether a player still takes actions
+    active: np.ndarray  # (games, players)
+    # Unit tables ordered by game, player and id (the order of the units in the kaggle observation)
+    ship_games: np.ndarray
+    ship_players: np.ndarray
+    ship_positions: np.ndarray
+    ship_halite: np.ndarray
+    ship_uids: np.ndarray
+    shipyard_games: np.ndarray
+    shipyard_players: np.ndarray
+    shipyard_positions: np.ndarray
+    shipyard_uids: np.ndarray
+
+
+class BatchSimulator:
+    def __init__(self, seeds: List[int], configuration: Union[Dict[str, Any], None] = None, agents_count: int = 4,
+                 observation: Union[DecodedObservation, None] = None):
+        # With an observation every game continues from it (see load), no boards are generated and the global random
+        # generators are left alone, the seeds only give the number of games
+        configuration = dict(default_configuration, **(configuration or {}))
+        configuration['randomSeed'] = seeds[0]
+        self.configuration = structify(configuration)
+        self.seeds = list(seeds)
+        self.games = len(self.seeds)
+        self.size = configuration['size']
+        self.squares = self.size ** 2
+        self.agents_count = agents_count
+        self.neighbour_table = get_neighbour_table(self.size).astype(int)
+        if observation is None:
+            self.reset()
+        else:
+            self.load(observation)
+
+    def reset(self) -> None:
+        config = self.configuration
+        games, players, squares = self.games, self.agents_count, self.size ** 2
+
+        # Every game is generated like a single game with its seed, the global generators are left in the state of the
+        # last game
+        halite = []
+        for seed in self.seeds:
+            np.random.seed(seed)
+            random.seed(seed)
+            halite.append(populate_halite(self.size, config.startingHalite))
+        self.halite = np.array(halite, dtype=float).reshape(-1)
+
+        self.step_count = 0
+        self.ship_games = np.repeat(np.arange(games), players)
+        self.ship_players = np.tile(np.arange(players), games)
+        self.ship_positions = np.tile(starting_positions(self.size, players), games)
+        self.ship_cargo = np.zeros(games * players)
+        self.ship_uids = np.tile(np.arange(1, players + 1), games)
+        self.shipyard_games = np.empty(0, dtype=int)
+        self.shipyard_players = np.empty(0, dtype=int)
+        self.shipyard_positions = np.empty(0, dtype=int)
+        self.shipyard_uids = np.empty(0, dtype=int)
+        self.player_halite = np.full((games, players), float(starting_player_halite))
+
+        self.active = np.ones((games, players), dtype=bool)
+        self.rewards = np.full((games, players), float(starting_player_halite))
+        self.game_over = np.zeros(games, dtype=bool)
+
+    def load(self, observation: DecodedObservation) -> None:
+        # Every game of the batch continues from the same decoded observation (e.g. to play out several continuations
+        # of a game at once), the boards of reset() are replaced. The global random generators are not used.
+        config = self.configuration
+        games, players = self.games, self.agents_count
+        ships, shipyards = observation.ships, observation.shipyards
+        self.step_count = observation.step
+        self.halite = np.tile(observation.board_halite.reshape(-1), games)
+
+        self.ship_games = np.repeat(np.arange(games), ships.size)
+        self.ship_players = np.tile(ships['owner'].astype(int), games)
+        self.ship_positions = np.tile(ships['position'].astype(int), games)
+        self.ship_cargo = np.tile(ships['cargo'], games)
+        self.ship_uids = np.tile(np.array([parse_uid(uid) for uid in observation.ship_ids], dtype=int), games)
+        self.shipyard_games = np.repeat(np.arange(games), shipyards.size)
+        self.shipyard_players = np.tile(shipyards['owner'].astype(int), games)
+        self.shipyard_positions = np.tile(shipyards['position'].astype(int), games)
+        self.shipyard_uids = np.tile(np.array([parse_uid(uid) for uid in observation.shipyard_ids], dtype=int), games)
+        self.player_halite = np.tile(observation.player_halite, (games, 1))
+
+        # Players without units (or without the halite to spawn a ship) are done
+        ships_count = np.bincount(ships['owner'], minlength=players)
+        shipyards_count = np.bincount(shipyards['owner'], minlength=players)
+        active = (ships_count > 0) | ((shipyards_count > 0) & (observation.player_halite >= config.spawnCost))
+        self.active = np.tile(active, (games, 1))
+        self.rewards = self.player_halite.copy()
+        self.game_over = ~self.active.any(axis=1)
+
+    @property
+    def done(self) -> bool:
+        return bool(self.game_over.all())
+
+    # Observations #####################################################################################################
+
+    def observation(self) -> BatchObservation:
+        games, size, squares = self.games, self.size, self.squares
+        ship_squares = self.ship_games * squares + self.ship_positions
+        ships = np.full(games * squares, -1, dtype=np.int8)
+        ships[ship_squares] = self.ship_players
+        ship_cargo = np.zeros(games * squares)
+        ship_cargo[ship_squares] = self.ship_cargo
+        shipyards = np.full(games * squares, -1, dtype=np.int8)
+        shipyards[self.shipyard_games * squares + self.shipyard_positions] = self.shipyard_players
+
+        return BatchObservation(self.step_count, self.halite.reshape(games, size, size), ships.reshape(games, size, size),
+                                ship_cargo.reshape(games, size, size), shipyards.reshape(games, size, size),
+                                self.player_halite, self.active, self.ship_games, self.ship_players,
+                                self.ship_positions, self.ship_cargo, self.ship_uids, self.shipyard_games,
+                                self.shipyard_players, self.shipyard_positions, self.shipyard_uids)
+
+    # Game #############################################################################################################
+
+    def step(self, ship_actions: np.ndarray, shipyard_spawns: np.ndarray) -> None:
+        config = self.configuration
+        games, players, squares = self.games, self.agents_count, self.squares
+        self.step_count += 1
+
+        # Units of players that are not active anymore do nothing
+        ship_codes = np.where(self.active[self.ship_games, self.ship_players], ship_actions, stay_code)
+        spawns = shipyard_spawns & self.active[self.shipyard_games, self.shipyard_players]
+        player_halite = self.player_halite.reshape(-1)
+        shipyard_owner = np.full(games * squares, -1)
+        shipyard_owner[self.shipyard_games * squares + self.shipyard_positions] = self.shipyard_players
+
+        # Spawns and conversions
+        spawning = np.flatnonzero(spawns)
+        spawning = spawning[pay_spawns(self.shipyard_games[spawning] * players + self.shipyard_players[spawning],
+                                       player_halite, config.spawnCost)]
+        converting = np.flatnonzero(ship_codes == convert_code)
+        converting = converting[convert_ships(self.ship_games[converting] * players + self.ship_players[converting],
+                                              self.ship_games[converting] * squares + self.ship_positions[converting],
+                                              self.ship_cargo[converting], self.ship_players[converting],
+                                              shipyard_owner, player_halite, self.halite, config.convertCost)]
+        new_uids = self.step_count * uid_base + new_uid_counters(
+            np.r_[self.shipyard_games[spawning], self.ship_games[converting]],
+            np.r_[self.shipyard_players[spawning], self.ship_players[converting]],
+            np.r_[np.zeros(spawning.size, dtype=int), np.ones(converting.size, dtype=int)],
+            np.r_[spawning, converting])
+
+        ship_positions = self.ship_positions.copy()
+        ship_cargo = self.ship_cargo.copy()
+        move_ships(ship_positions, ship_cargo, ship_codes, self.neighbour_table, config.moveCost)
+
+        keep = np.ones(self.ship_games.size, dtype=bool)
+        keep[converting] = False
+        ship_games = np.r_[self.ship_games[keep], self.shipyard_games[spawning]]
+        ship_players = np.r_[self.ship_players[keep], self.shipyard_players[spawning]]
+        ship_positions = np.r_[ship_positions[keep], self.shipyard_positions[spawning]]
+        ship_cargo = np.r_[ship_cargo[keep], np.zeros(spawning.size)]
+        ship_uids = np.r_[self.ship_uids[keep], new_uids[:spawning.size]]
+        ship_codes = np.r_[ship_codes[keep], np.full(spawning.size, stay_code)]
+        shipyard_games = np.r_[self.shipyard_games, self.ship_games[converting]]
+        shipyard_players = np.r_[self.shipyard_players, self.ship_players[converting]]
+        shipyard_positions = np.r_[self.shipyard_positions, self.ship_positions[converting]]
+        shipyard_uids = np.r_[self.shipyard_uids, new_uids[spawning.size:]]
+        ship_squares = ship_games * squares + ship_positions
+        shipyard_squares = shipyard_games * squares + shipyard_positions
+
+        survivor = resolve_collisions(ship_squares, ship_cargo, games * squares)
+        captured = resolve_shipyards(ship_squares, ship_players, ship_cargo, survivor, shipyard_squares,
+                                     shipyard_players, shipyard_games * players + shipyard_players, player_halite,
+                                     games * squares)
+
+        has_shipyard = np.zeros(games * squares, dtype=bool)
+        has_shipyard[shipyard_squares[~captured]] = True
+        collect_halite(self.halite, ship_squares, ship_cargo,
+                       survivor & (ship_codes >= stay_code) & ~self.game_over[ship_games], has_shipyard,
+                       config.collectRate)
+
+        # Halite regenerates on all squares without a ship, the boards of finished games are left as they are
+        regenerating = np.repeat(~self.game_over, squares)
+        regenerating[ship_squares[survivor]] = False
+        regenerate_halite(self.halite, regenerating, config.regenRate, config.maxCellHalite)
+
+        # Units are kept ordered by game and player, new units come after the units of their player
+        ship_order = np.lexsort((ship_players[survivor], ship_games[survivor]))
+        self.ship_games = ship_games[survivor][ship_order]
+        self.ship_players = ship_players[survivor][ship_order]
+        self.ship_positions = ship_positions[survivor][ship_order]
+        self.ship_cargo = ship_cargo[survivor][ship_order]
+        self.ship_uids = ship_uids[survivor][ship_order]
+        shipyard_order = np.lexsort((shipyard_players[~captured], shipyard_games[~captured]))
+        self.shipyard_games = shipyard_games[~captured][shipyard_order]
+        self.shipyard_players = shipyard_players[~captured][shipyard_order]
+        self.shipyard_positions = shipyard_positions[~captured][shipyard_order]
+        self.shipyard_uids = shipyard_uids[~captured][shipyard_order]
+
+        self._update_statuses()
+
+    def _update_statuses(self) -> None:
+        config = self.configuration
+        games, players = self.games, self.agents_count
+        ships_count = np.bincount(self.ship_games * players + self.ship_players,
+                                  minlength=games * players).reshape(games, players)
+        shipyards_count = np.bincount(self.shipyard_games * players + self.shipyard_players,
+                                      minlength=games * players).reshape(games, players)
+
+        # Players that can not gather any halite anymore are done
+        eliminated = self.active & (ships_count == 0) & ((shipyards_count == 0)
+                                                         | (self.player_halite < config.spawnCost))
+        self.active &= ~eliminated
+        self.rewards[eliminated] = self.step_count - config.episodeSteps - 1
+
+        # Games with less than two players left are over, the remaining player keeps the reward of the previous step
+        if players > 1:
+            self.active[self.active.sum(axis=1) < 2] = False
+        self.rewards[self.active] = self.player_halite[self.active]
+
+        if self.step_count >= config.episodeSteps - 1:
+            self.active[:] = False
+        self.game_over = ~self.active.any(axis=1)
+
+    def run(self, agents: List[Callable]) -> np.ndarray:
+        # Plays all games until they are done and returns the rewards of shape (games, players)
+        if len(agents) != self.agents_count:
+            raise ValueError(f'{self.agents_count} agents were expected, but {len(agents)} were given.')
+        while not self.done:
+            obs = self.observation()
+            ship_actions = np.full(self.ship_games.size, stay_code)
+            shipyard_spawns = np.zeros(self.shipyard_games.size, dtype=bool)
+            for player, agent in enumerate(agents):
+                if not self.active[:, player].any():
+                    continue
+                player_ship_actions, player_shipyard_spawns = agent(obs, player, self.configuration)
+                ships = self.ship_players == player
+                shipyards = self.shipyard_players == player
+                ship_actions[ships] = player_ship_actions[ships]
+                shipyard_spawns[shipyards] = player_shipyard_spawns[shipyards]
+            self.step(ship_actions, shipyard_spawns)
+        return self.rewards
+
+
+# Single Game Agents ###################################################################################################
+
+def kaggle_observation(obs: BatchObservation, game: int, player: int, config: Dict[str, Any]) -> Any:
+    # Observation of one game in the format of kaggle_environments
+    agents_count = obs.active.shape[1]
+    halite = obs.halite[game].reshape(-1)
+    # Without move costs all halite amounts are integers, as in kaggle_environments
+    integral = config['moveCost'] == 0
+    ship_keys = obs.ship_games * agents_count + obs.ship_players
+    shipyard_keys = obs.shipyard_games * agents_count + obs.shipyard_players
+    players = []
+    for owner in range(agents_count):
+        ships = slice(*np.searchsorted(ship_keys, [game * agents_count + owner, game * agents_count + owner + 1]))
+        shipyards = slice(*np.searchsorted(shipyard_keys, [game * agents_count + owner, game * agents_count + owner + 1]))
+        cargo = obs.ship_halite[ships].astype(int) if integral else obs.ship_halite[ships]
+        player_halite = obs.player_halite[game, owner]
+        players.append([int(player_halite) if integral else player_halite.item(),
+                        {uid_string(uid): position for uid, position in
+                         zip(obs.shipyard_uids[shipyards].tolist(), obs.shipyard_positions[shipyards].tolist())},
+                        {uid_string(uid): [position, cargo] for uid, position, cargo in
+                         zip(obs.ship_uids[ships].tolist(), obs.ship_positions[ships].tolist(), cargo.tolist())}])
+    return structify({'remainingOverageTime': remaining_overage_time, 'player': player,
+                      'halite': halite.astype(int).tolist() if obs.step == 0 else halite.tolist(),
+                      'players': players, 'step': obs.step})
+
+
+def game_agents(agents: List[Union[str, Callable]]) -> Callable:
+    # Batch agent playing one seat with a separate agent(obs, config) per game, e.g. our bots loaded from their files.
+    # Slow compared to batched agents, but any agent can take part in a batch this way.
+    agents = [load_agent(agent) if isinstance(agent, str) else agent for agent in agents]
+
+    def batch_agent(obs: BatchObservation, player: int, config: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        ship_actions = np.full(obs.ship_games.size, stay_code)
+        shipyard_spawns = np.zeros(obs.shipyard_games.size, dtype=bool)
+        units = unit_index(obs)
+        for game in np.flatnonzero(obs.active[:, player]).tolist():
+            actions = agents[game](kaggle_observation(obs, game, player, config), config)
+            set_game_actions(actions or {}, game, units, ship_actions, shipyard_spawns)
+        return ship_actions, shipyard_spawns
+
+    return batch_agent
+
+
+def unit_index(obs: BatchObservation) -> Tuple[Dict[Tuple[int, str], int], Dict[Tuple[int, str], int]]:
+    # Index of every ship and every shipyard of the batch by its game and its id in the kaggle observation
+    ship_index = {(game, uid_string(uid)): index for index, (game, uid) in
+                  enumerate(zip(obs.ship_games.tolist(), obs.ship_uids.tolist()))}
+    shipyard_index = {(game, uid_string(uid)): index for index, (game, uid) in
+                      enumerate(zip(obs.shipyard_games.tolist(), obs.shipyard_uids.tolist()))}
+    return ship_index, shipyard_index
+
+
+def set_game_actions(actions: Dict[str, str], game: int,
+                     units: Tuple[Dict[Tuple[int, str], int], Dict[Tuple[int, str], int]],
+                     ship_actions: np.ndarray, shipyard_spawns: np.ndarray) -> None:
+    # Actions of one game in the format of kaggle_environments into the action arrays of the batch
+    ship_index, shipyard_index = units
+    for uid, action in actions.items():
+        if action == 'SPAWN' and (game, uid) in shipyard_index:
+            shipyard_spawns[shipyard_index[game, uid]] = True
+        elif action in ship_action_codes and (game, uid) in ship_index:
+            ship_actions[ship_index[game, uid]] = ship_action_codes[action]
+
+
+# Conformance ##########################################################################################################
+
+def compare_batch(simulator: BatchSimulator, recorded: List[List[List[Any]]], index: int) -> List[str]:
+    # Differences between the games of the batch and step index of their kaggle_environments games, games that ended
+    # before are not compared
+    obs = simulator.observation()
+    differences = []
+    for game, steps in enumerate(recorded):
+        if index >= len(steps):
+            continue
+        observation = kaggle_observation(obs, game, 0, simulator.configuration)
+        statuses = ['ACTIVE' if active else 'DONE' for active in simulator.active[game].tolist()]
+        differences += [f'game {game}: {difference}' for difference in
+                        compare_game(observation.step, list(observation.halite), observation.players, statuses,
+                                     simulator.rewards[game].tolist(), steps[index])]
+    return differences
+
+
+def check_conformance(agents: List[str], seeds: List[int], configuration: Dict[str, Any]) -> Dict[str, Any]:
+    # Plays a game in kaggle_environments for every seed and replays the actions of all games in one batch, the state
+    # of every game has to match after every step. The batch does not simulate failing agents, their games differ.
+    from kaggle_environments import make
+
+    recorded = []
+    for seed in seeds:
+        environment = make('halite', configuration=dict(configuration, randomSeed=seed))
+        environment.run(agents)
+        recorded.append(environment.steps)
+
+    simulator = BatchSimulator(seeds, configuration, len(agents))
+    differences = [f'step 0: {difference}' for difference in compare_batch(simulator, recorded, 0)]
+    simulator_time = 0.0
+    steps = max(len(game_steps) for game_steps in recorded)
+    for index in range(1, steps):
+        obs = simulator.observation()
+        units = unit_index(obs)
+        ship_actions = np.full(obs.ship_games.size, stay_code)
+        shipyard_spawns = np.zeros(obs.shipyard_games.size, dtype=bool)
+        for game, game_steps in enumerate(recorded):
+            for agent_state in game_steps[index] if index < len(game_steps) else []:
+                set_game_actions(agent_state['action'] or {}, game, units, ship_actions, shipyard_spawns)
+        start = time.perf_counter()
+        simulator.step(ship_actions, shipyard_spawns)
+        simulator_time += time.perf_counter() - start
+        differences += [f'step {index}: {difference}' for difference in compare_batch(simulator, recorded, index)]
+
+    return {'seeds': seeds, 'steps': steps - 1, 'differences': differences,
+            'game_steps_per_second': sum(len(game_steps) - 1 for game_steps in recorded) / max(simulator_time, 1e-9)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Play a batch of games in lockstep in the local Halite simulator.')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--agents', nargs='+', default=['basic_bot'] * 4, help='bots of the four seats')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--size', type=int, default=21)
+    parser.add_argument('--steps', type=int, default=400, help='episode steps per game')
+    parser.add_argument('--check', action='store_true', help='compare against games of kaggle_environments')
+    args = parser.parse_args()
+
+    seeds = list(range(args.seed, args.seed + args.games))
+    configuration = {'size': args.size, 'episodeSteps': args.steps}
+    if args.check:
+        result = check_conformance([os.path.join(repository_directory, f'{agent}.py') for agent in args.agents], seeds,
+                                   configuration)
+        status = 'ok' if not result['differences'] else f"{len(result['differences'])} differences"
+        print(f"{args.games} games, {result['steps']} steps {status}, "
+              f"{result['game_steps_per_second']:.0f} game steps per second")
+        for difference in result['differences'][:10]:
+            print(f'    {difference}')
+        return
+
+    seats = []
+    for agent in args.agents:
+        if agent in batched_bots:
+            seats.append(getattr(create_agent(agent), batched_bots[agent]))
+        elif agent in agent_classes:
+            seats.append(game_agents([create_agent(agent) for _ in range(args.games)]))
+        else:
+            seats.append(game_agents([f'{agent}.py'] * args.games))
+
+    start = time.perf_counter()
+    simulator = BatchSimulator(seeds, configuration, len(seats))
+    rewards = simulator.run(seats)
+    duration = time.perf_counter() - start
+    print(f'{args.games} games, {simulator.step_count} steps in {duration:.1f}s '
+          f'({args.games * simulator.step_count / duration:.0f} game steps per second)')
+    print(f'mean rewards per seat {args.agents}: {np.round(rewards.mean(axis=0), 1).tolist()}')
+
+
+if __name__ == '__main__':
+    main()
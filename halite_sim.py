@@ -0,0 +1,608 @@
+import argparse
+import math
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Union
+
+import numpy as np
+from kaggle_environments.utils import structify
+
+from geometry import directions, get_neighbour_table
+from profiling import default_act_timeout
+
+# Halite Simulator #####################################################################################################
+
+# Local Halite engine on array state for fast offline evaluation. The rules follow the halite interpreter of
+# kaggle_environments (Board.next and interpreter) step by step and in the same order, so a game with the same seed and
+# the same actions ends in the same state:
+#   1. Per player: shipyards spawn, then ships convert (in the order of their ids) and move
+#   2. Ship collisions, the ship with the least halite survives and takes the halite of the others (ties destroy all)
+#   3. Ships on enemy shipyards destroy each other, ships on own shipyards deposit their cargo
+#   4. Ships that did not move collect halite, halite regenerates on all squares without a ship
+#
+# Agents are called with the same (obs, config) as in kaggle_environments. Time limits are not enforced.
+#
+#     python halite_sim.py --games 10                 # plays games of our bots in the simulator
+#     python halite_sim.py --games 3 --check          # replays kaggle_environments games and compares every step
+#     python halite_sim.py --games 100 --replays replays   # writes a binary replay (replay.py) of every game
+
+default_configuration = {'episodeSteps': 400, 'actTimeout': default_act_timeout, 'runTimeout': 9600,
+                         'startingHalite': 24000, 'size': 21, 'spawnCost': 500, 'convertCost': 500, 'moveCost': 0,
+                         'collectRate': 0.25, 'regenRate': 0.02, 'maxCellHalite': 500, 'agentTimeout': 60}
+starting_player_halite = 5000
+remaining_overage_time = 60
+
+# Ship actions are stored as the index of geometry.directions (4 is no move) or convert
+ship_action_codes = {direction: code for code, direction in enumerate(directions[:4])}
+stay_code = 4
+convert_code = 5
+ship_action_codes['CONVERT'] = convert_code
+valid_actions = {'NORTH', 'EAST', 'SOUTH', 'WEST', 'CONVERT', 'SPAWN'}
+# Unit ids are given as f'{step}-{counter}' in kaggle observations and stored as step * uid_base + counter
+uid_base = 1 << 20
+
+default_agents = ['task_force_bot', 'basic_bot', 'bot_swarm', 'basic_bot']
+repository_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+# Unit Ids #############################################################################################################
+
+def uid_string(uid: int) -> str:
+    return f'{uid // uid_base}-{uid % uid_base}'
+
+
+def parse_uid(uid: str) -> int:
+    step, counter = uid.split('-')
+    return int(step) * uid_base + int(counter)
+
+
+# Initial Board ########################################################################################################
+
+def populate_halite(size: int, starting_halite: int) -> List[int]:
+    # Same halite distribution and the same random draws as populate_board of kaggle_environments, the global random
+    # generators have to be seeded beforehand
+    half = math.ceil(size / 2)
+    grid = [[0] * half for _ in range(half)]
+
+    # Halite seeds, spread uniformly over a quartile and towards the center of the map
+    for i in range(half):
+        grid[random.randint(0, half - 1)][random.randint(0, half - 1)] = i ** 2
+        grid[random.randint(half // 2, half - 1)][random.randint(half // 2, half - 1)] = i ** 2
+
+    radius_grid = [row[:] for row in grid]
+    for r in range(half):
+        for c in range(half):
+            value = grid[r][c]
+            if value == 0:
+                continue
+            radius = min(round((value / half) ** 0.5), 1)
+            for r2 in range(r - radius + 1, r + radius):
+                for c2 in range(c - radius + 1, c + radius):
+                    if 0 <= r2 < half and 0 <= c2 < half:
+                        distance = (abs(r2 - r) ** 2 + abs(c2 - c) ** 2) ** 0.5
+                        radius_grid[r2][c2] += int(value / max(1, distance) ** distance)
+
+    # Random sprouts of halite and additional halite in the center corner
+    radius_grid = np.asarray(radius_grid)
+    add_grid = np.random.gumbel(0, 300.0, size=(half, half)).astype(int)
+    sparse_radius_grid = np.random.binomial(1, 0.5, size=(half, half))
+    add_grid = np.clip(add_grid, 0, a_max=None) * sparse_radius_grid
+    radius_grid += add_grid
+    corner_grid = np.random.gumbel(0, 500.0, size=(half // 4, half // 4)).astype(int)
+    corner_grid = np.clip(corner_grid, 0, a_max=None)
+    radius_grid[half - (half // 4):, half - (half // 4):] += corner_grid
+
+    # The quartile is mirrored to all four quartiles and normalized to the starting halite
+    total = sum([sum(row) for row in radius_grid])
+    halite = [0] * (size ** 2)
+    for r, row in enumerate(radius_grid):
+        for c, val in enumerate(row):
+            val = int(val * starting_halite / total / 4)
+            halite[size * r + c] = val
+            halite[size * r + (size - c - 1)] = val
+            halite[size * (size - 1) - (size * r) + c] = val
+            halite[size * (size - 1) - (size * r) + (size - c - 1)] = val
+    return halite
+
+
+def starting_positions(size: int, agents_count: int) -> List[int]:
+    if agents_count == 1:
+        return [size * (size // 2) + size // 2]
+    if agents_count == 2:
+        return [size * (size // 2) + size // 4, size * (size // 2) + math.ceil(3 * size / 4) - 1]
+    if agents_count == 4:
+        return [size * (size // 4) + size // 4, size * (size // 4) + 3 * size // 4,
+                size * (3 * size // 4) + size // 4, size * (3 * size // 4) + 3 * size // 4]
+    raise ValueError('Halite is played by 1, 2 or 4 agents.')
+
+
+def round_halite(values: np.ndarray) -> np.ndarray:
+    # Python's round(value, 3) for an array. np.round multiplies by 1000 first, which can round the other way if the
+    # value is within floating point error of a half, these few values are rounded by Python.
+    rounded = np.round(values, 3)
+    scaled = values * 1000
+    for index in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        rounded[index] = round(float(values[index]), 3)
+    return rounded
+
+
+# Rules ################################################################################################################
+
+# The rules of a step on flat unit tables, shared by HaliteSimulator and halite_batch.BatchSimulator. Squares are
+# indices into the flat halite board and players into the flat player halite, for a batch of games g * size**2 +
+# position and g * players + player, so the same array operations play a single game or a whole batch. Units are
+# ordered by player (and game), arrays given as arguments are updated in place.
+
+def rank_within(keys: np.ndarray) -> np.ndarray:
+    # Rank of every entry among the entries with the same key before it, the keys have to be sorted
+    return np.arange(keys.size) - np.searchsorted(keys, keys)
+
+
+def pay_spawns(keys: np.ndarray, player_halite: np.ndarray, spawn_cost: float) -> np.ndarray:
+    # Spawns in the order of the shipyards of a player, every spawn has to be paid from what is left
+    ranks = rank_within(keys)
+    spawned = np.zeros(keys.size, dtype=bool)
+    for rank in range(ranks.max(initial=-1) + 1):
+        requests = np.flatnonzero(ranks == rank)
+        requests = requests[player_halite[keys[requests]] >= spawn_cost]
+        player_halite[keys[requests]] -= spawn_cost
+        spawned[requests] = True
+    return spawned
+
+
+def convert_ships(keys: np.ndarray, squares: np.ndarray, cargo: np.ndarray, owners: np.ndarray,
+                  shipyard_owner: np.ndarray, player_halite: np.ndarray, halite: np.ndarray,
+                  convert_cost: float) -> np.ndarray:
+    # Conversions in the order of the ships of a player, a ship's cargo can pay for the conversion and what is left of
+    # the cargo is added only after all conversions of the player
+    ranks = rank_within(keys)
+    converted = np.zeros(keys.size, dtype=bool)
+    leftover_convert_halite = np.zeros(player_halite.size)
+    for rank in range(ranks.max(initial=-1) + 1):
+        requests = np.flatnonzero(ranks == rank)
+        requests = requests[(shipyard_owner[squares[requests]] == -1)
+                            & (cargo[requests] + player_halite[keys[requests]] >= convert_cost)]
+        delta_halite = cargo[requests] - convert_cost
+        leftover_convert_halite[keys[requests]] += np.maximum(delta_halite, 0)
+        player_halite[keys[requests]] += np.minimum(delta_halite, 0)
+        shipyard_owner[squares[requests]] = owners[requests]
+        halite[squares[requests]] = 0
+        converted[requests] = True
+    player_halite += leftover_convert_halite
+    return converted
+
+
+def new_uid_counters(games: np.ndarray, players: np.ndarray, conversions: np.ndarray, units: np.ndarray) -> np.ndarray:
+    # Counters of the ids of the new units, counted per game in the order the units were created: by player, spawns
+    # before conversions and by the order of the units
+    order = np.lexsort((units, conversions, players, games))
+    counters = np.empty(order.size, dtype=int)
+    counters[order] = rank_within(games[order]) + 1
+    return counters
+
+
+def move_ships(positions: np.ndarray, cargo: np.ndarray, codes: np.ndarray, neighbour_table: np.ndarray,
+               move_cost: float) -> None:
+    moving = codes < stay_code
+    positions[moving] = neighbour_table[positions[moving], codes[moving]]
+    cargo[moving] *= 1 - move_cost
+
+
+def resolve_collisions(squares: np.ndarray, cargo: np.ndarray, squares_count: int) -> np.ndarray:
+    # Ship collisions: a unique ship with the least halite on a square survives and takes the halite of the others.
+    # Returns which ships survive.
+    least_cargo = np.full(squares_count, np.inf)
+    np.minimum.at(least_cargo, squares, cargo)
+    least = cargo == least_cargo[squares]
+    least_count = np.bincount(squares[least], minlength=squares_count)
+    survivor = least & (least_count[squares] == 1)
+    survivor_cargo = np.zeros(squares_count)
+    survivor_cargo[squares[survivor]] = cargo[survivor]
+    losers = ~survivor & (least_count[squares] == 1)
+    np.add.at(survivor_cargo, squares[losers], cargo[losers])
+    cargo[survivor] = survivor_cargo[squares[survivor]]
+    return survivor
+
+
+def resolve_shipyards(ship_squares: np.ndarray, ship_players: np.ndarray, ship_cargo: np.ndarray,
+                      survivor: np.ndarray, shipyard_squares: np.ndarray, shipyard_players: np.ndarray,
+                      shipyard_keys: np.ndarray, player_halite: np.ndarray, squares_count: int) -> np.ndarray:
+    # Ships on enemy shipyards destroy each other, ships on own shipyards deposit their cargo. Returns which shipyards
+    # are destroyed.
+    ship_at = np.full(squares_count, -1)
+    ship_at[ship_squares[survivor]] = np.flatnonzero(survivor)
+    shipyard_ship = ship_at[shipyard_squares]
+    occupied = shipyard_ship >= 0
+    captured = occupied.copy()
+    captured[occupied] = ship_players[shipyard_ship[occupied]] != shipyard_players[occupied]
+    survivor[shipyard_ship[captured]] = False
+    depositing = occupied & ~captured
+    np.add.at(player_halite, shipyard_keys[depositing], ship_cargo[shipyard_ship[depositing]])
+    ship_cargo[shipyard_ship[depositing]] = 0
+    return captured
+
+
+def collect_halite(halite: np.ndarray, ship_squares: np.ndarray, ship_cargo: np.ndarray, staying: np.ndarray,
+                   has_shipyard: np.ndarray, collect_rate: float) -> None:
+    # Ships that did not move collect halite, except on shipyards
+    ships = np.flatnonzero(staying & ~has_shipyard[ship_squares])
+    delta_halite = np.trunc(halite[ship_squares[ships]] * collect_rate)
+    ship_cargo[ships] += delta_halite
+    halite[ship_squares[ships]] -= delta_halite
+
+
+def regenerate_halite(halite: np.ndarray, regenerating: np.ndarray, regen_rate: float,
+                      max_cell_halite: float) -> None:
+    halite[regenerating] = np.minimum(round_halite(halite[regenerating] * (1 + regen_rate)), max_cell_halite)
+
+
+# Simulator ############################################################################################################
+
+class HaliteSimulator:
+    def __init__(self, configuration: Union[Dict[str, Any], None] = None, agents_count: int = 4):
+        configuration = dict(default_configuration, **(configuration or {}))
+        if configuration.get('randomSeed') is None:
+            configuration['randomSeed'] = random.randrange((1 << 31) - 1)
+        self.configuration = structify(configuration)
+        self.size = configuration['size']
+        self.agents_count = agents_count
+        self.neighbour_table = get_neighbour_table(self.size).astype(int)
+        self.reset()
+
+    def reset(self) -> None:
+        config = self.configuration
+        # The global generators are seeded like in kaggle_environments, agents drawing random numbers (bot_swarm) see
+        # the same numbers in both
+        np.random.seed(config.randomSeed)
+        random.seed(config.randomSeed)
+
+        self.step_count = 0
+        self.initial_halite = populate_halite(self.size, config.startingHalite)
+        self.halite = np.array(self.initial_halite, dtype=float)
+
+        # Units are kept ordered by player and by the order of their ids in the observation of the player
+        self.ship_ids = np.array([f'0-{player + 1}' for player in range(self.agents_count)], dtype=object)
+        self.ship_players = np.arange(self.agents_count)
+        self.ship_positions = np.array(starting_positions(self.size, self.agents_count))
+        self.ship_cargo = np.zeros(self.agents_count)
+        self.shipyard_ids = np.empty(0, dtype=object)
+        self.shipyard_players = np.empty(0, dtype=int)
+        self.shipyard_positions = np.empty(0, dtype=int)
+        self.player_halite = np.full(self.agents_count, float(starting_player_halite))
+
+        self.statuses = ['ACTIVE'] * self.agents_count
+        self.rewards = [starting_player_halite] * self.agents_count
+        self._players = None
+
+    @property
+    def done(self) -> bool:
+        return all(status != 'ACTIVE' for status in self.statuses)
+
+    # Observations #####################################################################################################
+
+    def players(self) -> List[List[Any]]:
+        # Players in the format of the observation: [halite, {shipyard_id: position}, {ship_id: [position, halite]}]
+        if self._players is None:
+            # Without move costs all halite amounts are integers, as in kaggle_environments
+            integral = self.configuration.moveCost == 0
+            cargo = self.ship_cargo.astype(int) if integral else self.ship_cargo
+            player_halite = self.player_halite.astype(int) if integral else self.player_halite
+            ship_ids = self.ship_ids.tolist()
+            ship_positions = self.ship_positions.tolist()
+            cargo = cargo.tolist()
+            shipyard_ids = self.shipyard_ids.tolist()
+            shipyard_positions = self.shipyard_positions.tolist()
+
+            self._players = []
+            for player in range(self.agents_count):
+                ships = np.flatnonzero(self.ship_players == player).tolist()
+                shipyards = np.flatnonzero(self.shipyard_players == player).tolist()
+                self._players.append([player_halite[player].item(),
+                                      {shipyard_ids[i]: shipyard_positions[i] for i in shipyards},
+                                      {ship_ids[i]: [ship_positions[i], cargo[i]] for i in ships}])
+        return self._players
+
+    def halite_list(self) -> List[Union[int, float]]:
+        # The starting board is given in integers, afterwards the halite is regenerated in floats
+        return list(self.initial_halite) if self.step_count == 0 else self.halite.tolist()
+
+    def observation(self, player: int) -> Any:
+        # Every agent gets its own copy of the observation, like in kaggle_environments
+        return structify({'remainingOverageTime': remaining_overage_time, 'player': player,
+                          'halite': self.halite_list(), 'players': self.players(), 'step': self.step_count})
+
+    # Game #############################################################################################################
+
+    def step(self, actions: List[Any]) -> None:
+        # Actions are the return values of the agents, exceptions raised by an agent mark it as failed (a TimeoutError
+        # as timed out). Agents that are not active anymore are ignored.
+        player_actions = []
+        for player, action in enumerate(actions):
+            if self.statuses[player] != 'ACTIVE':
+                action = None
+            elif isinstance(action, TimeoutError):
+                self.statuses[player], action = 'TIMEOUT', None
+            elif isinstance(action, BaseException):
+                self.statuses[player], action = 'ERROR', None
+            elif action is not None and (not isinstance(action, dict)
+                                         or any(value not in valid_actions for value in action.values())):
+                self.statuses[player], action = 'INVALID', None
+            player_actions.append(action or {})
+
+        self._next(player_actions)
+        self._players = None
+        self._update_statuses()
+
+    def _next(self, player_actions: List[Dict[str, str]]) -> None:
+        config = self.configuration
+        self.step_count += 1
+        squares = self.size ** 2
+
+        ship_codes = np.array([ship_action_codes.get(player_actions[player].get(ship_id), stay_code)
+                               for ship_id, player in zip(self.ship_ids.tolist(), self.ship_players.tolist())],
+                              dtype=int)
+        shipyard_owner = np.full(squares, -1)
+        shipyard_owner[self.shipyard_positions] = self.shipyard_players
+
+        # Spawns and conversions
+        spawning = np.flatnonzero([player_actions[player].get(shipyard_id) == 'SPAWN' for shipyard_id, player in
+                                   zip(self.shipyard_ids.tolist(), self.shipyard_players.tolist())])
+        spawning = spawning[pay_spawns(self.shipyard_players[spawning], self.player_halite, config.spawnCost)]
+        converting = np.flatnonzero(ship_codes == convert_code)
+        converting = converting[convert_ships(self.ship_players[converting], self.ship_positions[converting],
+                                              self.ship_cargo[converting], self.ship_players[converting],
+                                              shipyard_owner, self.player_halite, self.halite, config.convertCost)]
+        new_uids = self.step_count * uid_base + new_uid_counters(
+            np.zeros(spawning.size + converting.size, dtype=int),
+            np.r_[self.shipyard_players[spawning], self.ship_players[converting]],
+            np.r_[np.zeros(spawning.size, dtype=int), np.ones(converting.size, dtype=int)],
+            np.r_[spawning, converting])
+        new_ids = np.array([uid_string(uid) for uid in new_uids.tolist()], dtype=object)
+
+        move_ships(self.ship_positions, self.ship_cargo, ship_codes, self.neighbour_table, config.moveCost)
+
+        # New units are appended to the units of their player
+        keep = np.ones(self.ship_ids.size, dtype=bool)
+        keep[converting] = False
+        ship_ids = np.r_[self.ship_ids[keep], new_ids[:spawning.size]]
+        ship_players = np.r_[self.ship_players[keep], self.shipyard_players[spawning]]
+        ship_positions = np.r_[self.ship_positions[keep], self.shipyard_positions[spawning]]
+        ship_cargo = np.r_[self.ship_cargo[keep], np.zeros(spawning.size)]
+        ship_codes = np.r_[ship_codes[keep], np.full(spawning.size, stay_code)]
+        self.shipyard_ids = np.r_[self.shipyard_ids, new_ids[spawning.size:]]
+        self.shipyard_players = np.r_[self.shipyard_players, self.ship_players[converting]]
+        self.shipyard_positions = np.r_[self.shipyard_positions, self.ship_positions[converting]]
+
+        survivor = resolve_collisions(ship_positions, ship_cargo, squares)
+        captured = resolve_shipyards(ship_positions, ship_players, ship_cargo, survivor, self.shipyard_positions,
+                                     self.shipyard_players, self.shipyard_players, self.player_halite, squares)
+        self.shipyard_ids = self.shipyard_ids[~captured]
+        self.shipyard_players = self.shipyard_players[~captured]
+        self.shipyard_positions = self.shipyard_positions[~captured]
+        if converting.size:
+            # New shipyards are moved behind the other shipyards of their player
+            order = np.argsort(self.shipyard_players, kind='stable')
+            self.shipyard_ids = self.shipyard_ids[order]
+            self.shipyard_players = self.shipyard_players[order]
+            self.shipyard_positions = self.shipyard_positions[order]
+
+        has_shipyard = np.zeros(squares, dtype=bool)
+        has_shipyard[self.shipyard_positions] = True
+        collect_halite(self.halite, ship_positions, ship_cargo, survivor & (ship_codes >= stay_code), has_shipyard,
+                       config.collectRate)
+
+        # Halite regenerates on all squares without a ship
+        empty = np.ones(squares, dtype=bool)
+        empty[ship_positions[survivor]] = False
+        regenerate_halite(self.halite, empty, config.regenRate, config.maxCellHalite)
+
+        # Spawned ships are moved behind the other ships of their player
+        order = np.argsort(ship_players[survivor], kind='stable')
+        self.ship_ids = ship_ids[survivor][order]
+        self.ship_players = ship_players[survivor][order]
+        self.ship_positions = ship_positions[survivor][order]
+        self.ship_cargo = ship_cargo[survivor][order]
+
+    def _update_statuses(self) -> None:
+        config = self.configuration
+        for player, status in enumerate(self.statuses):
+            ships_count = np.count_nonzero(self.ship_players == player)
+            shipyards_count = np.count_nonzero(self.shipyard_players == player)
+            if status == 'ACTIVE' and ships_count == 0 and (shipyards_count == 0
+                                                            or self.player_halite[player] < config.spawnCost):
+                # The player can not gather any halite anymore
+                self.statuses[player] = 'DONE'
+                self.rewards[player] = self.step_count - config.episodeSteps - 1
+            if self.statuses[player] not in ('ACTIVE', 'DONE'):
+                # Failed agents lose all their units
+                self._remove_player(player)
+
+        if self.agents_count > 1 and self.statuses.count('ACTIVE') < 2:
+            self.statuses = ['DONE' if status == 'ACTIVE' else status for status in self.statuses]
+        for player, status in enumerate(self.statuses):
+            if status == 'ACTIVE':
+                self.rewards[player] = self.players()[player][0]
+            elif status in ('ERROR', 'INVALID', 'TIMEOUT'):
+                self.rewards[player] = None
+
+        if self.step_count >= config.episodeSteps - 1:
+            self.statuses = ['DONE' if status in ('ACTIVE', 'INACTIVE') else status for status in self.statuses]
+
+    def _remove_player(self, player: int) -> None:
+        ships = self.ship_players != player
+        shipyards = self.shipyard_players != player
+        self.ship_ids, self.ship_players = self.ship_ids[ships], self.ship_players[ships]
+        self.ship_positions, self.ship_cargo = self.ship_positions[ships], self.ship_cargo[ships]
+        self.shipyard_ids, self.shipyard_players = self.shipyard_ids[shipyards], self.shipyard_players[shipyards]
+        self.shipyard_positions = self.shipyard_positions[shipyards]
+        self.player_halite[player] = 0
+        self._players = None
+
+    def act(self, agents: List[Callable]) -> List[Any]:
+        # Actions of all active agents for the current step, exceptions are returned as the action of the agent
+        actions = []
+        for player, agent in enumerate(agents):
+            if self.statuses[player] != 'ACTIVE':
+                actions.append(None)
+                continue
+            try:
+                actions.append(agent(self.observation(player), self.configuration))
+            except Exception as exception:
+                actions.append(exception)
+        return actions
+
+    def run(self, agents: List[Union[str, Callable]]) -> List[Union[int, float, None]]:
+        # Plays the game until it is done and returns the rewards, agents can also be given as paths of agent files
+        agents = [load_agent(agent) if isinstance(agent, str) else agent for agent in agents]
+        if len(agents) != self.agents_count:
+            raise ValueError(f'{self.agents_count} agents were expected, but {len(agents)} were given.')
+        while not self.done:
+            self.step(self.act(agents))
+        return self.rewards
+
+
+def load_agent(path: str) -> Callable:
+    # Last callable of an agent file, as in kaggle_environments. Every call executes the file again, so every loaded
+    # agent has its own globals.
+    with open(path) as agent_file:
+        code = compile(agent_file.read(), path, 'exec')
+    agent_globals = {}
+    exec(code, agent_globals)
+    return [value for value in agent_globals.values() if callable(value)][-1]
+
+
+# Our bots by their file names and the names of their classes
+agent_classes = {'basic_bot': 'BasicBot', 'bot_swarm': 'SwarmBot', 'task_force_bot': 'TaskForceBot'}
+
+
+def create_agent(name: str, **parameters: Any) -> Callable:
+    # New instance of one of our bots with its own state, the parameters override the defaults of the bot. Cheaper than
+    # load_agent, all instances share the module and its read-only tables.
+    import importlib
+    return getattr(importlib.import_module(name), agent_classes[name])(**parameters)
+
+
+# Conformance ##########################################################################################################
+
+def compare_state(simulator: HaliteSimulator, state: List[Any]) -> List[str]:
+    # Differences between the simulator and the state of a kaggle_environments step
+    return compare_game(simulator.step_count, simulator.halite_list(), simulator.players(), simulator.statuses,
+                        simulator.rewards, state)
+
+
+def compare_game(step: int, halite: List[Union[int, float]], players: List[List[Any]], statuses: List[str],
+                 rewards: List[Union[int, float, None]], state: List[Any]) -> List[str]:
+    # Differences between a game given in the format of the observation and the state of a kaggle_environments step
+    observation = state[0]['observation']
+    differences = []
+    if step != observation['step']:
+        differences.append(f"step {step} != {observation['step']}")
+    if halite != list(observation['halite']):
+        changed = np.flatnonzero(np.array(halite) != np.array(observation['halite']))
+        differences.append(f'halite differs on {changed.size} squares, e.g. square {changed[0]}: '
+                           f"{halite[changed[0]]} != {observation['halite'][changed[0]]}")
+    for player, (simulated, expected) in enumerate(zip(players, observation['players'])):
+        if simulated[0] != expected[0]:
+            differences.append(f'halite of player {player}: {simulated[0]} != {expected[0]}')
+        if simulated[1] != dict(expected[1]) or list(simulated[1]) != list(expected[1]):
+            differences.append(f'shipyards of player {player}: {simulated[1]} != {dict(expected[1])}')
+        if simulated[2] != dict(expected[2]) or list(simulated[2]) != list(expected[2]):
+            differences.append(f'ships of player {player}: {simulated[2]} != {dict(expected[2])}')
+    for player, agent_state in enumerate(state):
+        if statuses[player] != agent_state['status']:
+            differences.append(f"status of player {player}: {statuses[player]} != {agent_state['status']}")
+        if rewards[player] != agent_state['reward']:
+            differences.append(f"reward of player {player}: {rewards[player]} != {agent_state['reward']}")
+    return differences
+
+
+def recorded_actions(previous_state: List[Any], state: List[Any]) -> List[Any]:
+    # Actions of a recorded step, failures of agents are given as exceptions like the agents would have raised them
+    actions = []
+    for previous_agent_state, agent_state in zip(previous_state, state):
+        status = agent_state['status']
+        if previous_agent_state['status'] == 'ACTIVE' and status == 'ERROR':
+            actions.append(RuntimeError('recorded error'))
+        elif previous_agent_state['status'] == 'ACTIVE' and status == 'TIMEOUT':
+            actions.append(TimeoutError('recorded timeout'))
+        elif previous_agent_state['status'] == 'ACTIVE' and status == 'INVALID':
+            actions.append('INVALID')
+        else:
+            actions.append(agent_state['action'])
+    return actions
+
+
+def check_conformance(agents: List[str], configuration: Dict[str, Any]) -> Dict[str, Any]:
+    # Plays a game in kaggle_environments and replays its actions in the simulator, the states have to match after
+    # every step. Both engines are additionally timed on the replayed actions alone.
+    from kaggle_environments import make
+
+    environment = make('halite', configuration=configuration)
+    environment.run(agents)
+    steps = environment.steps
+    actions = [recorded_actions(steps[index - 1], steps[index]) for index in range(1, len(steps))]
+
+    simulator = HaliteSimulator(configuration, len(agents))
+    differences = [f'step 0: {difference}' for difference in compare_state(simulator, steps[0])]
+    simulator_time = 0.0
+    for index, step_actions in enumerate(actions, 1):
+        start = time.perf_counter()
+        simulator.step(step_actions)
+        simulator_time += time.perf_counter() - start
+        differences += [f'step {index}: {difference}' for difference in compare_state(simulator, steps[index])]
+    if simulator.done != environment.done:
+        differences.append(f'done: {simulator.done} != {environment.done}')
+
+    replay = make('halite', configuration=configuration)
+    replay.reset(len(agents))
+    start = time.perf_counter()
+    for step_actions in actions:
+        replay.step(step_actions)
+    environment_time = time.perf_counter() - start
+
+    return {'seed': configuration['randomSeed'], 'steps': len(actions), 'differences': differences,
+            'simulator_steps_per_second': len(actions) / max(simulator_time, 1e-9),
+            'environment_steps_per_second': len(actions) / max(environment_time, 1e-9)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Play games in the local Halite simulator.')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--agents', nargs='+', default=default_agents, help='bots of the four seats')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--size', type=int, default=21)
+    parser.add_argument('--steps', type=int, default=400, help='episode steps per game')
+    parser.add_argument('--check', action='store_true', help='compare against games of kaggle_environments')
+    parser.add_argument('--replays', default=None, help='write a binary replay of every game to this directory')
+    args = parser.parse_args()
+
+    for game in range(args.games):
+        # Fresh bots every game, kaggle_environments loads the agent files again
+        agents = [create_agent(agent) if agent in agent_classes and not args.check
+                  else os.path.join(repository_directory, f'{agent}.py') for agent in args.agents]
+        configuration = {'size': args.size, 'episodeSteps': args.steps, 'randomSeed': args.seed + game}
+        if args.check:
+            result = check_conformance(agents, configuration)
+            status = 'ok' if not result['differences'] else f"{len(result['differences'])} differences"
+            print(f"seed {result['seed']:6d} {result['steps']:4d} steps {status}, steps per second: simulator "
+                  f"{result['simulator_steps_per_second']:8.0f} environment {result['environment_steps_per_second']:6.0f}")
+            for difference in result['differences'][:10]:
+                print(f'    {difference}')
+        else:
+            # bot_swarm draws its patrol radii from the random module
+            random.seed(args.seed + game)
+            start = time.perf_counter()
+            simulator = HaliteSimulator(configuration, len(agents))
+            if args.replays:
+                # replay imports the simulator
+                from replay import record_game
+                rewards = record_game(simulator, agents, os.path.join(args.replays, f'{args.seed + game}.replay'),
+                                      args.agents)
+            else:
+                rewards = simulator.run(agents)
+            print(f'seed {args.seed + game:6d} {args.agents} {rewards} {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+import time
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from halite_batch import BatchObservation, BatchSimulator
+from halite_sim import convert_code, parse_uid, stay_code
+from observation import DecodedObservation
+from profiling import act_timeout
+
+# Lookahead ############################################################################################################
+
+# Anytime Monte Carlo search over the actions of the own fleet. The candidates of a turn are the action set of the
+# heuristic and copies of it with a few ships moving differently. Each rollout plays a candidate on the batch simulator
+# of halite_batch for some steps, with every player acting by the batch policy of the bot and random moves mixed in,
+# and values the own halite at the end. Rollouts run as the games of one batch, so a batch of them costs about as much
+# as a single one.
+#
+# The search is an open-loop tree: the first tree_depth turns of a rollout pick candidates with UCB1 from the nodes
+# below the candidates picked before, the candidates of a node are made from the first state it is reached in. After
+# a turn the node below the chosen candidate becomes the next root, if the own fleet is still the same.
+#
+# Batches run until the deadline, a batch is only started if it is expected to finish in time (from the measured time
+# per step) and abandoned when the deadline passes. Without a finished rollout in the turn the heuristic is played.
+#
+#     agent(obs, player, config) -> (ship_actions, shipyard_spawns)      # the policy, like halite_batch agents
+
+# Share of actTimeout a turn may use
+lookahead_budget = 0.5
+lookahead_candidates = 8
+# Ships with another move in every candidate but the heuristic
+perturbed_ships = 2
+rollouts_per_batch = 16
+rollout_steps = 8
+tree_depth = 2
+# Chance of a random move of every ship in the rollouts
+rollout_noise = 0.1
+exploration = 1.0
+# Share of the statistics kept when a node becomes the next root
+reuse_decay = 0.5
+# Value of cargo and of a ship at the end of a rollout, relative to halite of the player
+cargo_value = 0.75
+ship_value = 0.5
+
+
+class LookaheadNode:
+    def __init__(self):
+        # Candidates of the own ships sorted by uid, set on the first visit
+        self.ship_uids: Union[np.ndarray, None] = None
+        self.candidates: Union[np.ndarray, None] = None  # (candidates, ships) action codes
+        self.visits = np.zeros(0)
+        self.value_sum = np.zeros(0)
+        # Rollouts that picked a candidate and have not finished yet, so the games of a batch spread out
+        self.pending = np.zeros(0)
+        self.children: Dict[int, LookaheadNode] = {}
+
+    @property
+    def expanded(self) -> bool:
+        return self.candidates is not None
+
+    def expand(self, ship_uids: np.ndarray, candidates: np.ndarray) -> None:
+        self.ship_uids = ship_uids
+        self.candidates = candidates
+        self.visits = np.zeros(len(candidates))
+        self.value_sum = np.zeros(len(candidates))
+        self.pending = np.zeros(len(candidates))
+
+    def add_candidate(self, candidate: np.ndarray) -> int:
+        # Index of the candidate, it is appended if it is new
+        matches = np.flatnonzero((self.candidates == candidate).all(axis=1))
+        if matches.size > 0:
+            return matches[0].item()
+        self.candidates = np.vstack([self.candidates, candidate])
+        self.visits = np.r_[self.visits, 0]
+        self.value_sum = np.r_[self.value_sum, 0]
+        self.pending = np.r_[self.pending, 0]
+        return len(self.candidates) - 1
+
+    def select(self, value_scale: float) -> int:
+        # UCB1, candidates without visits first (in their order)
+        visits = self.visits + self.pending
+        if (visits == 0).any():
+            return np.argmax(visits == 0).item()
+        means = np.divide(self.value_sum, self.visits, out=np.zeros_like(self.value_sum), where=self.visits > 0)
+        bounds = means + exploration * value_scale * np.sqrt(np.log(visits.sum()) / visits)
+        return np.argmax(bounds).item()
+
+    def best(self) -> int:
+        # The most visited candidate, the earlier one on ties (the heuristic is the first candidate of a root)
+        return np.argmax(self.visits).item()
+
+    def decay(self, factor: float) -> None:
+        self.visits *= factor
+        self.value_sum *= factor
+        for child in self.children.values():
+            child.decay(factor)
+
+
+def perturbed_candidates(heuristic: np.ndarray, count: int, generator: np.random.Generator) -> np.ndarray:
+    # The heuristic and count - 1 copies with perturbed_ships ships moving differently, converting ships keep converting
+    candidates = np.tile(heuristic, (count, 1))
+    movable = np.flatnonzero(heuristic != convert_code)
+    if movable.size == 0:
+        return candidates[:1]
+    for candidate in candidates[1:]:
+        ships = generator.choice(movable, min(perturbed_ships, movable.size), replace=False)
+        # A different one of the five moves (including staying)
+        candidate[ships] = (heuristic[ships] + generator.integers(1, stay_code + 1, ships.size)) % (stay_code + 1)
+    # Without duplicates, in their order
+    _, first = np.unique(candidates, axis=0, return_index=True)
+    return candidates[np.sort(first)]
+
+
+class Lookahead:
+    def __init__(self, policy: Callable[[BatchObservation, int, Dict[str, Any]], Tuple[np.ndarray, np.ndarray]],
+                 budget: float = lookahead_budget, candidates: int = lookahead_candidates,
+                 rollouts: int = rollouts_per_batch, steps: int = rollout_steps, seed: int = 0):
+        self.policy = policy
+        self.budget = budget
+        self.candidates_count = candidates
+        self.rollouts = rollouts
+        self.steps = steps
+        self.generator = np.random.default_rng(seed)
+        self.simulator = None
+        # Root of the next turn and the step it belongs to
+        self.tree: Union[LookaheadNode, None] = None
+        self.tree_step = None
+        # Measured seconds per step of a batch
+        self.step_seconds = None
+        # Statistics of the last search
+        self.last_rollouts = 0
+
+    def deadline(self, turn_start: float, config: Dict[str, Any]) -> float:
+        return turn_start + self.budget * act_timeout(config)
+
+    def search(self, observation: DecodedObservation, ship_ids: List[str], heuristic: np.ndarray,
+               config: Dict[str, Any], deadline: float) -> np.ndarray:
+        # Action codes for the ships (ship_ids in any order), the heuristic if no rollout finishes before the deadline
+        uids = np.array([parse_uid(ship_id) for ship_id in ship_ids], dtype=int)
+        order = np.argsort(uids)
+        root = self.root(observation.step, uids[order], heuristic[order])
+        heuristic_index = root.add_candidate(heuristic[order])
+
+        self.last_rollouts = 0
+        while self.step_seconds is None or time.perf_counter() + self.steps * self.step_seconds < deadline:
+            finished = self.run_batch(root, observation, config, deadline)
+            # Nothing was measured if the game ends with this turn
+            if not finished or self.step_seconds is None:
+                break
+            self.last_rollouts += self.rollouts
+
+        best = root.best() if self.last_rollouts > 0 else heuristic_index
+        self.tree = root.children.get(best)
+        self.tree_step = observation.step + 1
+        codes = np.empty_like(heuristic)
+        codes[order] = root.candidates[best]
+        return codes
+
+    def root(self, step: int, ship_uids: np.ndarray, heuristic: np.ndarray) -> LookaheadNode:
+        # The node reached by the last chosen candidate if the fleet is the same, a new node otherwise
+        root = self.tree
+        if (root is None or self.tree_step != step or not root.expanded or root.ship_uids.size != ship_uids.size
+                or (root.ship_uids != ship_uids).any()):
+            root = LookaheadNode()
+            root.expand(ship_uids, perturbed_candidates(heuristic, self.candidates_count, self.generator))
+        else:
+            root.decay(reuse_decay)
+        self.tree = None
+        return root
+
+    def run_batch(self, root: LookaheadNode, observation: DecodedObservation, config: Dict[str, Any],
+                  deadline: float) -> bool:
+        # One rollout per game of the batch, returns whether they finished before the deadline
+        start = time.perf_counter()
+        player = observation.player
+        if (self.simulator is None or self.simulator.size != observation.size
+                or self.simulator.agents_count != observation.player_halite.size):
+            # Built from the observation, generating boards would reseed the global random generators every time
+            self.simulator = BatchSimulator(list(range(self.rollouts)), dict(config), observation.player_halite.size,
+                                            observation)
+        else:
+            self.simulator.load(observation)
+        simulator = self.simulator
+        nodes = [root] * self.rollouts
+        paths: List[List[Tuple[LookaheadNode, int]]] = [[] for _ in range(self.rollouts)]
+        value_scale = config['spawnCost']
+
+        finished = True
+        steps = 0
+        while steps < self.steps and not simulator.done:
+            if time.perf_counter() > deadline:
+                finished = False
+                break
+            obs = simulator.observation()
+            ship_actions = np.full(simulator.ship_games.size, stay_code)
+            shipyard_spawns = np.zeros(simulator.shipyard_games.size, dtype=bool)
+            for seat in np.flatnonzero(simulator.active.any(axis=0)).tolist():
+                seat_ship_actions, seat_shipyard_spawns = self.policy(obs, seat, simulator.configuration)
+                ships = simulator.ship_players == seat
+                shipyards = simulator.shipyard_players == seat
+                ship_actions[ships] = seat_ship_actions[ships]
+                shipyard_spawns[shipyards] = seat_shipyard_spawns[shipyards]
+            policy_actions = ship_actions.copy()
+
+            # Random moves keep the rollouts of a candidate apart
+            noisy = (self.generator.random(ship_actions.size) < rollout_noise) & (ship_actions != convert_code)
+            ship_actions[noisy] = self.generator.integers(0, stay_code + 1, noisy.sum())
+
+            if steps < tree_depth:
+                own = simulator.ship_players == player
+                for game in range(self.rollouts):
+                    node = nodes[game]
+                    if node is None:
+                        continue
+                    ships = np.flatnonzero(own & (simulator.ship_games == game))
+                    uids = simulator.ship_uids[ships]
+                    if not node.expanded:
+                        order = np.argsort(uids)
+                        node.expand(uids[order], perturbed_candidates(policy_actions[ships[order]],
+                                                                      self.candidates_count, self.generator))
+                    candidate = node.select(value_scale)
+                    node.pending[candidate] += 1
+                    paths[game].append((node, candidate))
+                    # Ships that are not part of the candidates (spawned in the rollout) act by the policy
+                    if node.ship_uids.size > 0:
+                        index = np.minimum(np.searchsorted(node.ship_uids, uids), node.ship_uids.size - 1)
+                        known = node.ship_uids[index] == uids
+                        ship_actions[ships[known]] = node.candidates[candidate, index[known]]
+                    nodes[game] = node.children.setdefault(candidate, LookaheadNode())
+
+            simulator.step(ship_actions, shipyard_spawns)
+            steps += 1
+
+        # Own halite, cargo and ships of every game
+        ships = simulator.ship_players == player
+        cargo = np.bincount(simulator.ship_games[ships], simulator.ship_cargo[ships], minlength=self.rollouts)
+        ships_count = np.bincount(simulator.ship_games[ships], minlength=self.rollouts)
+        values = (simulator.player_halite[:, player] + cargo_value * cargo
+                  + ship_value * config['spawnCost'] * ships_count)
+        for game, path in enumerate(paths):
+            for node, candidate in path:
+                node.pending[candidate] -= 1
+                if finished:
+                    node.visits[candidate] += 1
+                    node.value_sum[candidate] += values[game]
+
+        if finished and steps > 0:
+            seconds = (time.perf_counter() - start) / steps
+            self.step_seconds = seconds if self.step_seconds is None else 0.8 * self.step_seconds + 0.2 * seconds
+        return finished
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+# Observation Decoder ##################################################################################################
+
+# Decodes a kaggle observation into NumPy tables with a single conversion per unit type, instead of every bot looping
+# over the unit dicts on its own. Units are stored as structured arrays ordered by owner (and by their order in
+# the observation within an owner), their ids are kept in lists of the same order. The boards are [y, x] grids with the
+# owner of the unit on every square and `empty` (-1) on squares without one, so checking a square is an integer
+# comparison instead of a NaN test.
+#
+# The arrays are created for every decoded observation and shared by everything reading it. Flat views of the boards
+# (board.reshape(-1)) share their memory, a position can therefore be used as index directly.
+
+empty = -1
+
+ship_dtype = np.dtype([('owner', np.int8), ('position', np.int32), ('y', np.int32), ('x', np.int32),
+                       ('cargo', np.float64)])
+shipyard_dtype = np.dtype([('owner', np.int8), ('position', np.int32), ('y', np.int32), ('x', np.int32)])
+
+
+class DecodedObservation(NamedTuple):
+    step: int
+    player: int
+    size: int
+    player_halite: np.ndarray
+    ships: np.ndarray
+    ship_ids: List[str]
+    shipyards: np.ndarray
+    shipyard_ids: List[str]
+    # [y, x] boards
+    board_halite: np.ndarray
+    board_ships: np.ndarray
+    board_ships_cargo: np.ndarray
+    board_shipyards: np.ndarray
+
+    def player_ships(self, player: int) -> slice:
+        # Rows of the ships of the player in ships and ship_ids
+        return slice(*np.searchsorted(self.ships['owner'], [player, player + 1]).tolist())
+
+    def player_shipyards(self, player: int) -> slice:
+        return slice(*np.searchsorted(self.shipyards['owner'], [player, player + 1]).tolist())
+
+
+def decode_units(units: List[Dict[str, Any]], dtype: np.dtype, size: int) -> np.ndarray:
+    # Structured array of the units of all players, units[player] maps the unit ids to a position or [position, cargo]
+    counts = [len(player_units) for player_units in units]
+    table = np.empty(sum(counts), dtype=dtype)
+    table['owner'] = np.repeat(np.arange(len(units)), counts)
+    values = [value for player_units in units for value in player_units.values()]
+    if 'cargo' in dtype.names:
+        values = np.array(values, dtype=float).reshape(-1, 2)
+        table['cargo'] = values[:, 1]
+        positions = values[:, 0].astype(np.int32)
+    else:
+        positions = np.array(values, dtype=np.int32)
+    table['position'] = positions
+    table['y'], table['x'] = np.divmod(positions, size)
+    return table
+
+
+def decode_players(obs: Dict[str, Any], size: int) -> Tuple[np.ndarray, np.ndarray, List[str], np.ndarray, List[str]]:
+    # Halite of the players and the unit tables with their ids, without the boards (for BoardState, which keeps its own)
+    players = obs['players']
+    player_halite = np.array([player[0] for player in players], dtype=float)
+    ships = decode_units([player[2] for player in players], ship_dtype, size)
+    shipyards = decode_units([player[1] for player in players], shipyard_dtype, size)
+    return (player_halite, ships, [ship_id for player in players for ship_id in player[2]],
+            shipyards, [shipyard_id for player in players for shipyard_id in player[1]])
+
+
+def decode_observation(obs: Dict[str, Any], size: int) -> DecodedObservation:
+    player_halite, ships, ship_ids, shipyards, shipyard_ids = decode_players(obs, size)
+
+    board_ships = np.full((size, size), empty, dtype=np.int8)
+    board_ships_cargo = np.zeros((size, size))
+    board_shipyards = np.full((size, size), empty, dtype=np.int8)
+    board_ships.reshape(-1)[ships['position']] = ships['owner']
+    board_ships_cargo.reshape(-1)[ships['position']] = ships['cargo']
+    board_shipyards.reshape(-1)[shipyards['position']] = shipyards['owner']
+
+    return DecodedObservation(obs['step'], obs['player'], size, player_halite, ships, ship_ids, shipyards, shipyard_ids,
+                              np.asarray(obs['halite'], dtype=float).reshape(size, size), board_ships,
+                              board_ships_cargo, board_shipyards)
@@ -0,0 +1,133 @@
+import json
+import os
+import time
+import warnings
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Union
+
+import numpy as np
+
+# Profiling ############################################################################################################
+
+# Per-turn wall time of the agents, split into phases. Agents are wrapped with profiled_agent and mark their phases with
+# "with profiler.phase('score'):". While profiling is disabled both only cost a flag check.
+#
+# Profiling is enabled by setting the environment variable HALITE_PROFILE (e.g. for games run by file path) or by
+# calling profiler.enable(). HALITE_PROFILE_FILE additionally appends every turn as one line to a JSONL file.
+
+# Seconds, the default of kaggle_environments (and of halite_sim), used if the configuration does not contain actTimeout
+default_act_timeout = 3
+
+
+def act_timeout(config: Dict[str, Any]) -> float:
+    return config.get('actTimeout') or default_act_timeout
+
+
+class _Phase:
+    __slots__ = ('phases', 'name', 'start')
+
+    def __init__(self, phases: Dict[str, float], name: str):
+        self.phases = phases
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.phases[self.name] = self.phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, buffer_size: int = 10000, jsonl_path: Union[str, None] = None,
+                 budget_fraction: float = 0.8):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        # Turns taking longer than this fraction of actTimeout raise the alarm
+        self.budget_fraction = budget_fraction
+        self.records = deque(maxlen=buffer_size)
+        self.over_budget_turns = 0
+        self._turn = None
+        self._null_phase = nullcontext()
+
+    def enable(self, jsonl_path: Union[str, None] = None) -> None:
+        self.enabled = True
+        if jsonl_path is not None:
+            self.jsonl_path = jsonl_path
+
+    def disable(self) -> None:
+        self.enabled = False
+        self._turn = None
+
+    def reset(self) -> None:
+        self.records.clear()
+        self.over_budget_turns = 0
+
+    def phase(self, name: str):
+        if self._turn is None:
+            return self._null_phase
+        return _Phase(self._turn['phases'], name)
+
+    def start_turn(self, agent_name: str, step: int, act_timeout: float) -> None:
+        self._turn = {'agent': agent_name, 'step': step, 'act_timeout': act_timeout, 'phases': {},
+                      'start': time.perf_counter()}
+
+    def end_turn(self) -> Dict[str, Any]:
+        turn = self._turn
+        self._turn = None
+        record = {'agent': turn['agent'], 'step': turn['step'], 'total': time.perf_counter() - turn['start'],
+                  'phases': turn['phases']}
+        record['over_budget'] = record['total'] > self.budget_fraction * turn['act_timeout']
+
+        self.records.append(record)
+        if self.jsonl_path is not None:
+            with open(self.jsonl_path, 'a') as jsonl_file:
+                jsonl_file.write(json.dumps(record) + '\n')
+        if record['over_budget']:
+            self.over_budget_turns += 1
+            warnings.warn(f"{record['agent']} used {record['total']:.3f}s in step {record['step']}, more than "
+                          f"{self.budget_fraction:.0%} of actTimeout ({turn['act_timeout']}s)", RuntimeWarning)
+        return record
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        # p50, p95 and max in seconds of every phase (and the whole turn as 'total') per agent
+        times = {}
+        for record in self.records:
+            agent_times = times.setdefault(record['agent'], {})
+            agent_times.setdefault('total', []).append(record['total'])
+            for phase, seconds in record['phases'].items():
+                agent_times.setdefault(phase, []).append(seconds)
+
+        summary = {}
+        for agent_name, agent_times in times.items():
+            summary[agent_name] = {}
+            for phase, seconds in agent_times.items():
+                p50, p95 = np.percentile(seconds, [50, 95])
+                summary[agent_name][phase] = {'p50': float(p50), 'p95': float(p95), 'max': float(np.max(seconds)),
+                                              'turns': len(seconds)}
+        return summary
+
+
+profiler = Profiler(enabled=bool(os.environ.get('HALITE_PROFILE')), jsonl_path=os.environ.get('HALITE_PROFILE_FILE'))
+
+
+def profiled_agent(agent_name: str) -> Callable:
+    # Decorator for the agent entry points, every call is recorded as one turn while profiling is enabled
+    def decorator(agent_function: Callable) -> Callable:
+        @wraps(agent_function)
+        def profiled_agent_function(obs, config):
+            if not profiler.enabled:
+                return agent_function(obs, config)
+
+            profiler.start_turn(agent_name, obs['step'], act_timeout(config))
+            try:
+                return agent_function(obs, config)
+            finally:
+                profiler.end_turn()
+
+        return profiled_agent_function
+
+    return decorator
@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+from typing import Any, Callable, Dict, List, Union
+
+import numpy as np
+
+from halite_sim import HaliteSimulator, load_agent, parse_uid, ship_action_codes, stay_code, uid_string
+
+# Replays ##############################################################################################################
+
+# Compact binary replays: every game is a directory of flat binary files with one fixed-shape record per step (or per
+# unit and step), written step by step while the game is played and read back through np.memmap. A single step or a
+# single field of all steps is read without decoding the rest of the game.
+#
+#     meta.json                 configuration, agents, final rewards and statuses, format version
+#     halite.bin                float32 (steps, size, size)
+#     players.bin               player_dtype (steps, agents)
+#     ships.bin                 ship_dtype, the ships of all steps one after the other
+#     ship_ends.bin             int64 (steps,), end of the ships of every step in ships.bin
+#     shipyards.bin             shipyard_dtype, as ships.bin
+#     shipyard_ends.bin         int64 (steps,)
+#
+# The actions stored with a unit are the actions the agents returned for the observation of the step (kaggle replays
+# store them with the following step). A step is complete once all files have its records, so the steps of an
+# interrupted game can still be read.
+#
+#     python replay.py convert episode.json --output replays        # kaggle_environments JSON replays
+#     python replay.py info replays/episode.replay
+
+replay_version = 2
+
+player_dtype = np.dtype([('halite', 'f8'), ('reward', 'f8'), ('status', 'u1')])
+ship_dtype = np.dtype([('uid', 'u4'), ('player', 'u1'), ('position', 'u2'), ('cargo', 'f4'), ('action', 'u1')])
+shipyard_dtype = np.dtype([('uid', 'u4'), ('player', 'u1'), ('position', 'u2'), ('action', 'u1')])
+
+statuses = ['ACTIVE', 'DONE', 'ERROR', 'INVALID', 'TIMEOUT', 'INACTIVE']
+status_codes = {status: code for code, status in enumerate(statuses)}
+# Ship actions use the codes of halite_sim (4 is no action), shipyards spawn or do nothing
+ship_actions = {code: action for action, code in ship_action_codes.items()}
+no_spawn_code = 0
+spawn_code = 1
+
+
+# Unit Ids #############################################################################################################
+
+# Unit ids are stored in the encoding of halite_sim (step * uid_base + counter), which fits 32 bits for the 400 steps
+def encode_uids(uids: List[str]) -> np.ndarray:
+    return np.array([parse_uid(uid) for uid in uids], dtype=np.uint32)
+
+
+# Writer ###############################################################################################################
+
+class ReplayWriter:
+    def __init__(self, path: str, configuration: Dict[str, Any], agents_count: int,
+                 agents: Union[List[str], None] = None):
+        self.path = path
+        self.size = configuration['size']
+        self.agents_count = agents_count
+        self.meta = {'version': replay_version, 'configuration': dict(configuration), 'agents_count': agents_count,
+                     'agents': agents, 'rewards': None, 'statuses': None}
+        os.makedirs(path, exist_ok=True)
+        self._write_meta()
+        self.files = {name: open(os.path.join(path, f'{name}.bin'), 'wb')
+                      for name in ('halite', 'players', 'ships', 'ship_ends', 'shipyards', 'shipyard_ends')}
+        self.ships_count = 0
+        self.shipyards_count = 0
+        self.steps = 0
+
+    def _write_meta(self) -> None:
+        with open(os.path.join(self.path, 'meta.json'), 'w') as meta_file:
+            json.dump(self.meta, meta_file)
+
+    def write_step(self, halite: np.ndarray, players: np.ndarray, ships: np.ndarray, shipyards: np.ndarray) -> None:
+        # Appends one step: halite of the squares, a player_dtype record per player and the ship_dtype and
+        # shipyard_dtype records of all units. The step counts only once the halite is written, which comes last.
+        ships.astype(ship_dtype, copy=False).tofile(self.files['ships'])
+        shipyards.astype(shipyard_dtype, copy=False).tofile(self.files['shipyards'])
+        self.ships_count += ships.size
+        self.shipyards_count += shipyards.size
+        np.array([self.ships_count], dtype=np.int64).tofile(self.files['ship_ends'])
+        np.array([self.shipyards_count], dtype=np.int64).tofile(self.files['shipyard_ends'])
+        players.astype(player_dtype, copy=False).tofile(self.files['players'])
+        np.asarray(halite, dtype=np.float32).reshape(self.size ** 2).tofile(self.files['halite'])
+        self.steps += 1
+        for replay_file in self.files.values():
+            replay_file.flush()
+
+    def write_state(self, halite: List[float], players: List[List[Any]], player_statuses: List[str],
+                    rewards: List[Union[int, float, None]], actions: List[Union[Dict[str, str], None]]) -> None:
+        # One step from the observation format: the halite list and the players of an observation, the status and
+        # reward of every agent and the actions the agents returned for this observation
+        player_records = np.zeros(self.agents_count, dtype=player_dtype)
+        ship_records = []
+        shipyard_records = []
+        for player, (player_halite, player_shipyards, player_ships) in enumerate(players):
+            player_records[player] = (player_halite, np.nan if rewards[player] is None else rewards[player],
+                                      status_codes[player_statuses[player]])
+            player_actions = actions[player] or {}
+            for uid, (position, cargo) in player_ships.items():
+                action = ship_action_codes.get(player_actions.get(uid), stay_code)
+                ship_records.append((parse_uid(uid), player, position, cargo, action))
+            for uid, position in player_shipyards.items():
+                action = spawn_code if player_actions.get(uid) == 'SPAWN' else no_spawn_code
+                shipyard_records.append((parse_uid(uid), player, position, action))
+        self.write_step(np.array(halite), player_records, np.array(ship_records, dtype=ship_dtype),
+                        np.array(shipyard_records, dtype=shipyard_dtype))
+
+    def write_simulator(self, simulator: HaliteSimulator, actions: List[Any]) -> None:
+        # The current state of a simulator and the actions of its agents, straight from its arrays
+        player_records = np.zeros(self.agents_count, dtype=player_dtype)
+        player_records['halite'] = simulator.player_halite
+        player_records['reward'] = [np.nan if reward is None else reward for reward in simulator.rewards]
+        player_records['status'] = [status_codes[status] for status in simulator.statuses]
+        actions = [action if isinstance(action, dict) else {} for action in actions]
+
+        ships = np.zeros(simulator.ship_ids.size, dtype=ship_dtype)
+        ships['uid'] = encode_uids(simulator.ship_ids.tolist())
+        ships['player'] = simulator.ship_players
+        ships['position'] = simulator.ship_positions
+        ships['cargo'] = simulator.ship_cargo
+        ships['action'] = [ship_action_codes.get(actions[player].get(uid), stay_code)
+                           for uid, player in zip(simulator.ship_ids.tolist(), simulator.ship_players.tolist())]
+
+        shipyards = np.zeros(simulator.shipyard_ids.size, dtype=shipyard_dtype)
+        shipyards['uid'] = encode_uids(simulator.shipyard_ids.tolist())
+        shipyards['player'] = simulator.shipyard_players
+        shipyards['position'] = simulator.shipyard_positions
+        shipyards['action'] = [spawn_code if actions[player].get(uid) == 'SPAWN' else no_spawn_code
+                               for uid, player in zip(simulator.shipyard_ids.tolist(),
+                                                      simulator.shipyard_players.tolist())]
+        self.write_step(simulator.halite, player_records, ships, shipyards)
+
+    def close(self, rewards: Union[List[Any], None] = None, final_statuses: Union[List[str], None] = None) -> None:
+        for replay_file in self.files.values():
+            replay_file.close()
+        self.meta.update(steps=self.steps, rewards=rewards, statuses=final_statuses)
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.files['halite'].closed:
+            self.close()
+        return False
+
+
+# Reader ###############################################################################################################
+
+def _memmap(path: str, dtype: np.dtype, rows: int, shape: tuple = ()) -> np.ndarray:
+    # np.memmap can not map empty files
+    if rows == 0:
+        return np.zeros((0,) + shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(rows,) + shape)
+
+
+class Replay:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            self.meta = json.load(meta_file)
+        if self.meta['version'] != replay_version:
+            raise ValueError(f"{path} has replay version {self.meta['version']}, {replay_version} is supported")
+        self.configuration = self.meta['configuration']
+        self.size = self.configuration['size']
+        self.agents_count = self.meta['agents_count']
+
+        def rows(name: str, row_size: int) -> int:
+            return os.path.getsize(os.path.join(path, f'{name}.bin')) // row_size
+
+        self.steps = min(rows('halite', 4 * self.size ** 2), rows('players', player_dtype.itemsize * self.agents_count),
+                         rows('ship_ends', 8), rows('shipyard_ends', 8))
+        self.ship_ends = _memmap(os.path.join(path, 'ship_ends.bin'), np.int64, self.steps)
+        self.shipyard_ends = _memmap(os.path.join(path, 'shipyard_ends.bin'), np.int64, self.steps)
+        ships_count = int(self.ship_ends[-1]) if self.steps else 0
+        shipyards_count = int(self.shipyard_ends[-1]) if self.steps else 0
+
+        # Whole-game tables, fields are read with e.g. replay.ships['cargo']
+        self.halite = _memmap(os.path.join(path, 'halite.bin'), np.float32, self.steps, (self.size, self.size))
+        self.players = _memmap(os.path.join(path, 'players.bin'), player_dtype, self.steps, (self.agents_count,))
+        self.ships = _memmap(os.path.join(path, 'ships.bin'), ship_dtype, ships_count)
+        self.shipyards = _memmap(os.path.join(path, 'shipyards.bin'), shipyard_dtype, shipyards_count)
+
+    def __len__(self) -> int:
+        return self.steps
+
+    def ships_at(self, step: int) -> np.ndarray:
+        return self.ships[self.ship_ends[step - 1] if step > 0 else 0:self.ship_ends[step]]
+
+    def shipyards_at(self, step: int) -> np.ndarray:
+        return self.shipyards[self.shipyard_ends[step - 1] if step > 0 else 0:self.shipyard_ends[step]]
+
+    def ship_steps(self) -> np.ndarray:
+        # Step of every record in ships, to group the whole table by step
+        return np.repeat(np.arange(self.steps), np.diff(self.ship_ends, prepend=0))
+
+    def shipyard_steps(self) -> np.ndarray:
+        return np.repeat(np.arange(self.steps), np.diff(self.shipyard_ends, prepend=0))
+
+    def observation(self, step: int) -> Dict[str, Any]:
+        # The halite and players of the step in the observation format (floats are rounded to the 3 decimals of the
+        # halite rules)
+        players = [[round(float(record['halite']), 3), {}, {}] for record in self.players[step]]
+        for ship in self.ships_at(step).tolist():
+            uid, player, position, cargo, _ = ship
+            players[player][2][uid_string(uid)] = [position, round(cargo, 3)]
+        for shipyard in self.shipyards_at(step).tolist():
+            uid, player, position, _ = shipyard
+            players[player][1][uid_string(uid)] = position
+        return {'step': step, 'halite': np.round(self.halite[step].ravel().astype(float), 3).tolist(),
+                'players': players}
+
+    def actions(self, step: int) -> List[Dict[str, str]]:
+        # The actions of every player for the observation of the step, in the format returned by the agents
+        actions = [{} for _ in range(self.agents_count)]
+        for uid, player, _, _, action in self.ships_at(step).tolist():
+            if action != stay_code:
+                actions[player][uid_string(uid)] = ship_actions[action]
+        for uid, player, _, action in self.shipyards_at(step).tolist():
+            if action == spawn_code:
+                actions[player][uid_string(uid)] = 'SPAWN'
+        return actions
+
+
+# Recording and Conversion #############################################################################################
+
+def record_game(simulator: HaliteSimulator, agents: List[Union[str, Callable]], path: str,
+                names: Union[List[str], None] = None) -> List[Union[int, float, None]]:
+    # Plays the game of the simulator like HaliteSimulator.run and writes every step to a replay
+    agents = [load_agent(agent) if isinstance(agent, str) else agent for agent in agents]
+    with ReplayWriter(path, dict(simulator.configuration), simulator.agents_count, names) as writer:
+        while not simulator.done:
+            actions = simulator.act(agents)
+            writer.write_simulator(simulator, actions)
+            simulator.step(actions)
+        writer.write_simulator(simulator, [None] * simulator.agents_count)
+        writer.close(simulator.rewards, simulator.statuses)
+    return simulator.rewards
+
+
+def convert_json(replay: Union[str, Dict[str, Any]], path: str) -> None:
+    # Converts a replay of kaggle_environments (a JSON file or the dict of env.toJSON()), the actions of a step are
+    # taken from the following step
+    if isinstance(replay, str):
+        with open(replay) as replay_file:
+            replay = json.load(replay_file)
+    steps = replay['steps']
+    agents_count = len(steps[0])
+    names = replay.get('info', {}).get('TeamNames')
+
+    with ReplayWriter(path, replay['configuration'], agents_count, names) as writer:
+        for step, states in enumerate(steps):
+            observation = states[0]['observation']
+            actions = [state['action'] for state in steps[step + 1]] if step + 1 < len(steps) else [None] * agents_count
+            writer.write_state(observation['halite'], observation['players'], [state['status'] for state in states],
+                               [state['reward'] for state in states], actions)
+        writer.close(replay.get('rewards'), replay.get('statuses'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Convert and inspect binary Halite replays.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help='convert JSON replays of kaggle_environments')
+    convert_parser.add_argument('replays', nargs='+')
+    convert_parser.add_argument('--output', default='replays', help='directory of the binary replays')
+    info_parser = commands.add_parser('info', help='summary of binary replays')
+    info_parser.add_argument('replays', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        for json_path in args.replays:
+            name = os.path.splitext(os.path.basename(json_path))[0]
+            convert_json(json_path, os.path.join(args.output, f'{name}.replay'))
+            print(f'{json_path} -> {os.path.join(args.output, name)}.replay')
+    else:
+        for path in args.replays:
+            replay = Replay(path)
+            print(f"{path}: {replay.steps} steps, size {replay.size}, agents {replay.meta['agents']}, "
+                  f"rewards {replay.meta['rewards']}, {replay.ships.size} ship and {replay.shipyards.size} shipyard "
+                  f"records")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import glob
+import multiprocessing
+import os
+from typing import Any, Dict, Iterator, List, Union
+
+import numpy as np
+
+from halite_sim import convert_code, stay_code, uid_base
+from replay import Replay, spawn_code, status_codes
+
+# Replay Analytics #####################################################################################################
+
+# Per-bot metrics over a corpus of binary replays (replay.py). Every replay is analysed on its own from the whole-game
+# unit tables with array operations, which gives additive counters per bot. The replays are spread over a process pool
+# and only the counters are sent back and summed, so the memory stays bounded by one replay per worker.
+#
+#     python halite_sim.py --games 200 --replays replays
+#     python replay_analytics.py replays --output analytics
+#
+# Ships are followed from one step to the next by their id:
+#   mined               halite collected by ships that stayed (the halite of their square drops by the same amount)
+#   idle turns          ships that stayed without collecting anything
+#   deposits            cargo that drops to 0 on an own shipyard, the latency is the number of turns since the
+#                       previous deposit of the ship or since it was spawned
+#   lost ships          ships that are gone in the next step without converting (collisions and enemy shipyards),
+#                       with the cargo they carried
+#   shipyard turns      turns of every shipyard, with the spawns
+
+counters = ['games', 'reward', 'ship_turns', 'mined', 'idle_turns', 'deposits', 'deposited', 'deposit_latency',
+            'ships_lost', 'cargo_lost', 'shipyard_turns', 'spawns']
+
+
+# Metrics ##############################################################################################################
+
+def game_metrics(replay: Replay, names: List[str]) -> Dict[str, Dict[str, Any]]:
+    # Counters of every bot of the game and its halite per turn (bank and cargo), bots in several seats are summed
+    steps = replay.steps
+    squares = replay.size ** 2
+    agents_count = replay.agents_count
+    halite = np.asarray(replay.halite).reshape(steps, squares)
+    players = np.asarray(replay.players)
+    ships = np.asarray(replay.ships)
+    shipyards = np.asarray(replay.shipyards)
+    ship_steps = replay.ship_steps()
+    shipyard_steps = replay.shipyard_steps()
+
+    # The same ship in the next step, found by sorting the ships by (step, id)
+    keys = ship_steps.astype(np.int64) << 32 | ships['uid']
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    next_keys = keys + (1 << 32)
+    found_at = np.minimum(np.searchsorted(sorted_keys, next_keys), max(keys.size - 1, 0))
+    survived = (keys.size > 0) & (sorted_keys[found_at] == next_keys)
+    following = order[found_at]
+
+    acting = ship_steps < steps - 1
+    next_step = np.minimum(ship_steps + 1, steps - 1)
+    positions = ships['position'].astype(np.int64)
+    cargo = ships['cargo'].astype(float)
+    stayed = acting & survived & (ships['action'] == stay_code)
+    mined = np.where(stayed, halite[ship_steps, positions] - halite[next_step, positions], 0)
+    mined = np.maximum(mined, 0)
+    idle = stayed & (mined == 0)
+
+    # Deposits on own shipyards
+    shipyard_owner = np.full((steps, squares), -1, dtype=np.int16)
+    shipyard_owner[shipyard_steps, shipyards['position']] = shipyards['player']
+    next_positions = ships['position'][following].astype(np.int64)
+    depositing = (survived & acting & (cargo > 0) & (ships['cargo'][following] == 0)
+                  & (shipyard_owner[next_step, next_positions] == ships['player']))
+    deposit_uids = ships['uid'][depositing].astype(np.int64)
+    deposit_steps = next_step[depositing]
+    deposit_order = np.lexsort((deposit_steps, deposit_uids))
+    deposit_uids, deposit_steps = deposit_uids[deposit_order], deposit_steps[deposit_order]
+    # The first deposit of a ship counts from its spawn, the step is the first part of its id
+    previous_steps = np.where(np.r_[False, deposit_uids[1:] == deposit_uids[:-1]],
+                              np.r_[0, deposit_steps[:-1]], deposit_uids // uid_base)
+    deposit_players = ships['player'][depositing][deposit_order]
+
+    # Ships that are gone without converting, units of failed agents are removed by the rules and do not count
+    next_status = players['status'][next_step, ships['player']]
+    lost = (acting & ~survived & (ships['action'] != convert_code)
+            & ((next_status == status_codes['ACTIVE']) | (next_status == status_codes['DONE'])))
+
+    shipyard_acting = shipyard_steps < steps - 1
+
+    def per_player(mask: np.ndarray, unit_players: np.ndarray, weights: Union[np.ndarray, None] = None) -> np.ndarray:
+        return np.bincount(unit_players[mask], None if weights is None else weights[mask], minlength=agents_count)
+
+    ship_players = ships['player'].astype(np.int64)
+    player_counters = {
+        'reward': np.nan_to_num(players['reward'][-1]) if steps else np.zeros(agents_count),
+        'ship_turns': per_player(acting, ship_players),
+        'mined': per_player(acting, ship_players, mined),
+        'idle_turns': per_player(idle, ship_players),
+        'deposits': per_player(depositing, ship_players),
+        'deposited': per_player(depositing, ship_players, cargo),
+        'deposit_latency': np.bincount(deposit_players, deposit_steps - previous_steps, minlength=agents_count),
+        'ships_lost': per_player(lost, ship_players),
+        'cargo_lost': per_player(lost, ship_players, cargo),
+        'shipyard_turns': per_player(shipyard_acting, shipyards['player'].astype(np.int64)),
+        'spawns': per_player(shipyard_acting & (shipyards['action'] == spawn_code),
+                             shipyards['player'].astype(np.int64)),
+    }
+    cargo_curve = np.bincount(ship_steps * agents_count + ship_players, cargo,
+                              minlength=steps * agents_count).reshape(steps, agents_count)
+    halite_curve = players['halite'] + cargo_curve
+
+    metrics = {}
+    for player, name in enumerate(names):
+        bot = metrics.setdefault(name, dict({counter: 0.0 for counter in counters}, halite_curve=np.zeros(steps),
+                                            curve_games=np.zeros(steps)))
+        bot['games'] += 1
+        for counter, values in player_counters.items():
+            bot[counter] += float(values[player])
+        bot['halite_curve'] += halite_curve[:, player]
+        bot['curve_games'] += 1
+    return metrics
+
+
+def merge_metrics(total: Dict[str, Dict[str, Any]], metrics: Dict[str, Dict[str, Any]]) -> None:
+    # Sums the counters of a game into the total, curves of longer games extend the curves of the total
+    for name, bot in metrics.items():
+        if name not in total:
+            total[name] = bot
+            continue
+        for counter in counters:
+            total[name][counter] += bot[counter]
+        for curve in ('halite_curve', 'curve_games'):
+            length = max(total[name][curve].size, bot[curve].size)
+            total[name][curve] = (np.pad(total[name][curve], (0, length - total[name][curve].size))
+                                  + np.pad(bot[curve], (0, length - bot[curve].size)))
+
+
+def summary_table(total: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    rows = []
+    for name, bot in sorted(total.items()):
+        rows.append({'bot': name, 'games': int(bot['games']), 'mean_reward': bot['reward'] / bot['games'],
+                     'mining_efficiency': bot['mined'] / max(bot['ship_turns'], 1),
+                     'idle_fraction': bot['idle_turns'] / max(bot['ship_turns'], 1),
+                     'deposits_per_game': bot['deposits'] / bot['games'],
+                     'mean_deposit': bot['deposited'] / max(bot['deposits'], 1),
+                     'mean_deposit_latency': bot['deposit_latency'] / max(bot['deposits'], 1),
+                     'ships_lost_per_game': bot['ships_lost'] / bot['games'],
+                     'cargo_lost_per_game': bot['cargo_lost'] / bot['games'],
+                     'shipyard_turns_per_game': bot['shipyard_turns'] / bot['games'],
+                     'spawns_per_shipyard_turn': bot['spawns'] / max(bot['shipyard_turns'], 1),
+                     'deposits_per_shipyard_turn': bot['deposits'] / max(bot['shipyard_turns'], 1)})
+    return rows
+
+
+# Corpus ###############################################################################################################
+
+def find_replays(paths: List[str]) -> List[str]:
+    # Replay directories given directly or found below the given directories
+    replays = []
+    for path in paths:
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            replays.append(path)
+        else:
+            replays += sorted(os.path.dirname(meta) for meta in glob.glob(os.path.join(path, '**', 'meta.json'),
+                                                                         recursive=True))
+    return replays
+
+
+def replay_names(replay: Replay, default_agents: Union[List[str], None]) -> List[str]:
+    names = replay.meta['agents'] or default_agents
+    if names is None:
+        return [f'player_{player}' for player in range(replay.agents_count)]
+    return list(names)
+
+
+def analyse_replay(task: tuple) -> Dict[str, Dict[str, Any]]:
+    path, default_agents = task
+    replay = Replay(path)
+    if replay.steps == 0:
+        return {}
+    return game_metrics(replay, replay_names(replay, default_agents))
+
+
+def analyse_corpus(paths: List[str], processes: int = None, default_agents: Union[List[str], None] = None) \
+        -> Iterator[Dict[str, Dict[str, Any]]]:
+    # Yields the metrics of every replay as they finish
+    tasks = [(path, default_agents) for path in find_replays(paths)]
+    if not tasks:
+        return
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap_unordered(analyse_replay, tasks, chunksize=4)
+
+
+def write_tables(total: Dict[str, Dict[str, Any]], directory: str) -> None:
+    # metrics.csv has one row per bot, halite_curve.csv the mean halite (bank and cargo) of every bot per step
+    os.makedirs(directory, exist_ok=True)
+    rows = summary_table(total)
+    with open(os.path.join(directory, 'metrics.csv'), 'w', newline='') as metrics_file:
+        writer = csv.DictWriter(metrics_file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    names = sorted(total)
+    length = max(total[name]['halite_curve'].size for name in names)
+    with open(os.path.join(directory, 'halite_curve.csv'), 'w', newline='') as curve_file:
+        writer = csv.writer(curve_file)
+        writer.writerow(['step'] + names)
+        curves = []
+        for name in names:
+            curve = total[name]['halite_curve'] / np.maximum(total[name]['curve_games'], 1)
+            curves.append(np.pad(curve, (0, length - curve.size), constant_values=np.nan))
+        for step, values in enumerate(np.array(curves).T.tolist()):
+            writer.writerow([step] + [round(value, 1) for value in values])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Per-bot metrics over a corpus of binary replays.')
+    parser.add_argument('replays', nargs='+', help='replay directories or directories containing replays')
+    parser.add_argument('--agents', nargs='+', default=None, help='bots of the seats of replays without agent names')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--output', default='analytics', help='directory of the tables')
+    args = parser.parse_args()
+
+    total = {}
+    for metrics in analyse_corpus(args.replays, args.processes, args.agents):
+        merge_metrics(total, metrics)
+    if not total:
+        print('no replays found')
+        return
+    write_tables(total, args.output)
+    for row in summary_table(total):
+        print(f"{row['bot']:16} games {row['games']:5d} reward {row['mean_reward']:8.0f} "
+              f"mining {row['mining_efficiency']:6.2f}/turn idle {row['idle_fraction']:5.1%} "
+              f"deposit latency {row['mean_deposit_latency']:5.1f} lost {row['ships_lost_per_game']:5.1f} ships "
+              f"{row['cargo_lost_per_game']:7.0f} halite spawns/shipyard turn {row['spawns_per_shipyard_turn']:.3f}")
+
+
+if __name__ == '__main__':
+    main()
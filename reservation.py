@@ -0,0 +1,139 @@
+from typing import Hashable, Union
+
+import numpy as np
+
+from geometry import get_distance_matrix, get_neighbour_table
+
+# Reservation Table ####################################################################################################
+
+# Time-expanded reservation of squares: bit (t, pos) is set if a ship will be on square pos t turns from now. The bits
+# are packed into bytes and the turn offsets are stored as a ring buffer, so advancing the game by one step only clears
+# one row instead of shifting the whole table.
+
+
+class ReservationTable:
+    def __init__(self, size: int, horizon: int = 8):
+        self.size = size
+        self.horizon = horizon
+        self.bits = np.zeros((horizon, (size ** 2 + 7) // 8), dtype=np.uint8)
+        # Row of the current turn in the ring buffer
+        self.start = 0
+        # Reserved paths per ship: ship_id -> (turn offset of the first position, positions)
+        self.paths = {}
+
+    def _index(self, offsets: np.ndarray, positions: np.ndarray):
+        rows = (self.start + offsets) % self.horizon
+        return (rows, positions >> 3), (1 << (positions & 7)).astype(np.uint8)
+
+    def _check_offsets(self, offsets: np.ndarray) -> None:
+        if offsets.size > 0 and (offsets.min() < 0 or offsets.max() >= self.horizon):
+            raise ValueError(f'Turn offsets have to be within [0, {self.horizon}).')
+
+    def reserve(self, offsets: np.ndarray, positions: np.ndarray) -> None:
+        offsets = np.asarray(offsets, dtype=int)
+        positions = np.asarray(positions, dtype=int)
+        self._check_offsets(offsets)
+        index, masks = self._index(offsets, positions)
+        np.bitwise_or.at(self.bits, index, masks)
+
+    def release(self, offsets: np.ndarray, positions: np.ndarray) -> None:
+        offsets = np.asarray(offsets, dtype=int)
+        positions = np.asarray(positions, dtype=int)
+        self._check_offsets(offsets)
+        index, masks = self._index(offsets, positions)
+        np.bitwise_and.at(self.bits, index, ~masks)
+
+    def is_reserved(self, offsets: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        offsets = np.asarray(offsets, dtype=int)
+        positions = np.asarray(positions, dtype=int)
+        self._check_offsets(offsets)
+        index, masks = self._index(offsets, positions)
+        return (self.bits[index] & masks) != 0
+
+    def reserved_squares(self, offset: int) -> np.ndarray:
+        # (size, size) board of the squares reserved in the given turn offset
+        row = np.unpackbits(self.bits[(self.start + offset) % self.horizon], count=self.size ** 2, bitorder='little')
+        return row.astype(bool).reshape(self.size, self.size)
+
+    def reserve_path(self, ship_id: Hashable, positions: np.ndarray, first_offset: int = 0) -> None:
+        # Reserves positions[i] in turn offset first_offset + i for the ship, replacing its previous path
+        self.release_path(ship_id)
+        positions = np.asarray(positions, dtype=int)[:max(self.horizon - first_offset, 0)]
+        self.reserve(first_offset + np.arange(positions.size), positions)
+        self.paths[ship_id] = (first_offset, positions)
+
+    def release_path(self, ship_id: Hashable) -> None:
+        first_offset, positions = self.paths.pop(ship_id, (0, np.empty(0, dtype=int)))
+        self.release(first_offset + np.arange(positions.size), positions)
+
+    def path_conflicts(self, positions: np.ndarray, first_offset: int = 0) -> np.ndarray:
+        # Which steps of a path collide with existing reservations (steps beyond the horizon are never in conflict)
+        positions = np.asarray(positions, dtype=int)
+        steps = min(positions.size, max(self.horizon - first_offset, 0))
+        conflicts = np.zeros(positions.size, dtype=bool)
+        conflicts[:steps] = self.is_reserved(first_offset + np.arange(steps), positions[:steps])
+        return conflicts
+
+    def advance(self, steps: int = 1) -> None:
+        # Moves the table forward in time, reservations of past turns are dropped
+        for _ in range(min(steps, self.horizon)):
+            self.bits[self.start] = 0
+            self.start = (self.start + 1) % self.horizon
+        for ship_id, (first_offset, positions) in list(self.paths.items()):
+            passed = max(steps - first_offset, 0)
+            if passed >= positions.size:
+                del self.paths[ship_id]
+            else:
+                self.paths[ship_id] = (max(first_offset - steps, 0), positions[passed:])
+
+    def clear(self) -> None:
+        self.bits[:] = 0
+        self.paths = {}
+
+
+def get_reservation_table(reservation_table: Union[ReservationTable, None], size: int,
+                          horizon: int = 8) -> ReservationTable:
+    # Reuses the given reservation table if it matches the board size, otherwise starts with an empty one
+    if reservation_table is None or reservation_table.size != size or reservation_table.horizon != horizon:
+        reservation_table = ReservationTable(size, horizon)
+    return reservation_table
+
+
+# Space-Time Path ######################################################################################################
+
+def plan_path(reservation_table: ReservationTable, start_position: int, target_position: int,
+              length: Union[int, None] = None) -> np.ndarray:
+    # Shortest collision-free path towards the target in the time-expanded board. Position i of the returned path is
+    # the square in turn offset i + 1. All squares reachable in t moves are expanded at once with the neighbour
+    # table, the path then leads to the reachable square closest to the target (earliest arrival on ties).
+    size = reservation_table.size
+    length = reservation_table.horizon - 1 if length is None else min(length, reservation_table.horizon - 1)
+    neighbour_table = get_neighbour_table(size)
+    distance_to_target = get_distance_matrix(size)[target_position]
+
+    reachable = np.zeros((length + 1, size ** 2), dtype=bool)
+    reachable[0, start_position] = True
+    for t in range(1, length + 1):
+        free = ~reservation_table.reserved_squares(t).reshape(-1)
+        reachable[t] = reachable[t - 1][neighbour_table].any(axis=1) & free
+        if reachable[t, target_position] or not reachable[t].any():
+            length = t if reachable[t].any() else t - 1
+            break
+
+    # Closest square to the target over all turn offsets
+    best_t, best_position = 0, start_position
+    best_distance = distance_to_target[start_position]
+    for t in range(1, length + 1):
+        candidates = np.flatnonzero(reachable[t])
+        if candidates.size > 0:
+            candidate = candidates[np.argmin(distance_to_target[candidates])]
+            if distance_to_target[candidate] < best_distance:
+                best_t, best_position, best_distance = t, candidate, distance_to_target[candidate]
+
+    path = np.empty(best_t, dtype=int)
+    position = best_position
+    for t in range(best_t, 0, -1):
+        path[t - 1] = position
+        previous = neighbour_table[position]
+        position = previous[np.argmax(reachable[t - 1][previous])]
+    return path
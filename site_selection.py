@@ -0,0 +1,42 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from geometry import get_kernel_spectrum
+
+# Site Selection #######################################################################################################
+
+# Scores every square of the board by the weighted halite around it and greedily picks the best sites, each one at
+# least min_distance away from the excluded positions and the sites picked before. Scoring is a single FFT convolution
+# with a cached kernel, so the sites can be picked again whenever the halite has changed.
+
+# Weight of the halite at torus distance 0, 1, 2, ... from a site
+default_site_weights = (0, 1, 0.5)
+# Scores within this relative tolerance of the best score are ties (the FFT has floating point noise)
+tie_tolerance = 1e-9
+
+
+def site_scores(board_halite: np.ndarray, weights: Tuple[float, ...] = default_site_weights) -> np.ndarray:
+    # Weighted halite around every square, as a flat array over positions
+    size = board_halite.shape[0]
+    scores = np.fft.irfft2(np.fft.rfft2(board_halite) * get_kernel_spectrum(size, tuple(weights)), s=(size, size))
+    return scores.ravel()
+
+
+def select_sites(scores: np.ndarray, k: int, min_distance: int, excluded_positions: Sequence[int],
+                 tie_break_position: int, distance_matrix: np.ndarray) -> List[int]:
+    # Up to k positions with the best scores, ties go to the position closest to tie_break_position (the first one if
+    # several are equally close). Fewer sites are returned if the exclusion zones cover the whole board.
+    excluded_positions = np.asarray(excluded_positions, dtype=int)
+    available = ~np.any(distance_matrix[excluded_positions] < min_distance, axis=0)
+
+    sites = []
+    for _ in range(k):
+        if not available.any():
+            break
+        best_score = scores[available].max()
+        candidates = np.flatnonzero(available & (scores >= best_score - tie_tolerance * max(abs(best_score), 1)))
+        site = candidates[np.argmin(distance_matrix[tie_break_position, candidates])].item()
+        sites.append(site)
+        available &= distance_matrix[site] >= min_distance
+    return sites
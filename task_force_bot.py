@@ -1,235 +1,439 @@
 from kaggle_environments.envs.halite.helpers import *
 import numpy as np
 
-# Model and Global Parameters ##########################################################################################
+from board_state import BoardChanges, get_board_state
+from geometry import directions, get_distance_matrix, get_neighbour_table
+from observation import empty
+from profiling import profiled_agent, profiler
+from reservation import get_reservation_table, plan_path
+from site_selection import select_sites, site_scores
+from task_scheduler import Task, TaskScheduler
 
-size_ = 21
+# Model and Global Parameters ##########################################################################################
 
+# Defaults of the TaskForceBot instances
 max_ships = 35
 num_max_ships_per_shipyard = 10
 
 shipyards_min_distance = 4
-starting_position = np.nan
-shipyard_pos_1 = np.nan
-shipyard_pos_2 = np.nan
+# Planned shipyard positions, picked again every shipyard_sites_interval steps as the halite is mined
+num_shipyard_sites = 2
+shipyard_sites_interval = 25
+# Weight of the halite at distance 0, 1, 2, ... from a shipyard site
+shipyard_site_weights = (0, 1, 0.5)
+
+# Tasks: gathering ships return at this cargo, squares with less halite are depleted, empty ships hunt enemy ships
+# and guard threatened shipyards this close by
+return_halite_threshold = 300
+min_gather_halite = 40
+attack_radius = 2
+protect_radius = 2
+# No more ships are spawned in the last steps of the game
+spawn_stop_steps = 60
+reservation_horizon = 8
 
 directions_dict = {'NORTH': [-1, 0], 'EAST': [0, 1], 'SOUTH': [1, 0], 'WEST': [0, -1], 'None': [0, 0]}
 
 
-# Board ################################################################################################################
-
-# WARNING: The numpy boards use by default the x-axis going down and the y-axis going right, which is unexpected
-#          for a game board. Accessing a single element therefore needs to be done by, e.g. board_halite[1, 2],
-#          which means the y=1 and x=2 square.
-
-def board_halite_(obs: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
-    board_halite = np.array(obs['halite']).reshape(config['size'], -1)
-    return board_halite
-
-
-def board_ships_(obs: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
-    board_ships = np.empty((config['size'], config['size']))
-    board_ships[:] = np.nan
-
-    for player in range(len(obs['players'])):
-        ships_dict = obs['players'][player][2]
-        for ship in ships_dict:
-            x_pos = ships_dict[ship][0] % config['size']
-            y_pos = ships_dict[ship][0] // config['size']
-            board_ships[y_pos, x_pos] = player
-
-    return board_ships
-
-
-def board_shipyards_(obs: Dict[str, Any], config: Dict[str, Any]) -> np.ndarray:
-    board_shipyards = np.empty((config['size'], config['size']))
-    board_shipyards[:] = np.nan
-
-    for player in range(len(obs['players'])):
-        shipyards_dict = obs['players'][player][1]
-        for shipyard in shipyards_dict:
-            x_pos = shipyards_dict[shipyard] % config['size']
-            y_pos = shipyards_dict[shipyard] // config['size']
-            board_shipyards[y_pos, x_pos] = player
-
-    return board_shipyards
-
-
-# Distance #############################################################################################################
-
-def get_coordinates(pos: Union[int, np.ndarray], size: int) -> np.ndarray:
-    # Coordinates are given by [y, x]
-    if type(pos) == int:
-        return np.array([pos // size, pos % size])
-    else:
-        return np.transpose(np.array([pos // size, pos % size]))
-
-
-def get_position(coordinates: np.ndarray, size: int) -> np.ndarray:
-    # Coordinates are given by [y, x]
-    if len(coordinates.shape) == 1:
-        coordinates = coordinates[np.newaxis, :]
-    return coordinates[:, 0] * size + coordinates[:, 1]
-
-
-def distance_1d(val_1: Union[int, np.ndarray], val_2: Union[int, np.ndarray], size: int) -> Union[int, np.ndarray]:
-    min_val = np.fmin(val_1, val_2)
-    max_val = np.fmax(val_1, val_2)
-    return np.fmin(max_val - min_val, min_val + size - max_val)
-
-
-# This function only has to be used once to create the look-up table in the beginning
-def create_distance_matrix(size: int) -> np.ndarray:
-    # Maximal position is size**2 - 1
-    position_range = np.arange(size ** 2)
-    positions_1 = np.repeat(position_range, size ** 2)
-    positions_2 = np.tile(position_range, size ** 2)
-
-    # positions_1 and positions_2 combined contain all possible combinations of positions
-    x_distances = distance_1d(positions_1 % size, positions_2 % size, size)
-    y_distances = distance_1d(positions_1 // size, positions_2 // size, size)
-
-    distance_matrix_ = (x_distances + y_distances).reshape(size ** 2, -1)
-
-    return distance_matrix_
-
-
-distance_matrix = create_distance_matrix(size_)
-
-
-def get_squares_within_radius(position: int, radius: int) -> np.ndarray:
-    global distance_matrix
-    return np.where(distance_matrix[position] < radius)[0]
-
-
-# Shipyard Placement ###################################################################################################
-
-def compare_shipyard_positions(points_of_interest: np.ndarray) -> int:
-    global distance_matrix
-    global starting_position
-
-    best_position = np.nan
-    min_distance_to_start_pos = np.inf
-    for point in points_of_interest:
-        if distance_matrix[starting_position, point] < min_distance_to_start_pos:
-            min_distance_to_start_pos = distance_matrix[starting_position, point]
-            best_position = point
-
-    return best_position
-
-
-def determine_shipyard_positions(board_halite: np.ndarray, size: int) -> None:
-    global shipyard_pos_1
-    global shipyard_pos_2
-    global shipyards_min_distance
-    global starting_position
-
-    board_of_interest = (board_halite != 0)
-    board_of_interest = board_of_interest.astype(int)
-
-    board_points_of_interest = (
-                np.roll(board_of_interest, shift=1, axis=0) + np.roll(board_of_interest, shift=-1, axis=0)
-                + np.roll(board_of_interest, shift=1, axis=1) + np.roll(board_of_interest, shift=-1, axis=1)
-                + 0.5 * (np.roll(board_of_interest, shift=2, axis=0) + np.roll(board_of_interest, shift=-2, axis=0)
-                         + np.roll(board_of_interest, shift=2, axis=1) + np.roll(board_of_interest, shift=-2, axis=1)
-                         + np.roll(np.roll(board_of_interest, shift=1, axis=0), shift=1, axis=1)
-                         + np.roll(np.roll(board_of_interest, shift=1, axis=0), shift=-1, axis=1)
-                         + np.roll(np.roll(board_of_interest, shift=-1, axis=0), shift=1, axis=1)
-                         + np.roll(np.roll(board_of_interest, shift=-1, axis=0), shift=-1, axis=1)))
-
-    squares_close_to_start = get_squares_within_radius(starting_position, shipyards_min_distance)
-    for coordinates in get_coordinates(squares_close_to_start, size):
-        board_points_of_interest[coordinates[0], coordinates[1]] = 0
-
-    points_of_interest_1 = get_position(np.column_stack(
-                                            np.where(board_points_of_interest == np.max(board_points_of_interest))),
-                                        size)
-    shipyard_pos_1 = compare_shipyard_positions(points_of_interest_1)
-
-    squares_close_to_pos_1 = get_squares_within_radius(shipyard_pos_1, shipyards_min_distance)
-    for coordinates in get_coordinates(squares_close_to_pos_1, size):
-        board_points_of_interest[coordinates[0], coordinates[1]] = 0
-
-    points_of_interest_2 = get_position(np.column_stack(
-                                            np.where(board_points_of_interest == np.max(board_points_of_interest))),
-                                        size)
-    shipyard_pos_2 = compare_shipyard_positions(points_of_interest_2)
-
-    return None
-
-
-# Pathfinder ###########################################################################################################
-
-def pathfinder():
-    pass
-
-
-# Find Task ########################################################################################################
-
-def find_task():
-    pass
-
-
-# Task - Gather Halite #############################################################################################
-
-def task_gather_halite():
-    pass
-
-
-# Task - Attack Enemy ##############################################################################################
-
-def task_attack_enemy():
-    pass
-
-
-# Task - Build Shipyard ############################################################################################
-
-def task_build_shipyard():
-    pass
-
-
-# Task - Return Halite #############################################################################################
-
-def task_return_halite(ship_position: int, shipyards_dict: Dict[str, int]) -> str:
-    pass
-
-
-# Task - Protect Shipyard ###########################################################################################
-
-def task_protect_shipyard():
-    pass
-
-
-# Task - Shipyard Action ###########################################################################################
-
-def task_shipyard_action():
-    pass
-
-
 # Agent ################################################################################################################
 
+class TaskForceBot:
+    # Every instance keeps its own tasks, paths and boards, so several bots can play in the same process. The geometry
+    # tables are shared, read-only, between all instances.
+    def __init__(self, max_ships: int = max_ships, num_max_ships_per_shipyard: int = num_max_ships_per_shipyard,
+                 shipyards_min_distance: int = shipyards_min_distance, num_shipyard_sites: int = num_shipyard_sites,
+                 shipyard_sites_interval: int = shipyard_sites_interval,
+                 shipyard_site_weights: Tuple[float, ...] = shipyard_site_weights,
+                 return_halite_threshold: float = return_halite_threshold,
+                 min_gather_halite: float = min_gather_halite, attack_radius: int = attack_radius,
+                 protect_radius: int = protect_radius, spawn_stop_steps: int = spawn_stop_steps,
+                 reservation_horizon: int = reservation_horizon):
+        self.max_ships = max_ships
+        self.num_max_ships_per_shipyard = num_max_ships_per_shipyard
+        self.shipyards_min_distance = shipyards_min_distance
+        self.num_shipyard_sites = num_shipyard_sites
+        self.shipyard_sites_interval = shipyard_sites_interval
+        self.shipyard_site_weights = tuple(shipyard_site_weights)
+        self.return_halite_threshold = return_halite_threshold
+        self.min_gather_halite = min_gather_halite
+        self.attack_radius = attack_radius
+        self.protect_radius = protect_radius
+        self.spawn_stop_steps = spawn_stop_steps
+        self.reservation_horizon = reservation_horizon
+
+        self.starting_position = np.nan
+        self.shipyard_sites = []
+        # Boards of the previous turn, only the changes are applied each turn
+        self.board_state = None
+        # Tasks of the ships and their reserved paths, kept across turns
+        self.scheduler = None
+        self.reservation_table = None
+        self.path_targets = {}
+
+        # Per-turn state shared by the task methods, set by __call__
+        self.config = None
+        self.player_id = None
+        # Look-up tables of the board size of the current game, from the geometry cache
+        self.distance_matrix = None
+        self.neighbour_table = None
+        self.board_ships = None
+        self.board_ship_ids = {}
+        self.ship_positions = np.empty(0, dtype=int)
+        self.shipyard_positions = np.empty(0, dtype=int)
+        self.dropoff_distance = None
+        self.enemy_cargo_nearby = None
+        self.threatened_shipyards = []
+
+    def get_squares_within_radius(self, position: int, radius: int) -> np.ndarray:
+        return np.where(self.distance_matrix[position] < radius)[0]
+
+    # Shipyard Placement ###############################################################################################
+
+    def determine_shipyard_positions(self, board_halite: np.ndarray, size: int,
+                                     shipyard_positions: Union[List[int], None] = None) -> List[int]:
+        # Sites with the most halite around them, away from the starting position and the existing shipyards. Ties go
+        # to the site closest to the starting position.
+        excluded_positions = [self.starting_position] + list(shipyard_positions or [])
+        scores = site_scores(board_halite, self.shipyard_site_weights)
+        self.shipyard_sites = select_sites(scores, self.num_shipyard_sites, self.shipyards_min_distance,
+                                           excluded_positions, self.starting_position, self.distance_matrix)
+        return self.shipyard_sites
+
+    # Pathfinder #######################################################################################################
+
+    def pathfinder(self, ship_id: str, position: int, target: int, path: Union[np.ndarray, None]) -> Union[int, None]:
+        # Next square of the ship towards the target. The previous path of the ship (released from the reservation
+        # table) is followed while it leads to the same target and no other ship has reserved a square of it since,
+        # otherwise a new collision-free path is planned in the reservation table. None if the path is blocked.
+        if (path is not None and path.size > 1 and path[0] == position and self.path_targets.get(ship_id) == target
+                and not self.reservation_table.path_conflicts(path[1:], 1).any()):
+            self.reservation_table.reserve_path(ship_id, path)
+            return path[1].item()
+
+        path = plan_path(self.reservation_table, position, target)
+        self.reservation_table.reserve_path(ship_id, np.r_[position, path])
+        self.path_targets[ship_id] = target
+        return path[0].item() if path.size > 0 else None
+
+    def safe_move(self, ship_id: str, position: int, cargo: float, target: int, next_position: Union[int, None]) -> int:
+        # The planned square if no enemy ship with less (or equal) cargo can reach it, otherwise the best free and safe
+        # alternative next to the ship, which replaces the path of the ship by the single move
+        if next_position is not None and self.enemy_cargo_nearby[next_position] > cargo:
+            return next_position
+
+        self.reservation_table.release_path(ship_id)
+        self.path_targets.pop(ship_id, None)
+        candidates = np.array(self.neighbour_table[position], dtype=int)
+        free = ~self.reservation_table.is_reserved(np.ones(candidates.size, dtype=int), candidates)
+        safe = free & (self.enemy_cargo_nearby[candidates] > cargo)
+        options = candidates[safe] if safe.any() else candidates[free] if free.any() else candidates
+        next_position = options[np.argmin(self.distance_matrix[target, options])].item()
+        self.reservation_table.reserve_path(ship_id, np.array([position, next_position]))
+        return next_position
+
+    # Find Task ########################################################################################################
+
+    def find_task(self, ship_id: str, position: int, cargo: float, player_halite: float, steps_left: int) -> Task:
+        # Full task search for a ship that has no valid task, in the order of importance
+        if len(self.shipyard_positions) == 0:
+            return self.task_replace_shipyard(position)
+        if cargo >= self.return_halite_threshold or (cargo > 0 and steps_left <= self.dropoff_distance[position] + 2):
+            return self.task_return_halite(position)
+        for task_function in (self.task_protect_shipyard, self.task_attack_enemy):
+            task = task_function(position, cargo)
+            if task is not None:
+                return task
+        task = self.task_build_shipyard(position, player_halite, steps_left)
+        if task is not None:
+            return task
+        task = self.task_gather_halite(position)
+        if task is not None:
+            return task
+        return self.task_return_halite(position) if cargo > 0 else Task('gather_halite', position)
+
+    # Task - Gather Halite #############################################################################################
+
+    def task_gather_halite(self, position: int) -> Union[Task, None]:
+        # Square with the most halite per turn of the way there and back to the nearest shipyard, squares claimed by
+        # other ships are left to them
+        board_halite = self.board_state.board_halite.reshape(-1)
+        scores = board_halite / (self.distance_matrix[position] + self.dropoff_distance + 1)
+        excluded = (board_halite < self.min_gather_halite) | (self.board_state.board_shipyards.reshape(-1) != empty)
+        excluded[self.scheduler.targets('gather_halite')] = True
+        scores[excluded] = -np.inf
+        target = np.argmax(scores).item()
+        return Task('gather_halite', target) if np.isfinite(scores[target]) else None
+
+    # Task - Attack Enemy ##############################################################################################
+
+    def task_attack_enemy(self, position: int, cargo: float) -> Union[Task, None]:
+        # Empty ships hunt the enemy ship with the most cargo close by, which nobody else hunts yet
+        if cargo > 0:
+            return None
+        best_id, best_cargo = None, 0
+        for enemy_id, (owner, enemy_position, enemy_cargo) in self.board_state.ships.items():
+            if (owner != self.player_id and enemy_cargo > best_cargo
+                    and self.distance_matrix[position, enemy_position] <= self.attack_radius
+                    and not self.scheduler.ships_targeting(enemy_id)):
+                best_id, best_cargo = enemy_id, enemy_cargo
+        if best_id is None:
+            return None
+        return Task('attack_enemy', self.board_state.ships[best_id][1], best_id)
+
+    # Task - Build Shipyard ############################################################################################
+
+    def task_build_shipyard(self, position: int, player_halite: float, steps_left: int) -> Union[Task, None]:
+        # One ship at a time builds the next planned shipyard, once the fleet is large enough for another shipyard
+        if (self.scheduler.targets('build_shipyard') or player_halite < self.config['convertCost'] or steps_left < 100
+                or len(self.ship_positions) < self.num_max_ships_per_shipyard * len(self.shipyard_positions)):
+            return None
+        sites = [site for site in self.shipyard_sites if self.board_state.board_shipyards.reshape(-1)[site] == empty]
+        if not sites:
+            return None
+        return Task('build_shipyard', min(sites, key=lambda site: self.distance_matrix[position, site]))
+
+    def replacement_site(self) -> int:
+        # Site of a new shipyard for a fleet without one: the best free planned site, the starting position or else the
+        # square of the first ship
+        board_shipyards = self.board_state.board_shipyards.reshape(-1)
+        for site in self.shipyard_sites + [self.starting_position]:
+            if board_shipyards[site] == empty:
+                return site
+        return self.ship_positions[0].item()
+
+    def replacement_builder(self) -> int:
+        # Position of the ship closest to the replacement site, the only ship that builds it
+        site = self.replacement_site()
+        return self.ship_positions[np.argmin(self.distance_matrix[self.ship_positions, site])].item()
+
+    def task_replace_shipyard(self, position: int) -> Task:
+        # Without a shipyard a single ship builds a new one (converting several ships would waste convertCost on each),
+        # the others gather until it is there
+        if position == self.replacement_builder() and not self.scheduler.targets('build_shipyard'):
+            return Task('build_shipyard', self.replacement_site())
+        task = self.task_gather_halite(position)
+        return task if task is not None else Task('gather_halite', position)
+
+    # Task - Return Halite #############################################################################################
+
+    def task_return_halite(self, position: int) -> Task:
+        shipyard_positions = self.shipyard_positions
+        nearest = np.argmin(self.distance_matrix[position, shipyard_positions])
+        return Task('return_halite', shipyard_positions[nearest].item())
+
+    # Task - Protect Shipyard ##########################################################################################
+
+    def task_protect_shipyard(self, position: int, cargo: float) -> Union[Task, None]:
+        # Empty ships close to a threatened shipyard without a guard go and sit on it
+        if cargo > 0:
+            return None
+        for shipyard_position in self.threatened_shipyards:
+            if (self.distance_matrix[position, shipyard_position] <= self.protect_radius
+                    and not self.scheduler.ships_targeting(shipyard_position, 'protect_shipyard')):
+                return Task('protect_shipyard', shipyard_position)
+        return None
+
+    # Task - Shipyard Action ###########################################################################################
+
+    def task_shipyard_action(self, shipyards: Dict[str, int], player_halite: float, steps_left: int) -> Dict[str, str]:
+        # Spawns on free shipyards while the fleet is below its limit
+        actions = {}
+        ship_limit = min(self.max_ships, self.num_max_ships_per_shipyard * len(shipyards))
+        ships_count = len(self.ship_positions)
+        for shipyard_id, position in shipyards.items():
+            if (ships_count >= ship_limit or player_halite < self.config['spawnCost']
+                    or steps_left < self.spawn_stop_steps
+                    or self.reservation_table.is_reserved(np.array([1]), np.array([position]))[0]):
+                continue
+            actions[shipyard_id] = 'SPAWN'
+            self.reservation_table.reserve(np.array([1]), np.array([position]))
+            player_halite -= self.config['spawnCost']
+            ships_count += 1
+        return actions
+
+    # Scheduling #######################################################################################################
+
+    def update_tasks(self, changes: BoardChanges, ships: Dict[str, List[int]], steps_left: int) -> None:
+        # Invalidates the tasks affected by the changes of the board and runs the cheap checks of the current tasks
+        for ship_id, owner, _, _ in changes.ships_destroyed:
+            if owner == self.player_id:
+                self.scheduler.remove(ship_id)
+                self.reservation_table.release_path(ship_id)
+                self.path_targets.pop(ship_id, None)
+            else:
+                self.scheduler.invalidate_target(ship_id)
+        for ship_id, owner, _, position in changes.ships_spawned + changes.ships_moved:
+            if owner == self.player_id:
+                if ship_id not in self.scheduler.tasks:
+                    self.scheduler.invalidate(ship_id)
+                continue
+            # Threats: our ships with more cargo next to the enemy ship and targets next to it
+            enemy_cargo = self.board_state.ships[ship_id][2]
+            for square in self.neighbour_table[position].tolist():
+                if self.board_ships[square] == self.player_id:
+                    our_ship = self.board_ship_ids.get(square)
+                    if our_ship is not None and ships[our_ship][1] >= enemy_cargo:
+                        self.scheduler.invalidate(our_ship, ships[our_ship][1])
+                self.scheduler.invalidate_target(square, 'gather_halite')
+        for _, owner, position in changes.shipyards_lost:
+            if owner == self.player_id:
+                self.scheduler.invalidate_target(position)
+        if any(owner == self.player_id for _, owner, _ in changes.shipyards_created):
+            # A closer shipyard for the ships on their way back
+            for ship_id, task in self.scheduler.tasks.items():
+                if task.kind == 'return_halite':
+                    self.scheduler.invalidate(ship_id, ships[ship_id][1])
+
+        # Depleted targets
+        gather_targets = np.array(self.scheduler.targets('gather_halite'), dtype=int)
+        depleted = self.board_state.board_halite.reshape(-1)[gather_targets] < self.min_gather_halite
+        for target in gather_targets[depleted].tolist():
+            self.scheduler.invalidate_target(target, 'gather_halite')
+
+        # Cheap checks of every task
+        for ship_id, task in list(self.scheduler.tasks.items()):
+            position, cargo = ships[ship_id]
+            if task.kind == 'gather_halite' and cargo >= self.return_halite_threshold:
+                self.scheduler.invalidate(ship_id, cargo)
+            elif task.kind != 'return_halite' and cargo > 0 and steps_left <= self.dropoff_distance[position] + 2:
+                self.scheduler.invalidate(ship_id, cargo)
+            elif task.kind == 'return_halite' and (cargo == 0 or task.target not in self.shipyard_positions):
+                self.scheduler.invalidate(ship_id, cargo)
+            elif task.kind == 'attack_enemy':
+                enemy = self.board_state.ships.get(task.target_id)
+                if (enemy is None or enemy[2] <= cargo
+                        or self.distance_matrix[position, enemy[1]] > self.attack_radius + 1):
+                    self.scheduler.invalidate(ship_id, cargo)
+                elif enemy[1] != task.target:
+                    self.scheduler.assign(ship_id, task._replace(target=enemy[1]))
+            elif task.kind == 'protect_shipyard' and task.target not in self.threatened_shipyards:
+                self.scheduler.invalidate(ship_id, cargo)
+            elif (task.kind == 'build_shipyard'
+                  and self.board_state.board_shipyards.reshape(-1)[task.target] != empty):
+                self.scheduler.invalidate(ship_id, cargo)
+
+        # A fleet without a shipyard needs a builder, it is kept until the shipyard is there
+        if self.shipyard_positions.size == 0 and self.ship_positions.size > 0 and not self.scheduler.targets(
+                'build_shipyard'):
+            self.scheduler.invalidate(self.board_ship_ids[self.replacement_builder()])
+
+    def plan_tasks(self, ships: Dict[str, List[int]], player_halite: float, steps_left: int) -> int:
+        # Full task search for the invalidated ships only, returns how many ships have been planned
+        planned = 0
+        for ship_id in self.scheduler.invalidated():
+            if ship_id not in ships:
+                continue
+            position, cargo = ships[ship_id]
+            self.scheduler.unassign(ship_id)
+            self.scheduler.assign(ship_id, self.find_task(ship_id, position, cargo, player_halite, steps_left))
+            planned += 1
+        return planned
+
+    def ship_actions(self, ships: Dict[str, List[int]], player_halite: float) -> Dict[str, str]:
+        actions = {}
+        # All paths are taken out of the reservation table, as a released square is free for everyone. Ships staying
+        # on their square are reserved first, then the others reserve their previous paths again or plan new ones
+        # around them.
+        previous_paths = {}
+        for ship_id, (first_offset, path) in list(self.reservation_table.paths.items()):
+            if first_offset == 0:
+                previous_paths[ship_id] = path
+            self.reservation_table.release_path(ship_id)
+        moving = []
+        for ship_id, (position, cargo) in ships.items():
+            task = self.scheduler.tasks[ship_id]
+            if (position != task.target
+                    or (task.kind != 'protect_shipyard' and self.enemy_cargo_nearby[position] <= cargo)):
+                # Ships on their target move away from threats, except for the guards of shipyards
+                moving.append(ship_id)
+            elif (task.kind == 'build_shipyard' and self.board_state.board_shipyards.reshape(-1)[position] == empty
+                  and player_halite + cargo >= self.config['convertCost']):
+                actions[ship_id] = 'CONVERT'
+                player_halite -= max(self.config['convertCost'] - cargo, 0)
+                self.reservation_table.release_path(ship_id)
+            else:
+                self.reservation_table.reserve_path(ship_id, np.array([position, position]))
+
+        for ship_id in moving:
+            position, cargo = ships[ship_id]
+            task = self.scheduler.tasks[ship_id]
+            next_position = self.safe_move(ship_id, position, cargo, task.target,
+                                           self.pathfinder(ship_id, position, task.target, previous_paths.get(ship_id)))
+            if next_position != position:
+                actions[ship_id] = directions[self.neighbour_table[position].tolist().index(next_position)]
+        return actions
+
+    # Turn #############################################################################################################
+
+    def __call__(self, obs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, str]:
+        self.config = config
+        player_id = self.player_id = obs['player']
+        size = config['size']
+        player_halite, shipyards, ships = obs['players'][player_id]
+        steps_left = config['episodeSteps'] - 1 - obs['step']
+
+        with profiler.phase('distance'):
+            distance_matrix = self.distance_matrix = get_distance_matrix(size)
+            neighbour_table = self.neighbour_table = get_neighbour_table(size)
+        with profiler.phase('boards'):
+            if obs['step'] == 0:
+                self.board_state = None
+                self.scheduler = TaskScheduler()
+                self.reservation_table = None
+                self.path_targets = {}
+            board_state = self.board_state = get_board_state(self.board_state, size)
+            changes = board_state.update(obs)
+            self.reservation_table = get_reservation_table(self.reservation_table, size, self.reservation_horizon)
+            if obs['step'] > 0:
+                self.reservation_table.advance()
+
+            observation = board_state.observation
+            own_ships = observation.ships[observation.player_ships(player_id)]
+            self.board_ships = board_state.board_ships.reshape(-1)
+            self.board_ship_ids = dict(zip(own_ships['position'].tolist(), ships))
+            self.ship_positions = own_ships['position'].astype(int)
+            shipyard_positions = self.shipyard_positions = (
+                observation.shipyards['position'][observation.player_shipyards(player_id)].astype(int))
+            self.dropoff_distance = (distance_matrix[shipyard_positions].min(axis=0) if shipyard_positions.size > 0
+                                     else np.full(size ** 2, size))
+            # Least cargo of the enemy ships on or next to every square, squares with enemies carrying at most as much
+            # as a ship are not safe for it
+            enemy_cargo_nearby = self.enemy_cargo_nearby = np.full(size ** 2, np.inf)
+            enemy_ships = observation.ships[observation.ships['owner'] != player_id]
+            np.minimum.at(enemy_cargo_nearby, neighbour_table[enemy_ships['position']],
+                          enemy_ships['cargo'][:, np.newaxis])
+            self.threatened_shipyards = [
+                position for position in shipyard_positions.tolist()
+                if np.isfinite(enemy_cargo_nearby[distance_matrix[position] <= self.protect_radius]).any()]
+
+        if obs['step'] == 0:
+            # The first ship converts right away, the next shipyards are planned around it
+            for ship_id, (position, _) in ships.items():
+                self.starting_position = position
+                with profiler.phase('shipyard_positions'):
+                    self.determine_shipyard_positions(board_state.board_halite, size)
+                return {ship_id: 'CONVERT'}
+        elif obs['step'] % self.shipyard_sites_interval == 0:
+            with profiler.phase('shipyard_positions'):
+                self.determine_shipyard_positions(board_state.board_halite, size, shipyard_positions.tolist())
+
+        with profiler.phase('tasks'):
+            self.update_tasks(changes, ships, steps_left)
+        with profiler.phase('planning'):
+            self.plan_tasks(ships, player_halite, steps_left)
+        with profiler.phase('moves'):
+            actions = self.ship_actions(ships, player_halite)
+        with profiler.phase('shipyards'):
+            actions.update(self.task_shipyard_action(shipyards, player_halite, steps_left))
+        return actions
+
+
+# Kaggle Agent #########################################################################################################
+
+# The bot of the agent file, kaggle_environments runs the last callable of the file
+bot = TaskForceBot()
+
+
+@profiled_agent('task_force_bot')
 def agent(obs: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, str]:
-    global max_ships
-    global num_max_ships_per_shipyard
-
-    global starting_position
-    global shipyard_pos_1
-    global shipyard_pos_2
-
-    global directions_dict
-
-    # print('-----------------------------------------------------------------------')
-    # print(obs['step'])
-    player_id = obs['player']
-    actions = {}
-
-    if obs['step'] == 1:
-        # Initialize global variables that depend on the board
-        ships_dict = obs['players'][player_id][2]
-        for ship in ships_dict:
-            starting_position = ships_dict[ship][0]
-
-        board_halite = board_halite_(obs, config)
-        determine_shipyard_positions(board_halite, config['size'])
-
-    return actions
+    return bot(obs, config)
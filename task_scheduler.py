@@ -0,0 +1,90 @@
+import heapq
+from typing import Dict, Hashable, Iterator, List, NamedTuple, Union
+
+# Task Scheduler #######################################################################################################
+
+# Keeps the task of every ship across turns. A ship is only planned again after its task has been invalidated, the
+# invalidated ships are kept in a priority queue and planned in the order of their priority (highest first), so that
+# e.g. ships with more cargo claim their targets first. Tasks are indexed by their target, an event on a square or a
+# unit (depleted halite, a threat, a lost shipyard, a destroyed enemy ship) invalidates the ships targeting it without
+# looking at the rest of the fleet.
+
+
+class Task(NamedTuple):
+    kind: str
+    # Position the ship is heading to
+    target: int
+    # Unit the task is about (e.g. the enemy ship to attack), the task is indexed by this id instead of the position
+    target_id: Union[str, None] = None
+
+    @property
+    def key(self) -> Hashable:
+        return self.target if self.target_id is None else self.target_id
+
+
+class TaskScheduler:
+    def __init__(self):
+        self.tasks: Dict[str, Task] = {}
+        # Ships of every target in the order of assignment (a dict instead of a set, as the iteration order of a set of
+        # strings changes with the hash seed of the process and with it the planning order)
+        self.ships_by_target: Dict[Hashable, Dict[str, None]] = {}
+        self._queue = []
+        self._queued = set()
+        self._pushed = 0
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def assign(self, ship_id: str, task: Task) -> None:
+        self.unassign(ship_id)
+        self.tasks[ship_id] = task
+        self.ships_by_target.setdefault(task.key, {})[ship_id] = None
+
+    def unassign(self, ship_id: str) -> None:
+        task = self.tasks.pop(ship_id, None)
+        if task is not None:
+            ships = self.ships_by_target[task.key]
+            ships.pop(ship_id, None)
+            if not ships:
+                del self.ships_by_target[task.key]
+
+    def remove(self, ship_id: str) -> None:
+        # The ship is gone, it is skipped when it comes out of the queue
+        self.unassign(ship_id)
+        self._queued.discard(ship_id)
+
+    def ships_targeting(self, key: Hashable, kind: Union[str, None] = None) -> List[str]:
+        return [ship_id for ship_id in self.ships_by_target.get(key, ())
+                if kind is None or self.tasks[ship_id].kind == kind]
+
+    def targets(self, kind: str) -> List[int]:
+        return [task.target for task in self.tasks.values() if task.kind == kind]
+
+    def invalidate(self, ship_id: str, priority: float = 0.0) -> None:
+        # The task of the ship is kept until the ship is planned again, so it is still known to the planning of others
+        if ship_id not in self._queued:
+            self._queued.add(ship_id)
+            # The counter keeps the order of insertion among equal priorities
+            heapq.heappush(self._queue, (-priority, self._pushed, ship_id))
+            self._pushed += 1
+
+    def invalidate_target(self, key: Hashable, kind: Union[str, None] = None, priority: float = 0.0) -> None:
+        for ship_id in self.ships_targeting(key, kind):
+            self.invalidate(ship_id, priority)
+
+    def is_invalidated(self, ship_id: str) -> bool:
+        return ship_id in self._queued
+
+    def invalidated(self) -> Iterator[str]:
+        # Pops the invalidated ships, highest priority first
+        while self._queue:
+            _, _, ship_id = heapq.heappop(self._queue)
+            if ship_id in self._queued:
+                self._queued.discard(ship_id)
+                yield ship_id
+
+    def clear(self) -> None:
+        self.tasks = {}
+        self.ships_by_target = {}
+        self._queue = []
+        self._queued = set()
@@ -0,0 +1,205 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+
+# Tournament ###########################################################################################################
+
+# Seeded 4-player self-play games of our bots on a process pool. The workers are started once and play many games, so
+# importing kaggle_environments, numpy and the bots is paid once per worker. Every finished game is appended to a JSONL
+# file right away, games already in that file are skipped when a tournament is resumed.
+#
+# Every seat plays with a new instance of its bot (halite_sim.create_agent), so two seats of the same bot do not share
+# their state. The bots are imported once per worker and share their read-only geometry tables. With --server the seats
+# are played by a running agent_server.py instead, the workers then only run the environment.
+#
+#     python tournament.py --games 200 --output tournament.jsonl
+
+bots = ['basic_bot', 'bot_swarm', 'task_force_bot']
+players = 4
+
+repository_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+# Seats ################################################################################################################
+
+def seat_assignment(game: int, agents: List[str]) -> List[str]:
+    # Rotates the agents through the seats, game by game every agent starts from every seat
+    return [agents[(game + seat) % len(agents)] for seat in range(players)]
+
+
+def game_seed(base_seed: int, game: int) -> int:
+    return base_seed + game
+
+
+# Worker ###############################################################################################################
+
+make = None
+create_agent = None
+
+
+def initialize_worker() -> None:
+    global make
+    global create_agent
+    # The bots import each other's shared modules from the repository directory
+    os.chdir(repository_directory)
+    import sys
+    if repository_directory not in sys.path:
+        sys.path.insert(0, repository_directory)
+    from kaggle_environments import make as make_environment
+    make = make_environment
+    from halite_sim import create_agent as create_bot
+    create_agent = create_bot
+    # The first environment is expensive to create, which should not be part of the first game
+    make('halite', configuration={'episodeSteps': 2})
+
+
+def server_agent(server: str, agent: str, game: int, seat: int) -> Callable:
+    from agent_server import ServerAgent, agent_url
+    # The path of a seat has to be unique among all games the server is playing
+    return ServerAgent(agent_url(server, agent, f'{os.getpid()}.{game}', seat))
+
+
+def play_game(task: Tuple[int, int, List[str], Dict[str, Any], Union[str, None]]) -> Dict[str, Any]:
+    game, seed, seats, configuration, server = task
+    # bot_swarm draws its patrol radii from the random module, the server seeds it from the randomSeed of the game
+    random.seed(seed)
+
+    start = time.perf_counter()
+    environment = make('halite', configuration=dict(configuration, randomSeed=seed))
+    if server is None:
+        environment.run([create_agent(agent) for agent in seats])
+    else:
+        environment.run([server_agent(server, agent, game, seat) for seat, agent in enumerate(seats)])
+    final_state = environment.steps[-1]
+    final_players = final_state[0]['observation']['players']
+
+    return {'game': game, 'seed': seed, 'seats': seats,
+            'rewards': [state['reward'] for state in final_state],
+            'statuses': [state['status'] for state in final_state],
+            'ships': [len(player[2]) for player in final_players],
+            'shipyards': [len(player[1]) for player in final_players],
+            'steps': len(environment.steps),
+            'duration': time.perf_counter() - start}
+
+
+# Aggregation ##########################################################################################################
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> Tuple[float, float]:
+    if trials == 0:
+        return 0.0, 1.0
+    rate = successes / trials
+    denominator = 1 + z ** 2 / trials
+    center = (rate + z ** 2 / (2 * trials)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return center - half_width, center + half_width
+
+
+def aggregate(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    # Every seat is one trial of its agent, a seat wins if it has the highest final halite of the game (ties count for
+    # all tied seats). Failed seats (ERROR, TIMEOUT, ...) have no reward and count as losses.
+    statistics = {}
+    for result in results:
+        rewards = [reward if reward is not None else -math.inf for reward in result['rewards']]
+        best_reward = max(rewards)
+        for seat, agent in enumerate(result['seats']):
+            agent_statistics = statistics.setdefault(agent, {'seats': 0, 'wins': 0, 'halite': [], 'ships': [],
+                                                             'errors': 0, 'timeouts': 0})
+            agent_statistics['seats'] += 1
+            agent_statistics['wins'] += rewards[seat] == best_reward
+            agent_statistics['ships'].append(result['ships'][seat])
+            if result['statuses'][seat] == 'ERROR':
+                agent_statistics['errors'] += 1
+            elif result['statuses'][seat] == 'TIMEOUT':
+                agent_statistics['timeouts'] += 1
+            else:
+                agent_statistics['halite'].append(rewards[seat])
+
+    summary = {}
+    for agent, agent_statistics in sorted(statistics.items()):
+        seats = agent_statistics['seats']
+        halite = agent_statistics['halite']
+        mean_halite = sum(halite) / len(halite) if halite else math.nan
+        if len(halite) > 1:
+            variance = sum((value - mean_halite) ** 2 for value in halite) / (len(halite) - 1)
+            halite_half_width = 1.96 * math.sqrt(variance / len(halite))
+        else:
+            halite_half_width = math.nan
+        summary[agent] = {'seats': seats, 'wins': agent_statistics['wins'],
+                          'win_rate': agent_statistics['wins'] / seats,
+                          'win_rate_ci': wilson_interval(agent_statistics['wins'], seats),
+                          'mean_halite': mean_halite,
+                          'mean_halite_ci': (mean_halite - halite_half_width, mean_halite + halite_half_width),
+                          'mean_ships': sum(agent_statistics['ships']) / seats,
+                          'errors': agent_statistics['errors'], 'timeouts': agent_statistics['timeouts']}
+    return summary
+
+
+def read_results(path: str) -> List[Dict[str, Any]]:
+    results = []
+    if os.path.exists(path):
+        with open(path) as results_file:
+            for line in results_file:
+                if line.strip():
+                    results.append(json.loads(line))
+    return results
+
+
+# Runner ###############################################################################################################
+
+def run_tournament(games: int, output: str, agents: List[str] = None, processes: int = None, base_seed: int = 0,
+                   configuration: Dict[str, Any] = None, server: Union[str, None] = None) -> Iterator[Dict[str, Any]]:
+    # Plays all games not yet in the output file and yields the results as they finish
+    agents = bots if agents is None else agents
+    configuration = {} if configuration is None else configuration
+    finished_games = {result['game'] for result in read_results(output)}
+    tasks = [(game, game_seed(base_seed, game), seat_assignment(game, agents), configuration, server)
+             for game in range(games) if game not in finished_games]
+    if not tasks:
+        return
+
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    with multiprocessing.Pool(processes, initializer=initialize_worker) as pool:
+        with open(output, 'a') as results_file:
+            for result in pool.imap_unordered(play_game, tasks):
+                results_file.write(json.dumps(result) + '\n')
+                results_file.flush()
+                yield result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Play seeded self-play games of the bots in parallel.')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--agents', nargs='+', default=bots, help='bots rotated through the four seats')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--size', type=int, default=21)
+    parser.add_argument('--steps', type=int, default=400, help='episode steps per game')
+    parser.add_argument('--output', default='tournament.jsonl')
+    parser.add_argument('--summary', default=None, help='write the aggregated statistics as JSON')
+    parser.add_argument('--server', default=None, help='URL of an agent_server.py playing the seats')
+    args = parser.parse_args()
+
+    configuration = {'size': args.size, 'episodeSteps': args.steps}
+    for result in run_tournament(args.games, args.output, args.agents, args.processes, args.seed, configuration,
+                                 args.server):
+        print(f"game {result['game']:5d} seed {result['seed']:6d} {result['seats']} {result['rewards']} "
+              f"{result['duration']:.1f}s")
+
+    summary = aggregate(read_results(args.output))
+    if args.summary:
+        with open(args.summary, 'w') as summary_file:
+            json.dump(summary, summary_file, indent=2)
+    for agent, statistics in summary.items():
+        low, high = statistics['win_rate_ci']
+        print(f"{agent:16} win rate {statistics['win_rate']:.3f} [{low:.3f}, {high:.3f}] "
+              f"halite {statistics['mean_halite']:9.1f} ships {statistics['mean_ships']:5.1f} "
+              f"errors {statistics['errors']} timeouts {statistics['timeouts']} ({statistics['seats']} seats)")
+
+
+if __name__ == '__main__':
+    main()
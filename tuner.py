@@ -0,0 +1,230 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple, Union
+
+# Tuner ################################################################################################################
+
+# Successive halving over the strategy constants of a bot. Configurations are sampled from the declared search space of
+# the bot and play seeded games in the local simulator against three copies of the bot with its default constants.
+# After every rung only the best 1/eta of the configurations go on and play eta times as many games, so weak
+# configurations are dropped after a few games. All configurations of a rung play the same seeds from the same seats.
+#
+# Every finished game is appended to a JSONL file, games already in that file are skipped when a run is resumed. The
+# configurations are drawn from the seed of the run, a resumed run has to use the same seed and search space.
+#
+#     python tuner.py --bot basic_bot --configurations 27 --games 4 --rungs 3 --output tuning.jsonl
+
+players = 4
+
+repository_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+class Parameter(NamedTuple):
+    low: float
+    high: float
+    integer: bool = True
+
+    def sample(self, generator: random.Random) -> Union[int, float]:
+        if self.integer:
+            return generator.randint(int(self.low), int(self.high))
+        return round(generator.uniform(self.low, self.high), 3)
+
+
+# Constructor arguments of the bot classes, passed to every instance via create_agent(bot, **overrides)
+search_spaces = {
+    'basic_bot': {'max_shipyards': Parameter(1, 6),
+                  'max_ships': Parameter(10, 80),
+                  'drop_off_speed': Parameter(0.25, 4.0, integer=False),
+                  'danger_aversion': Parameter(0.0, 4.0, integer=False)},
+    'task_force_bot': {'num_max_ships_per_shipyard': Parameter(4, 20),
+                       'shipyards_min_distance': Parameter(2, 8)},
+    'bot_swarm': {'low_amount_of_halite': Parameter(0, 100),
+                  'spawn_limit': Parameter(5, 80),
+                  'convert_threshold': Parameter(500, 3000),
+                  'danger_aversion': Parameter(0.0, 4.0, integer=False)},
+}
+
+
+# Configurations #######################################################################################################
+
+def sample_configurations(bot: str, count: int, seed: int) -> List[Dict[str, Union[int, float]]]:
+    # The first configuration is the default of the bot (no overrides), so the result can be compared against it
+    generator = random.Random(seed)
+    space = search_spaces[bot]
+    return [{}] + [{name: parameter.sample(generator) for name, parameter in space.items()} for _ in range(count - 1)]
+
+
+def configured_agent(bot: str, overrides: Dict[str, Union[int, float]]):
+    # New instance of the bot with its constants overridden, the instances do not share any state
+    from halite_sim import create_agent
+    try:
+        return create_agent(bot, **overrides)
+    except TypeError as error:
+        raise ValueError(f'{bot}: {error}') from error
+
+
+def seat_of(game: int) -> int:
+    return game % players
+
+
+def game_seed(base_seed: int, game: int) -> int:
+    return base_seed + game
+
+
+# Worker ###############################################################################################################
+
+def initialize_worker() -> None:
+    # The bots import each other's shared modules from the repository directory
+    os.chdir(repository_directory)
+    import sys
+    if repository_directory not in sys.path:
+        sys.path.insert(0, repository_directory)
+
+
+def play_trial(task: Tuple[str, int, Dict[str, Union[int, float]], int, int, Dict[str, Any]]) -> Dict[str, Any]:
+    bot, configuration_id, overrides, game, seed, configuration = task
+    from halite_sim import HaliteSimulator
+    seat = seat_of(game)
+    # bot_swarm draws its patrol radii from the random module
+    random.seed(seed)
+
+    start = time.perf_counter()
+    agents = [configured_agent(bot, overrides if player == seat else {}) for player in range(players)]
+    simulator = HaliteSimulator(dict(configuration, randomSeed=seed), players)
+    rewards = simulator.run(agents)
+    scores = [reward if reward is not None else -math.inf for reward in rewards]
+
+    return {'configuration': configuration_id, 'parameters': overrides, 'game': game, 'seed': seed, 'seat': seat,
+            'reward': rewards[seat], 'status': simulator.statuses[seat],
+            'win': scores[seat] == max(scores), 'rewards': rewards, 'duration': time.perf_counter() - start}
+
+
+# Results ##############################################################################################################
+
+def read_trials(path: str) -> List[Dict[str, Any]]:
+    trials = []
+    if os.path.exists(path):
+        with open(path) as trials_file:
+            for line in trials_file:
+                if line.strip():
+                    trials.append(json.loads(line))
+    return trials
+
+
+def trial_score(trial: Dict[str, Any]) -> float:
+    # Final halite of the tuned seat, failed seats (ERROR, TIMEOUT, ...) have no reward and rank below everything else
+    return trial['reward'] if trial['reward'] is not None else -math.inf
+
+
+def summarize(trials: List[Dict[str, Any]], configurations: List[Dict[str, Union[int, float]]]) \
+        -> List[Dict[str, Any]]:
+    # Mean score, win rate and games of every configuration with trials, best first
+    games = {}
+    for trial in trials:
+        games.setdefault(trial['configuration'], []).append(trial)
+    summary = []
+    for configuration_id, configuration_trials in games.items():
+        scores = [trial_score(trial) for trial in configuration_trials]
+        summary.append({'configuration': configuration_id, 'parameters': configurations[configuration_id],
+                        'games': len(scores), 'mean_halite': sum(scores) / len(scores),
+                        'win_rate': sum(trial['win'] for trial in configuration_trials) / len(scores)})
+    return sorted(summary, key=lambda row: (-row['mean_halite'], row['configuration']))
+
+
+# Successive Halving ###################################################################################################
+
+def rung_games(rung: int, games: int, eta: int) -> int:
+    # Games per configuration after the rung, later rungs reuse the games of the earlier ones
+    return games * eta ** rung
+
+
+def run_tuning(bot: str, output: str, configurations_count: int = 27, games: int = 4, eta: int = 3, rungs: int = 3,
+               processes: int = None, base_seed: int = 0, configuration: Dict[str, Any] = None) \
+        -> Iterator[Dict[str, Any]]:
+    # Plays all games of every rung not yet in the output file and yields the trials as they finish
+    if bot not in search_spaces:
+        raise ValueError(f'no search space for {bot}, known bots: {sorted(search_spaces)}')
+    configuration = {} if configuration is None else configuration
+    configurations = sample_configurations(bot, configurations_count, base_seed)
+    trials = read_trials(output)
+    for trial in trials:
+        configuration_id = trial['configuration']
+        if configuration_id >= len(configurations) or trial['parameters'] != configurations[configuration_id]:
+            raise ValueError(f"{output} was written with another seed or search space (configuration "
+                             f"{trial['configuration']}: {trial['parameters']})")
+    finished = {(trial['configuration'], trial['game']) for trial in trials}
+
+    alive = list(range(len(configurations)))
+    processes = processes or os.cpu_count() or 1
+    with multiprocessing.Pool(processes, initializer=initialize_worker) as pool:
+        for rung in range(rungs):
+            tasks = [(bot, configuration_id, configurations[configuration_id], game, game_seed(base_seed, game),
+                      configuration)
+                     for game in range(rung_games(rung, games, eta)) for configuration_id in alive
+                     if (configuration_id, game) not in finished]
+            with open(output, 'a') as trials_file:
+                for trial in pool.imap_unordered(play_trial, tasks):
+                    trials_file.write(json.dumps(trial) + '\n')
+                    trials_file.flush()
+                    trials.append(trial)
+                    finished.add((trial['configuration'], trial['game']))
+                    yield dict(trial, rung=rung)
+
+            if rung < rungs - 1:
+                # Only the games of this rung count, configurations dropped earlier may have played more of them in
+                # an interrupted run
+                rung_trials = [trial for trial in trials if trial['configuration'] in alive
+                               and trial['game'] < rung_games(rung, games, eta)]
+                ranking = summarize(rung_trials, configurations)
+                alive = [row['configuration'] for row in ranking[:max(1, math.ceil(len(alive) / eta))]]
+
+
+def best_configurations(bot: str, output: str, configurations_count: int, base_seed: int, count: int = 5) \
+        -> Dict[str, Any]:
+    # The configurations that played the most games (the last rung), best first, and the default for comparison
+    configurations = sample_configurations(bot, configurations_count, base_seed)
+    ranking = summarize(read_trials(output), configurations)
+    most_games = max((row['games'] for row in ranking), default=0)
+    finalists = [row for row in ranking if row['games'] == most_games]
+    default = next((row for row in ranking if row['configuration'] == 0), None)
+    return {'bot': bot, 'seed': base_seed, 'search_space': {name: parameter._asdict()
+                                                            for name, parameter in search_spaces[bot].items()},
+            'best': finalists[:count], 'default': default}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Tune the strategy constants of a bot by successive halving.')
+    parser.add_argument('--bot', default='basic_bot', choices=sorted(search_spaces))
+    parser.add_argument('--configurations', type=int, default=27, help='sampled configurations, with the default')
+    parser.add_argument('--games', type=int, default=4, help='games per configuration in the first rung')
+    parser.add_argument('--eta', type=int, default=3, help='keep 1/eta of the configurations after every rung')
+    parser.add_argument('--rungs', type=int, default=3)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the configurations and of the first game')
+    parser.add_argument('--size', type=int, default=21)
+    parser.add_argument('--steps', type=int, default=400, help='episode steps per game')
+    parser.add_argument('--output', default='tuning.jsonl', help='trials of every game')
+    parser.add_argument('--best', default='tuning_best.json', help='best configurations as JSON')
+    args = parser.parse_args()
+
+    configuration = {'size': args.size, 'episodeSteps': args.steps}
+    for trial in run_tuning(args.bot, args.output, args.configurations, args.games, args.eta, args.rungs,
+                            args.processes, args.seed, configuration):
+        print(f"rung {trial['rung']} configuration {trial['configuration']:3d} game {trial['game']:4d} "
+              f"seat {trial['seat']} {trial['status']:6} {trial['reward']} {trial['duration']:.1f}s")
+
+    best = best_configurations(args.bot, args.output, args.configurations, args.seed)
+    with open(args.best, 'w') as best_file:
+        json.dump(best, best_file, indent=2)
+    for row in best['best'] + ([dict(best['default'], configuration='default')] if best['default'] else []):
+        print(f"{str(row['configuration']):>8} halite {row['mean_halite']:9.1f} win rate {row['win_rate']:.3f} "
+              f"({row['games']} games) {row['parameters']}")
+
+
+if __name__ == '__main__':
+    main()